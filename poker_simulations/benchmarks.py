@@ -0,0 +1,303 @@
+import argparse
+import gc
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from timeit import default_timer
+import evaluator
+from game import Dealer, Deck, Hand, Table, HAND_TYPES, CARDS, FOLD
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LOG = logging.getLogger(__name__)
+
+
+def percentile(values, q):
+    """
+    q-th percentile of values with linear interpolation
+    :param values: list of numbers
+    :param q: between 0 and 100
+    """
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * q / 100.0
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+
+def _peak_rss():
+    """
+    Peak resident set size of this process in bytes, or None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ## kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Benchmark(object):
+    """
+    A timed operation. func is called number times per
+    repeat and the time per call of each repeat is recorded.
+    """
+    def __init__(self, name, func, number=1000, repeat=7):
+        self.name = name
+        self.func = func
+        self.number = number
+        self.repeat = repeat
+
+    def allocations(self, calls=100):
+        """
+        Memory blocks still allocated per call after calls calls and
+        the peak traced bytes while they ran. Without tracemalloc
+        (Python 2) see _gc_allocations
+        """
+        calls = min(calls, self.number)
+        if tracemalloc is None:
+            return self._gc_allocations(calls)
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(ignore)
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            for _ in range(calls):
+                self.func()
+            peak = tracemalloc.get_traced_memory()[1] - start
+            after = tracemalloc.take_snapshot().filter_traces(ignore)
+        finally:
+            tracemalloc.stop()
+        blocks = sum(i.count_diff for i in after.compare_to(before, 'lineno'))
+        return OrderedDict([('blocks', float(blocks) / calls), ('peak_bytes', peak),
+                            ('source', 'tracemalloc')])
+
+    def _gc_allocations(self, calls):
+        """
+        Coarser stand in for tracemalloc. blocks counts the objects
+        tracked by the garbage collector (containers, not ints or
+        strings) that are still alive per call, and peak_bytes is the
+        growth in the peak resident set size of the whole process,
+        which stays 0 unless the calls set a new high, or None
+        without the resource module
+        """
+        gc.collect()
+        before = len(gc.get_objects())
+        rss = _peak_rss()
+        for _ in range(calls):
+            self.func()
+        peak = None if rss is None else _peak_rss() - rss
+        gc.collect()
+        blocks = len(gc.get_objects()) - before
+        return OrderedDict([('blocks', float(blocks) / calls), ('peak_bytes', peak),
+                            ('source', 'gc')])
+
+    def run(self):
+        func = self.func
+        times = []
+        for _ in range(self.repeat):
+            start = default_timer()
+            for _ in range(self.number):
+                func()
+            times.append((default_timer() - start) / self.number)
+
+        result = OrderedDict()
+        result['number'] = self.number
+        result['repeat'] = self.repeat
+        result['ops_per_sec'] = 1.0 / percentile(times, 50)
+        result['mean'] = sum(times) / len(times)
+        for q in (50, 90, 99):
+            result['p{}'.format(q)] = percentile(times, q)
+        result['min'] = min(times)
+        result['allocations'] = self.allocations()
+        return result
+
+
+def default_benchmarks(scale=1.0, seed=0):
+    """
+    The hot paths of the card, hand and table code
+    :param scale: multiplier for the number of calls per repeat
+    :return: list of Benchmark
+    """
+    rand = random.Random(seed)
+    hands = [[CARDS[i] for i in rand.sample(range(52), 7)] for _ in range(100)]
+    hand_ids = [[i.id for i in j] for j in hands]
+    cards = hands[0]
+
+    def n(number):
+        return max(int(number * scale), 1)
+
+    state = {'i': 0}
+
+    def next_hand():
+        state['i'] = (state['i'] + 1) % len(hands)
+        return hands[state['i']]
+
+    def next_ids():
+        state['i'] = (state['i'] + 1) % len(hand_ids)
+        return hand_ids[state['i']]
+
+    cache = evaluator.EvalCache()
+    for ids in hand_ids:
+        cache.evaluate(ids)
+
+    benchmarks = [
+        Benchmark('card.compare', lambda: cards[0] < cards[1], n(100000)),
+        Benchmark('card.sort', lambda: sorted(next_hand()), n(20000)),
+        Benchmark('deck.create', lambda: Deck(shuffle=False), n(5000)),
+        Benchmark('deck.create_and_shuffle', Deck, n(2000)),
+        Benchmark('evaluator.evaluate', lambda: evaluator.evaluate(next_ids()), n(20000)),
+        ## every hand is a hit after the first pass
+        Benchmark('evaluator.cache_hit', lambda: cache.evaluate(next_ids()), n(20000)),
+        Benchmark('hand.eval', lambda: Hand(next_hand()).eval(), n(2000)),
+    ]
+    for hand_type in HAND_TYPES:
+        benchmarks.append(Benchmark(
+            '{}.get_five_best'.format(hand_type.__name__),
+            lambda hand_type=hand_type: hand_type(next_hand()),
+            n(200),
+        ))
+    for players in (2, 6, 9):
+        table = Table(players, rng=rand)
+
+        def showdown(table=table):
+            table.deal()
+            return table.best_cards()
+
+        benchmarks.append(Benchmark('table.best_cards.{}'.format(players), showdown, n(200)))
+
+    ## a whole hand where every seat checks or calls down
+    dealer = Dealer(6, rng=rand)
+
+    def play_hand():
+        dealer.stacks = [200] * 6
+        dealer.new_hand()
+        while not dealer.state.finished:
+            legal = dealer.legal_actions()
+            kind, amount, _ = legal[1] if legal[0][0] == FOLD else legal[0]
+            dealer.act(kind, amount)
+
+    benchmarks.append(Benchmark('dealer.hand.6', play_hand, n(200)))
+    return benchmarks
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(benchmarks=None, names=None):
+    """
+    Run benchmarks and collect the results with a
+    description of the environment
+    :param benchmarks: list of Benchmark. default_benchmarks() by default
+    :param names: only run benchmarks whose name starts with one of these
+    :return: OrderedDict ready to be written as JSON
+    """
+    if benchmarks is None:
+        benchmarks = default_benchmarks()
+    results = OrderedDict()
+    for bench in benchmarks:
+        if names and not any(bench.name.startswith(i) for i in names):
+            continue
+        LOG.info('running {}'.format(bench.name))
+        results[bench.name] = bench.run()
+
+    meta = OrderedDict()
+    meta['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    meta['commit'] = _commit()
+    meta['python'] = platform.python_version()
+    meta['platform'] = platform.platform()
+    return OrderedDict([('meta', meta), ('results', results)])
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def compare(old, new, threshold=0.1):
+    """
+    Find benchmarks that got slower between two runs
+    :param old: results from run_benchmarks or load
+    :param new: results from run_benchmarks or load
+    :param threshold: fractional drop in ops/sec that counts as a regression
+    :return: OrderedDict of name to (old ops/sec, new ops/sec, change)
+        for each regression
+    """
+    regressions = OrderedDict()
+    for name, result in new['results'].items():
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['ops_per_sec']
+        after = result['ops_per_sec']
+        change = (after - before) / before
+        if change < -threshold:
+            regressions[name] = (before, after, change)
+    return regressions
+
+
+def summary(results):
+    """
+    results as a text table
+    """
+    lines = ['{:<32} {:>14} {:>12} {:>12} {:>12}'.format('benchmark', 'ops/sec', 'p50 (us)', 'p99 (us)', 'blocks')]
+    for name, r in results['results'].items():
+        blocks = '{:.1f}'.format(r['allocations']['blocks']) if r['allocations'] else '-'
+        lines.append('{:<32} {:>14.1f} {:>12.2f} {:>12.2f} {:>12}'.format(
+            name, r['ops_per_sec'], r['p50'] * 1e6, r['p99'] * 1e6, blocks
+        ))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the card, hand and table hot paths')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='fractional slowdown that counts as a regression')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier for the number of calls per repeat')
+    parser.add_argument('names', nargs='*', help='only run benchmarks starting with these names')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(default_benchmarks(args.scale), args.names)
+    print(summary(results))
+    if args.output:
+        save(results, args.output)
+
+    if args.compare:
+        regressions = compare(load(args.compare), results, args.threshold)
+        for name, (before, after, change) in regressions.items():
+            print('REGRESSION {}: {:.1f} -> {:.1f} ops/sec ({:+.1%})'.format(name, before, after, change))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,608 @@
+import json
+import logging
+import os
+from collections import namedtuple
+from itertools import permutations
+import numpy as np
+from batch import evaluate_batch
+from preflop import N_CLASSES, CLASS_OF, PreflopTable
+from ranges import COMBOS, COMBO_MASKS
+
+LOG = logging.getLogger(__name__)
+
+METHODS = ('cfr', 'cfr+', 'outcome', 'external')
+
+## a decision or terminal point of a game's public betting tree. Infoset
+## offset + i is the decision at this node with private information i
+Node = namedtuple('Node', ['history', 'player', 'actions', 'children', 'offset', 'size'])
+
+
+class Game(object):
+    """
+    A two player zero sum game with chance only at the start.
+
+    A game deals every private and board card up front and the
+    betting is a public tree of histories, strings of action
+    characters. The information set of a player at a history is
+    that history plus the player's private index there, so infosets
+    are numbered by giving every decision node a block of ids.
+
+    Subclasses define root, player, actions, private, private_size,
+    utility and deals, with the deal dependent ones working on a
+    whole array of deals at once.
+    """
+    name = None
+    root = ''
+
+    def __init__(self):
+        self.nodes = []
+        self.index = {}
+        self.n_infosets = 0
+        self._build(self.root)
+        self.max_actions = max(len(i.actions) for i in self.nodes)
+        ## number of actions of each infoset
+        self.n_actions = np.zeros(self.n_infosets, dtype=np.int64)
+        for node in self.nodes:
+            if node.player is not None:
+                self.n_actions[node.offset:node.offset + node.size] = len(node.actions)
+        self.legal = np.arange(self.max_actions) < self.n_actions[:, None]
+
+    def _build(self, history):
+        i = len(self.nodes)
+        self.nodes.append(None)
+        self.index[history] = i
+        player = self.player(history)
+        if player is None:
+            self.nodes[i] = Node(history, None, (), (), 0, 0)
+            return i
+        size = self.private_size(history)
+        offset = self.n_infosets
+        self.n_infosets += size
+        actions = self.actions(history)
+        children = tuple(self._build(self.next(history, a)) for a in actions)
+        self.nodes[i] = Node(history, player, actions, children, offset, size)
+        return i
+
+    @property
+    def params(self):
+        """
+        keyword arguments that rebuild the game, for checkpoints
+        """
+        return {}
+
+    @property
+    def exact(self):
+        """
+        whether deals() enumerates every deal
+        """
+        return True
+
+    def node(self, history):
+        return self.nodes[self.index[history]]
+
+    def next(self, history, action):
+        return history + action
+
+    def player(self, history):
+        raise NotImplementedError
+
+    def actions(self, history):
+        raise NotImplementedError
+
+    def private_size(self, history):
+        raise NotImplementedError
+
+    def private(self, deals, player, history):
+        """
+        :return: private index of player at history for each deal
+        """
+        raise NotImplementedError
+
+    def utility(self, deals, history):
+        """
+        :return: payoff of player 0 at a terminal history for each deal
+        """
+        raise NotImplementedError
+
+    def deals(self, rng=None, n=None):
+        """
+        :return: tuple of (array of deals, probability of each deal)
+        """
+        raise NotImplementedError
+
+
+class KuhnPoker(Game):
+    """
+    Kuhn poker: three cards, one card each, an ante of 1
+    and one bet of 1. Actions are p(ass) and b(et).
+    """
+    name = 'kuhn'
+    TERMINAL = ('pp', 'bp', 'bb', 'pbp', 'pbb')
+
+    def player(self, history):
+        return None if history in self.TERMINAL else len(history) % 2
+
+    def actions(self, history):
+        return ('p', 'b')
+
+    def private_size(self, history):
+        return 3
+
+    def private(self, deals, player, history):
+        return deals[:, player]
+
+    def utility(self, deals, history):
+        win = np.where(deals[:, 0] > deals[:, 1], 1.0, -1.0)
+        if history == 'bp':
+            return np.ones(len(deals))
+        if history == 'pbp':
+            return -np.ones(len(deals))
+        return win * (2 if 'b' in history else 1)
+
+    def deals(self, rng=None, n=None):
+        deals = np.array(list(permutations(range(3), 2)), dtype=np.int64)
+        return deals, np.full(len(deals), 1.0 / len(deals))
+
+
+class LeducPoker(Game):
+    """
+    Leduc Hold'em: a deck of two jacks, queens and kings, one
+    private card each and one board card after the first round.
+    Antes of 1, bets of 2 then 4 and at most two raises a round.
+    Actions are f(old), c(heck or call) and r(aise), and rounds
+    are separated by '/'.
+    """
+    name = 'leduc'
+    BETS = (2, 4)
+    MAX_RAISES = 2
+
+    def _rounds(self, history):
+        return history.split('/')
+
+    def _closed(self, betting):
+        return betting == 'cc' or (len(betting) > 1 and betting[-1] == 'c' and 'r' in betting)
+
+    def player(self, history):
+        if history.endswith('f'):
+            return None
+        rounds = self._rounds(history)
+        if len(rounds) == 2 and self._closed(rounds[1]):
+            return None
+        return len(rounds[-1]) % 2
+
+    def next(self, history, action):
+        history += action
+        if '/' not in history and self._closed(history):
+            history += '/'
+        return history
+
+    def actions(self, history):
+        betting = self._rounds(history)[-1]
+        raise_ok = betting.count('r') < self.MAX_RAISES
+        if betting.endswith('r'):
+            return ('f', 'c', 'r') if raise_ok else ('f', 'c')
+        return ('c', 'r')
+
+    def private_size(self, history):
+        return 3 if '/' not in history else 9
+
+    def private(self, deals, player, history):
+        rank = deals[:, player] // 2
+        if '/' not in history:
+            return rank
+        return rank * 3 + deals[:, 2] // 2
+
+    def _contributed(self, history):
+        chips = [1, 1]
+        for size, betting in zip(self.BETS, self._rounds(history)):
+            for i, action in enumerate(betting):
+                if action == 'r':
+                    chips[i % 2] = max(chips) + size
+                elif action == 'c':
+                    chips[i % 2] = max(chips)
+        return chips
+
+    def utility(self, deals, history):
+        chips = self._contributed(history)
+        if history.endswith('f'):
+            folder = (len(self._rounds(history)[-1]) - 1) % 2
+            return np.full(len(deals), -chips[0] if folder == 0 else chips[1], dtype=np.float64)
+        ranks = deals // 2
+        ## a pair with the board beats any unpaired card
+        score = (ranks[:, :2] == ranks[:, 2:3]) * 3 + ranks[:, :2]
+        return np.sign(score[:, 0] - score[:, 1]) * float(chips[0])
+
+    def deals(self, rng=None, n=None):
+        deals = np.array(list(permutations(range(6), 3)), dtype=np.int64)
+        return deals, np.full(len(deals), 1.0 / len(deals))
+
+
+class PushFoldGame(Game):
+    """
+    Heads up No-Limit Hold'em where the button, in the small blind,
+    can only f(old) or p(ush) all in and the big blind can only
+    f(old) or c(all). Private information is the hand class.
+
+    With equity, the path of a preflop table written by
+    preflop.build_preflop_table, the deals are every pair of hand
+    classes weighted by their combos and all in pots pay out by the
+    table's equity. Otherwise deals are n random hands and boards
+    resolved with the batch evaluator.
+    """
+    name = 'push_fold'
+    TERMINAL = ('f', 'pf', 'pc')
+
+    def __init__(self, stack=20, small_blind=1, big_blind=2, equity=None, batch=10000):
+        """
+        :param stack: chips each player starts with
+        :param equity: optional path of a 169 x 169 preflop equity table
+        :param batch: number of deals sampled at a time without equity
+        """
+        if stack <= big_blind:
+            raise ValueError('stack should be more than the big blind. Got "{}"'.format(stack))
+        self.stack = stack
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.equity = equity
+        self.batch = batch
+        super(PushFoldGame, self).__init__()
+
+    @property
+    def params(self):
+        return {'stack': self.stack, 'small_blind': self.small_blind, 'big_blind': self.big_blind,
+                'equity': self.equity, 'batch': self.batch}
+
+    @property
+    def exact(self):
+        return self.equity is not None
+
+    def player(self, history):
+        return None if history in self.TERMINAL else len(history)
+
+    def actions(self, history):
+        return ('f', 'p') if not history else ('f', 'c')
+
+    def private_size(self, history):
+        return N_CLASSES
+
+    def private(self, deals, player, history):
+        return deals[:, player].astype(np.int64)
+
+    def utility(self, deals, history):
+        if history == 'f':
+            return np.full(len(deals), -float(self.small_blind))
+        if history == 'pf':
+            return np.full(len(deals), float(self.big_blind))
+        ## column 2 is player 0's share of the pot less player 1's
+        return deals[:, 2] * self.stack
+
+    def deals(self, rng=None, n=None):
+        """
+        Deals are rows of (class of player 0, class of player 1, showdown result)
+        """
+        if self.exact:
+            return _class_deals(self.equity)
+        n = n or self.batch
+        keys = rng.random_sample((n, 52))
+        ## argsort so the cards are in random order, argpartition orders them by id
+        cards = np.argsort(keys, axis=1)[:, :9].astype(np.int16)
+        hands = np.empty((n, 2, 7), dtype=np.int16)
+        hands[:, 0, :2] = cards[:, :2]
+        hands[:, 1, :2] = cards[:, 2:4]
+        hands[:, :, 2:] = cards[:, None, 4:]
+        strengths = evaluate_batch(hands.reshape(-1, 7))[0].reshape(n, 2)
+        classes = np.array(CLASS_OF)[cards[:, :4:2] * 52 + cards[:, 1:4:2]]
+        deals = np.empty((n, 3))
+        deals[:, :2] = classes
+        deals[:, 2] = np.sign(strengths[:, 0] - strengths[:, 1])
+        return deals, np.full(n, 1.0 / n)
+
+
+## _class_deals by equity table path, filled in on first use
+_CLASS_DEALS = {}
+
+
+def _class_deals(path):
+    """
+    every pair of hand classes that can be dealt together with
+    its probability and expected showdown result
+    """
+    if path not in _CLASS_DEALS:
+        classes = np.array(CLASS_OF)[COMBOS[:, 0] * 52 + COMBOS[:, 1]]
+        counts = np.zeros((N_CLASSES, N_CLASSES))
+        for i in range(len(COMBOS)):
+            free = (COMBO_MASKS & COMBO_MASKS[i]) == 0
+            counts[classes[i]] += np.bincount(classes[free], minlength=N_CLASSES)
+        first, second = np.nonzero(counts)
+        matrix = PreflopTable(path).matrix
+        deals = np.column_stack([first, second, 2.0 * matrix[first, second] - 1.0])
+        _CLASS_DEALS[path] = (deals, counts[first, second] / counts.sum())
+    return _CLASS_DEALS[path]
+
+
+GAMES = dict((i.name, i) for i in (KuhnPoker, LeducPoker, PushFoldGame))
+
+
+def _regret_matching(regrets, legal):
+    """
+    strategy in proportion to the positive regrets, uniform
+    over the legal actions when none are positive
+    """
+    positive = np.maximum(regrets, 0.0)
+    total = positive.sum(axis=1, keepdims=True)
+    uniform = legal / legal.sum(axis=1, keepdims=True).astype(np.float64)
+    return np.where(total > 0, positive / np.where(total > 0, total, 1.0), uniform)
+
+
+class CFRSolver(object):
+    """
+    Counterfactual regret minimisation for a Game.
+
+    Regrets and strategy sums are (n_infosets, max_actions) arrays
+    indexed by infoset id. method is one of METHODS:
+
+    cfr and cfr+ walk the public tree once per player and iteration
+    with every deal at once as numpy arrays, or a batch of sampled
+    deals when the game can't enumerate them. cfr+ floors regrets
+    at 0 and weights the average strategy by iteration.
+
+    outcome and external are Monte Carlo CFR: each iteration samples
+    one deal per player and walks one sampled path (outcome sampling,
+    exploring with epsilon) or every action of the updated player and
+    one sampled action of the other (external sampling).
+    """
+    def __init__(self, game, method='cfr+', seed=None, epsilon=0.6):
+        if method not in METHODS:
+            raise ValueError('method should be one of {}. Got "{}"'.format(', '.join(METHODS), method))
+        self.game = game
+        self.method = method
+        self.epsilon = epsilon
+        self.rng = np.random.RandomState(seed)
+        self.regrets = np.zeros((game.n_infosets, game.max_actions))
+        self.strategy_sum = np.zeros((game.n_infosets, game.max_actions))
+        self.iteration = 0
+        self._deals = game.deals() if game.exact else None
+
+    def _sample_deals(self, n=None):
+        if self._deals is None:
+            return self.game.deals(self.rng, n)
+        if n is None:
+            return self._deals
+        deals, probs = self._deals
+        index = np.searchsorted(np.cumsum(probs), self.rng.random_sample(n) * probs.sum())
+        return deals[np.minimum(index, len(deals) - 1)], np.full(n, 1.0 / n)
+
+    def iterate(self, iterations=1):
+        """
+        Run iterations more iterations
+        :return: self
+        """
+        root = self.game.nodes[0]
+        for _ in range(iterations):
+            self.iteration += 1
+            for player in (0, 1):
+                if self.method in ('cfr', 'cfr+'):
+                    deals, probs = self._sample_deals()
+                    weight = self.iteration if self.method == 'cfr+' else 1.0
+                    self._walk(root, deals, player, probs, np.ones(len(deals)), weight)
+                    if self.method == 'cfr+':
+                        np.maximum(self.regrets, 0.0, out=self.regrets)
+                else:
+                    deal = self._sample_deals(1)[0][0]
+                    if self.method == 'outcome':
+                        self._outcome(root, deal, player, 1.0, 1.0, 1.0)
+                    else:
+                        self._external(root, deal, player)
+        return self
+
+    def _strategy(self, node, local):
+        k = len(node.actions)
+        rows = slice(node.offset, node.offset + node.size)
+        return _regret_matching(self.regrets[rows, :k], self.game.legal[rows, :k])[local]
+
+    def _walk(self, node, deals, player, reach_o, reach_p, weight):
+        """
+        Vectorised CFR update of player's regrets below node
+        :param reach_o: chance and opponent reach of each deal
+        :param reach_p: player's own reach
+        :return: player's expected payoff at node for each deal
+        """
+        if node.player is None:
+            u = self.game.utility(deals, node.history)
+            return u if player == 0 else -u
+        local = self.game.private(deals, node.player, node.history)
+        sigma = self._strategy(node, local)
+        k = len(node.actions)
+        values = np.zeros((len(deals), k))
+        for a, child in enumerate(node.children):
+            if node.player == player:
+                values[:, a] = self._walk(self.game.nodes[child], deals, player, reach_o, reach_p * sigma[:, a], weight)
+            elif (sigma[:, a] * reach_o).any():
+                ## skip what the opponent never reaches
+                values[:, a] = self._walk(self.game.nodes[child], deals, player, reach_o * sigma[:, a], reach_p, weight)
+        value = (sigma * values).sum(axis=1)
+        if node.player == player:
+            rows = slice(node.offset, node.offset + node.size)
+            for a in range(k):
+                self.regrets[rows, a] += np.bincount(local, reach_o * (values[:, a] - value), minlength=node.size)
+                self.strategy_sum[rows, a] += weight * np.bincount(local, reach_p * sigma[:, a], minlength=node.size)
+        return value
+
+    def _sample(self, probs):
+        return min(int(np.searchsorted(np.cumsum(probs), self.rng.random_sample())), len(probs) - 1)
+
+    def _outcome(self, node, deal, player, pi_p, pi_o, s):
+        """
+        Outcome sampling update of player's regrets along one sampled path
+        :return: tuple of (sampled payoff / s, reach of the tail of the path)
+        """
+        if node.player is None:
+            u = self.game.utility(deal[None], node.history)[0]
+            return (u if player == 0 else -u) / s, 1.0
+        local = self.game.private(deal[None], node.player, node.history)
+        sigma = self._strategy(node, local)[0]
+        k = len(node.actions)
+        row = node.offset + local[0]
+        if node.player == player:
+            probs = self.epsilon / k + (1.0 - self.epsilon) * sigma
+            a = self._sample(probs)
+            u, tail = self._outcome(self.game.nodes[node.children[a]], deal, player, pi_p * sigma[a], pi_o,
+                                    s * probs[a])
+            w = u * pi_o
+            regret = -w * tail * sigma[a] * np.ones(k)
+            regret[a] = w * tail * (1.0 - sigma[a])
+            self.regrets[row, :k] += regret
+        else:
+            a = self._sample(sigma)
+            u, tail = self._outcome(self.game.nodes[node.children[a]], deal, player, pi_p, pi_o * sigma[a],
+                                    s * sigma[a])
+            self.strategy_sum[row, :k] += pi_o / s * sigma
+        return u, tail * sigma[a]
+
+    def _external(self, node, deal, player):
+        """
+        External sampling update of player's regrets
+        :return: player's sampled payoff at node
+        """
+        if node.player is None:
+            u = self.game.utility(deal[None], node.history)[0]
+            return u if player == 0 else -u
+        local = self.game.private(deal[None], node.player, node.history)
+        sigma = self._strategy(node, local)[0]
+        row = node.offset + local[0]
+        k = len(node.actions)
+        if node.player != player:
+            self.strategy_sum[row, :k] += sigma
+            return self._external(self.game.nodes[node.children[self._sample(sigma)]], deal, player)
+        values = np.array([self._external(self.game.nodes[i], deal, player) for i in node.children])
+        value = sigma.dot(values)
+        self.regrets[row, :k] += values - value
+        return value
+
+    def current_strategy(self):
+        """
+        :return: (n_infosets, max_actions) array of the regret matching strategy
+        """
+        return _regret_matching(self.regrets, self.game.legal)
+
+    def average_strategy(self):
+        """
+        The average strategy, which converges to an equilibrium
+        :return: (n_infosets, max_actions) array, uniform where an infoset was never reached
+        """
+        return _regret_matching(self.strategy_sum, self.game.legal)
+
+    def strategy(self, history, private=None):
+        """
+        Average strategy at a node of the public tree
+        :param history: e.g. 'pb' in Kuhn poker
+        :param private: private index. Every private index by default
+        :return: dict of action to probability, or a list of them per private index
+        """
+        node = self.game.node(history)
+        rows = self.average_strategy()[node.offset:node.offset + node.size, :len(node.actions)]
+        if private is not None:
+            return dict(zip(node.actions, rows[private].tolist()))
+        return [dict(zip(node.actions, i)) for i in rows.tolist()]
+
+    def _evaluate(self, node, deals, reach, strategy, responder):
+        """
+        payoff of player 0, or of responder playing a best response,
+        weighted by reach for each deal
+        """
+        if node.player is None:
+            u = reach * self.game.utility(deals, node.history)
+            return u if responder in (None, 0) else -u
+        local = self.game.private(deals, node.player, node.history)
+        k = len(node.actions)
+        if node.player == responder:
+            values = np.column_stack([self._evaluate(self.game.nodes[i], deals, reach, strategy, responder)
+                                      for i in node.children])
+            totals = np.column_stack([np.bincount(local, values[:, a], minlength=node.size) for a in range(k)])
+            return values[np.arange(len(deals)), totals.argmax(axis=1)[local]]
+        sigma = strategy[node.offset + local, :k]
+        value = np.zeros(len(deals))
+        for a, child in enumerate(node.children):
+            if (sigma[:, a] * reach).any():
+                value += self._evaluate(self.game.nodes[child], deals, reach * sigma[:, a], strategy, responder)
+        return value
+
+    def _eval_deals(self, samples):
+        if self._deals is not None:
+            return self._deals
+        return self.game.deals(np.random.RandomState(0), samples)
+
+    def value(self, strategy=None, samples=200000):
+        """
+        Expected payoff of player 0 when both play strategy,
+        the average strategy by default. Games that can't enumerate
+        their deals use samples random ones.
+        """
+        strategy = self.average_strategy() if strategy is None else strategy
+        deals, probs = self._eval_deals(samples)
+        return float(self._evaluate(self.game.nodes[0], deals, probs, strategy, None).sum())
+
+    def exploitability(self, strategy=None, samples=200000):
+        """
+        Mean gain of a best response to each player's strategy,
+        0 at an equilibrium
+        """
+        strategy = self.average_strategy() if strategy is None else strategy
+        deals, probs = self._eval_deals(samples)
+        root = self.game.nodes[0]
+        return float(sum(self._evaluate(root, deals, probs, strategy, i).sum() for i in (0, 1)) / 2.0)
+
+    def save(self, path):
+        """
+        Write the solver state to path. The file is replaced in
+        one step, so a crash never leaves half a checkpoint.
+        """
+        name, keys, pos, has_gauss, cached = self.rng.get_state()
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f, regrets=self.regrets, strategy_sum=self.strategy_sum, iteration=self.iteration,
+                rng_keys=keys, rng_pos=pos, rng_gauss=[has_gauss, cached],
+                meta=json.dumps({'game': self.game.name, 'params': self.game.params,
+                                 'method': self.method, 'epsilon': self.epsilon}),
+            )
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path, game=None):
+        """
+        A solver saved by save, ready to resume
+        :param game: the Game. Rebuilt from the checkpoint by default
+        """
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if game is None:
+                game = GAMES[meta['game']](**meta['params'])
+            if data['regrets'].shape != (game.n_infosets, game.max_actions):
+                raise ValueError('"{}" is not a checkpoint of {}'.format(path, game.name))
+            solver = cls(game, meta['method'], epsilon=meta['epsilon'])
+            solver.regrets = data['regrets'].copy()
+            solver.strategy_sum = data['strategy_sum'].copy()
+            solver.iteration = int(data['iteration'])
+            has_gauss, cached = data['rng_gauss']
+            solver.rng.set_state(('MT19937', data['rng_keys'], int(data['rng_pos']), int(has_gauss), float(cached)))
+        return solver
+
+
+def solve(game, iterations, method='cfr+', seed=None, checkpoint=None, checkpoint_every=100):
+    """
+    Run a solver to iterations iterations in total. With a checkpoint
+    path the state is saved every checkpoint_every iterations and a
+    later call resumes from the file.
+    :return: CFRSolver
+    """
+    if checkpoint and os.path.isfile(checkpoint):
+        solver = CFRSolver.load(checkpoint, game)
+        LOG.info('resuming {} at iteration {}'.format(game.name, solver.iteration))
+    else:
+        solver = CFRSolver(game, method, seed)
+    while solver.iteration < iterations:
+        solver.iterate(min(checkpoint_every, iterations - solver.iteration))
+        if checkpoint:
+            solver.save(checkpoint)
+    return solver
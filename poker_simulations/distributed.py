@@ -0,0 +1,320 @@
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import Process
+import numpy as np
+from equity import EquityResult, simulate_chunk, _check_cards
+from pipeline import deal_chunk
+from evaluator import CATEGORIES
+
+LOG = logging.getLogger(__name__)
+
+## every message is a 4 byte big endian length then that many bytes of utf-8 JSON
+LENGTH = struct.Struct('>I')
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(LENGTH.pack(len(data)) + data)
+
+
+def _recv_exact(sock, n):
+    chunks = []
+    while n:
+        chunk = sock.recv(n)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_message(sock):
+    """
+    :return: the decoded message or None when the connection is closed
+    """
+    header = _recv_exact(sock, LENGTH.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, LENGTH.unpack(header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+def merge(a, b):
+    """
+    Combine two partial aggregates. Numbers are added and
+    lists are added element by element.
+    """
+    merged = dict(a)
+    for key, value in b.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(value, list):
+            merged[key] = [i + j for i, j in zip(merged[key], value)]
+        else:
+            merged[key] = merged[key] + value
+    return merged
+
+
+def _equity(scenario, seed):
+    """
+    Monte Carlo equity of scenario['hole'] for one seed
+    """
+    hole, board = _check_cards(scenario['hole'], scenario.get('board'), scenario.get('players', 2))
+    r = simulate_chunk(hole, board, scenario.get('players', 2), scenario['iterations'], [scenario['seed'], seed])
+    return {
+        'wins': r.wins, 'ties': r.ties, 'losses': r.losses,
+        'equity_sum': r.equity_sum, 'equity_sq_sum': r.equity_sq_sum,
+    }
+
+
+def _table(scenario, seed):
+    """
+    Showdown statistics of scenario['hands'] random deals for one seed
+    """
+    players = scenario.get('players', 6)
+    chunk = deal_chunk(np.random.RandomState([scenario['seed'], seed]), players, scenario['hands'])
+    winners = chunk['winners']
+    seats = (winners[:, None] >> np.arange(players)) & 1
+    return {
+        'hands': int(len(winners)),
+        'categories': np.bincount(chunk['category'].ravel(), minlength=len(CATEGORIES)).tolist(),
+        'wins': seats.sum(axis=0).tolist(),
+        'split_pots': int((seats.sum(axis=1) > 1).sum()),
+    }
+
+
+## scenario type to function of (scenario, seed) returning an aggregate
+SCENARIOS = {
+    'equity': _equity,
+    'table': _table,
+}
+
+
+def run_unit(scenario, start, stop):
+    """
+    Aggregate of seeds start to stop - 1 of a scenario. This is
+    what a worker computes for one work unit.
+    """
+    func = SCENARIOS[scenario['type']]
+    result = {}
+    for seed in range(start, stop):
+        result = merge(result, func(scenario, seed))
+    return result
+
+
+def _units(seeds, unit_size):
+    return [(start, min(start + unit_size, seeds)) for start in range(0, seeds, unit_size)]
+
+
+def run_local(scenario, seeds, unit_size=10):
+    """
+    Compute a scenario in this process. Gives the same aggregate
+    as a distributed run with the same seeds and unit_size.
+    """
+    result = {}
+    for start, stop in _units(seeds, unit_size):
+        result = merge(result, run_unit(scenario, start, stop))
+    return result
+
+
+def to_equity_result(aggregate):
+    """
+    :param aggregate: result of an 'equity' scenario
+    :return: EquityResult
+    """
+    return EquityResult(aggregate['wins'], aggregate['ties'], aggregate['losses'],
+                        aggregate['equity_sum'], aggregate['equity_sq_sum'])
+
+
+class Coordinator(object):
+    """
+    Hands out work units over TCP and merges the results.
+
+    The seeds of a scenario are split into units of unit_size seeds.
+    A worker asks for a unit, which is leased to it until its result
+    arrives. A unit goes back in the queue if the worker's connection
+    drops or its lease times out, and only the first result for each
+    unit is kept, so failed workers neither lose nor duplicate work.
+    Results are merged in unit order, so the aggregate only depends on
+    the scenario, seeds and unit_size.
+    """
+    def __init__(self, scenario, seeds, unit_size=10, host='127.0.0.1', port=0, lease_timeout=60.0):
+        if scenario['type'] not in SCENARIOS:
+            raise ValueError('unknown scenario type "{}"'.format(scenario['type']))
+        self.scenario = scenario
+        self.units = _units(seeds, unit_size)
+        self.lease_timeout = lease_timeout
+        self.pending = deque(range(len(self.units)))
+        ## unit to (deadline, connection id)
+        self.leases = {}
+        self.results = {}
+        self.duplicates = 0
+        self.requeued = 0
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        if not self.units:
+            self.finished.set()
+
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((host, port))
+        self.server.listen(64)
+        self.address = self.server.getsockname()
+        self._closed = False
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._accept)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._closed = True
+        try:
+            self.server.close()
+        except socket.error:
+            pass
+
+    def _accept(self):
+        connection = 0
+        while not self._closed:
+            try:
+                conn, _ = self.server.accept()
+            except (socket.error, OSError):
+                return
+            connection += 1
+            thread = threading.Thread(target=self._serve, args=(conn, connection))
+            thread.daemon = True
+            thread.start()
+
+    def _expire(self):
+        now = time.time()
+        for unit, (deadline, _) in list(self.leases.items()):
+            if deadline < now:
+                LOG.warning('lease of unit {} timed out'.format(unit))
+                self._requeue(unit)
+
+    def _requeue(self, unit):
+        del self.leases[unit]
+        if unit not in self.results:
+            self.pending.appendleft(unit)
+            self.requeued += 1
+
+    def _assign(self, connection):
+        with self.lock:
+            self._expire()
+            if self.pending:
+                unit = self.pending.popleft()
+                self.leases[unit] = (time.time() + self.lease_timeout, connection)
+                start, stop = self.units[unit]
+                return {'type': 'work', 'unit': unit, 'scenario': self.scenario, 'start': start, 'stop': stop}
+            if self.finished.is_set():
+                return {'type': 'stop'}
+            return {'type': 'wait', 'delay': 0.05}
+
+    def _complete(self, unit, result):
+        with self.lock:
+            if unit in self.results:
+                self.duplicates += 1
+                return
+            self.results[unit] = result
+            self.leases.pop(unit, None)
+            if unit in self.pending:
+                self.pending.remove(unit)
+            if len(self.results) == len(self.units):
+                self.finished.set()
+
+    def _serve(self, conn, connection):
+        try:
+            while True:
+                message = recv_message(conn)
+                if message is None:
+                    break
+                if message['type'] == 'result':
+                    self._complete(message['unit'], message['result'])
+                reply = self._assign(connection)
+                send_message(conn, reply)
+                if reply['type'] == 'stop':
+                    break
+        except (socket.error, ValueError) as e:
+            LOG.warning('worker connection {} failed: {}'.format(connection, e))
+        finally:
+            with self.lock:
+                for unit, (_, holder) in list(self.leases.items()):
+                    if holder == connection:
+                        self._requeue(unit)
+            conn.close()
+
+    def wait(self, timeout=None):
+        """
+        Block until every unit has a result
+        :return: the merged aggregate
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.finished.wait(0.1):
+            with self.lock:
+                self._expire()
+            if deadline is not None and time.time() > deadline:
+                raise RuntimeError('{} of {} units finished before the timeout'.format(
+                    len(self.results), len(self.units)))
+        result = {}
+        for unit in range(len(self.units)):
+            result = merge(result, self.results[unit])
+        return result
+
+
+def run_worker(host, port):
+    """
+    Connect to a Coordinator and process work units until told to stop
+    :return: number of units processed
+    """
+    sock = socket.create_connection((host, port))
+    done = 0
+    try:
+        send_message(sock, {'type': 'request'})
+        while True:
+            message = recv_message(sock)
+            if message is None or message['type'] == 'stop':
+                break
+            if message['type'] == 'wait':
+                time.sleep(message['delay'])
+                send_message(sock, {'type': 'request'})
+                continue
+            result = run_unit(message['scenario'], message['start'], message['stop'])
+            done += 1
+            send_message(sock, {'type': 'result', 'unit': message['unit'], 'result': result})
+    finally:
+        sock.close()
+    return done
+
+
+def run_distributed(scenario, seeds, workers=2, unit_size=10, timeout=None, lease_timeout=60.0):
+    """
+    Run a scenario with a Coordinator and workers local processes
+    :return: the merged aggregate
+    """
+    with Coordinator(scenario, seeds, unit_size, lease_timeout=lease_timeout) as coordinator:
+        host, port = coordinator.address
+        processes = [Process(target=run_worker, args=(host, port)) for _ in range(workers)]
+        for p in processes:
+            p.daemon = True
+            p.start()
+        try:
+            return coordinator.wait(timeout)
+        finally:
+            for p in processes:
+                p.join(5)
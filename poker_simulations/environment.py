@@ -0,0 +1,333 @@
+import logging
+import numpy as np
+from batch import evaluate_batch
+from game import PREFLOP, RIVER, BOARD_SIZE, FOLD, CHECK, CALL, BET, RAISE
+
+LOG = logging.getLogger(__name__)
+
+## the discrete actions of VectorEnv.step
+ENV_ACTIONS = ('fold', 'check_call', 'half_pot', 'pot', 'all_in')
+FOLD_ACTION, CALL_ACTION, HALF_POT_ACTION, POT_ACTION, ALL_IN_ACTION = range(len(ENV_ACTIONS))
+N_ACTIONS = len(ENV_ACTIONS)
+
+## fraction of the pot, after calling, raised by the sized actions
+POT_FRACTIONS = ((HALF_POT_ACTION, 0.5), (POT_ACTION, 1.0))
+
+## board card ids not showing yet
+HIDDEN = -1
+
+
+class VectorEnv(object):
+    """
+    Many independent No-Limit Hold'em tables advanced in lockstep.
+
+    The rules are those of game.Dealer, but every table is a row of
+    numpy arrays instead of a Python object: step takes one action per
+    table for its seat to act and deals, betting and showdowns are
+    worked out for the whole batch at once. Every hand starts with the
+    same stacks and the button moves one seat per hand.
+
+    Actions are indices of ENV_ACTIONS. check_call checks or calls,
+    half_pot and pot raise by that fraction of the pot after calling
+    (at least a full raise) and all_in moves the whole stack in. The
+    raises are legal while the seat can still raise, as in
+    Dealer.legal_actions, even when sizes end up the same.
+    """
+    def __init__(self, tables=1024, players=2, stacks=200, small_blind=1, big_blind=2, seed=None,
+                 auto_reset=True):
+        """
+        :param tables: number of tables
+        :param players: seats at each table
+        :param stacks: starting chips of every seat
+        :param seed: for numpy.random.RandomState
+        :param auto_reset: deal a new hand at a table as soon as its hand is finished
+        """
+        if players < 2:
+            raise ValueError('need at least 2 players. Got "{}"'.format(players))
+        if tables < 1:
+            raise ValueError('need at least 1 table. Got "{}"'.format(tables))
+        self.tables = tables
+        self.players = players
+        self.start_stack = stacks
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.auto_reset = auto_reset
+        self.rng = np.random.RandomState(seed)
+
+        t, p = tables, players
+        self.hole = np.zeros((t, p, 2), dtype=np.int16)
+        self.runout = np.zeros((t, 5), dtype=np.int16)
+        self.stacks = np.zeros((t, p), dtype=np.int64)
+        self.bets = np.zeros((t, p), dtype=np.int64)
+        self.contributed = np.zeros((t, p), dtype=np.int64)
+        self.folded = np.zeros((t, p), dtype=bool)
+        self.all_in = np.zeros((t, p), dtype=bool)
+        self.acted = np.zeros((t, p), dtype=bool)
+        self.payoffs = np.zeros((t, p), dtype=np.int64)
+        self.street = np.zeros(t, dtype=np.int8)
+        self.to_act = np.zeros(t, dtype=np.int64)
+        self.current_bet = np.zeros(t, dtype=np.int64)
+        self.min_raise = np.zeros(t, dtype=np.int64)
+        self.button = np.full(t, p - 1, dtype=np.int64)
+        self.done = np.ones(t, dtype=bool)
+        self.hands = 0
+
+        self._rows = np.arange(t)
+        self._seats = np.arange(p)
+
+    def reset(self, mask=None):
+        """
+        Deal new hands and post the blinds
+        :param mask: boolean array of the tables to reset. All by default
+        :return: observe()
+        """
+        rows = self._rows if mask is None else np.flatnonzero(mask)
+        if len(rows):
+            self._deal(rows)
+        return self.observe()
+
+    def _deal(self, rows):
+        n, p = len(rows), self.players
+        need = 2 * p + 5
+        keys = self.rng.random_sample((n, 52))
+        ## argsort rather than argpartition, which orders the cards it
+        ## picks by id and so gives lower seats lower cards
+        cards = np.argsort(keys, axis=1)[:, :need].astype(np.int16)
+        self.hole[rows] = cards[:, :2 * p].reshape(n, p, 2)
+        self.runout[rows] = cards[:, 2 * p:]
+
+        self.stacks[rows] = self.start_stack
+        for name in ('bets', 'contributed', 'payoffs'):
+            getattr(self, name)[rows] = 0
+        for name in ('folded', 'all_in', 'acted'):
+            getattr(self, name)[rows] = False
+        self.street[rows] = PREFLOP
+        self.done[rows] = False
+        self.button[rows] = button = (self.button[rows] + 1) % p
+        self.hands += n
+
+        ## heads up the button posts the small blind
+        sb = button if p == 2 else (button + 1) % p
+        bb = (sb + 1) % p
+        self._put(rows, sb, np.minimum(self.small_blind, self.stacks[rows, sb]))
+        self._put(rows, bb, np.minimum(self.big_blind, self.stacks[rows, bb]))
+        self.current_bet[rows] = self.bets[rows].max(axis=1)
+        self.min_raise[rows] = self.big_blind
+        self._advance(rows, bb)
+
+    def _put(self, rows, seats, chips):
+        self.stacks[rows, seats] -= chips
+        self.bets[rows, seats] += chips
+        self.contributed[rows, seats] += chips
+        self.all_in[rows, seats] = self.stacks[rows, seats] == 0
+
+    def _next(self, rows, seats):
+        """
+        next seat after seats that can still act, or -1
+        """
+        order = (seats[:, None] + 1 + self._seats) % self.players
+        able = ~self.folded[rows[:, None], order] & ~self.all_in[rows[:, None], order]
+        return np.where(able.any(axis=1), order[np.arange(len(rows)), able.argmax(axis=1)], -1)
+
+    def _advance(self, rows, seats):
+        """
+        Move on after seats acted: finish hands with one seat
+        left, end betting rounds that are over and otherwise
+        pass the action on
+        """
+        if not len(rows):
+            return
+        live = (~self.folded[rows]).sum(axis=1)
+        won = live == 1
+        self._finish(rows[won])
+        rows, seats = rows[~won], seats[~won]
+
+        pending = ~self.folded[rows] & ~self.all_in[rows] & (
+            ~self.acted[rows] | (self.bets[rows] != self.current_bet[rows, None]))
+        after = self._next(rows, seats)
+        over = ~pending.any(axis=1) | (after < 0)
+        self.to_act[rows[~over]] = after[~over]
+
+        rows = rows[over]
+        able = (~self.folded[rows] & ~self.all_in[rows]).sum(axis=1)
+        ## nobody left to bet against, deal the rest of the board
+        showdown = (self.street[rows] == RIVER) | (able < 2)
+        self.street[rows[showdown]] = RIVER
+        self._finish(rows[showdown])
+
+        rows = rows[~showdown]
+        self.street[rows] += 1
+        self.bets[rows] = 0
+        self.acted[rows] = False
+        self.current_bet[rows] = 0
+        self.min_raise[rows] = self.big_blind
+        self.to_act[rows] = self._next(rows, self.button[rows])
+
+    def _finish(self, rows):
+        """
+        Showdown and side pots of finished hands, as Dealer._finish
+        """
+        if not len(rows):
+            return
+        n, p = len(rows), self.players
+        contributed = self.contributed[rows]
+        live = ~self.folded[rows]
+
+        hands = np.empty((n, p, 7), dtype=np.int16)
+        hands[:, :, :2] = self.hole[rows]
+        hands[:, :, 2:] = self.runout[rows, None, :]
+        strengths = evaluate_batch(hands.reshape(-1, 7))[0].reshape(n, p)
+        strengths = np.where(live, strengths, -1)
+
+        ## odd chips go to the first winner left of the button
+        position = (self._seats - self.button[rows, None] - 1) % p
+        by_position = np.argsort(position, axis=1)
+        index = np.arange(n)[:, None]
+
+        ## pots split at the contributions of live seats, the last
+        ## one also takes anything folded seats put in above it
+        levels = np.sort(np.where(live, contributed, 0), axis=1)
+        won = np.zeros((n, p), dtype=np.int64)
+        low = np.zeros(n, dtype=np.int64)
+        for k in range(p):
+            level = levels[:, k]
+            high = level if k < p - 1 else contributed.max(axis=1)
+            amount = (np.minimum(contributed, high[:, None]) - np.minimum(contributed, low[:, None])).sum(axis=1)
+            low = high
+            eligible = live & (contributed >= level[:, None])
+            best = np.where(eligible, strengths, -1).max(axis=1)
+            winners = eligible & (strengths == best[:, None])
+            count = np.maximum(winners.sum(axis=1), 1)
+            share, odd = np.divmod(amount, count)
+            rank = np.empty((n, p), dtype=np.int64)
+            rank[index, by_position] = np.cumsum(winners[index, by_position], axis=1) - 1
+            won += winners * (share[:, None] + (rank < odd[:, None]))
+
+        self.stacks[rows] += won
+        self.payoffs[rows] = self.stacks[rows] - self.start_stack
+        self.to_act[rows] = -1
+        self.done[rows] = True
+
+    def legal_mask(self):
+        """
+        :return: (tables, N_ACTIONS) bool array of the actions open to
+            the seat to act. All False at finished tables
+        """
+        rows = self._rows
+        seat = np.maximum(self.to_act, 0)
+        stack = self.stacks[rows, seat]
+        to_call = self.current_bet - self.bets[rows, seat]
+        mask = np.zeros((self.tables, N_ACTIONS), dtype=bool)
+        mask[:, FOLD_ACTION] = to_call > 0
+        mask[:, CALL_ACTION] = True
+        ## an all in for less than a full raise doesn't reopen the betting
+        mask[:, HALF_POT_ACTION:] = ((stack > to_call) & ~self.acted[rows, seat])[:, None]
+        mask[self.done] = False
+        return mask
+
+    def amounts(self):
+        """
+        :return: (tables, N_ACTIONS) int array of the street total the
+            seat to act would have bet after each action
+        """
+        rows = self._rows
+        seat = np.maximum(self.to_act, 0)
+        bet = self.bets[rows, seat]
+        most = bet + self.stacks[rows, seat]
+        to_call = self.current_bet - bet
+        result = np.empty((self.tables, N_ACTIONS), dtype=np.int64)
+        result[:, FOLD_ACTION] = bet
+        result[:, CALL_ACTION] = np.minimum(self.current_bet, most)
+        least = np.minimum(self.current_bet + self.min_raise, most)
+        pot = self.contributed.sum(axis=1) + to_call
+        for action, fraction in POT_FRACTIONS:
+            size = self.current_bet + (pot * fraction).astype(np.int64)
+            result[:, action] = np.clip(size, least, most)
+        result[:, ALL_IN_ACTION] = most
+        return result
+
+    def dealer_actions(self, actions):
+        """
+        The game.Dealer action and amount of each discrete action, e.g.
+        to record hands with history.HistoryWriter
+        :return: tuple of (kind, amount) int arrays
+        """
+        actions = np.asarray(actions)
+        bet = self.bets[self._rows, np.maximum(self.to_act, 0)]
+        amount = self.amounts()[self._rows, actions]
+        kind = np.where(self.current_bet > 0, RAISE, BET)
+        kind = np.where(actions == CALL_ACTION, np.where(self.current_bet > bet, CALL, CHECK), kind)
+        kind = np.where(actions == FOLD_ACTION, FOLD, kind)
+        ## a call records the chips added, a bet or raise the street total
+        amount = np.where(kind == CALL, amount - bet, amount)
+        return kind, np.where((kind == FOLD) | (kind == CHECK), 0, amount)
+
+    def step(self, actions):
+        """
+        Apply one action at every table that isn't finished
+        :param actions: (tables,) ints in ENV_ACTIONS for the seat to act.
+            Ignored at finished tables
+        :return: tuple of (observe(), rewards, done). rewards is a (tables,
+            players) array of the net chips won by each seat at tables
+            whose hand finished with this step, and 0 elsewhere. done
+            marks those tables; with auto_reset they have already been
+            dealt a new hand and the observation is of that hand
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.tables,):
+            raise ValueError('actions should have shape ({},). Got "{}"'.format(self.tables, actions.shape))
+        rows = np.flatnonzero(~self.done)
+        acts = actions[rows]
+        legal = (acts >= 0) & (acts < N_ACTIONS)
+        legal[legal] = self.legal_mask()[rows[legal], acts[legal]]
+        if not legal.all():
+            bad = rows[~legal][0]
+            raise ValueError('illegal action at table {}. Got "{}"'.format(bad, actions[bad]))
+
+        seats = self.to_act[rows]
+        target = self.amounts()[rows, acts]
+        fold = acts == FOLD_ACTION
+        self.folded[rows[fold], seats[fold]] = True
+        put = ~fold
+        self._put(rows[put], seats[put], (target - self.bets[rows, seats])[put])
+
+        raised = acts >= HALF_POT_ACTION
+        raise_by = target - self.current_bet[rows]
+        full = raised & (raise_by >= self.min_raise[rows])
+        self.min_raise[rows[full]] = raise_by[full]
+        self.acted[rows[full]] = False
+        self.current_bet[rows[raised]] = np.maximum(self.current_bet[rows[raised]], target[raised])
+        self.acted[rows, seats] = True
+        self._advance(rows, seats)
+
+        done = np.zeros(self.tables, dtype=bool)
+        done[rows[self.done[rows]]] = True
+        rewards = np.where(done[:, None], self.payoffs, 0)
+        if self.auto_reset and done.any():
+            self._deal(np.flatnonzero(done))
+        return self.observe(), rewards, done
+
+    def observe(self):
+        """
+        What the seat to act at each table sees. Per seat arrays are
+        rotated so column 0 is the seat to act.
+        :return: dict of name to array with one row per table
+        """
+        rows = self._rows
+        seat = np.maximum(self.to_act, 0)
+        order = (seat[:, None] + self._seats) % self.players
+        board = np.where(np.arange(5) < np.take(BOARD_SIZE, self.street)[:, None], self.runout, HIDDEN)
+        return {
+            'hole': self.hole[rows, seat],
+            'board': board.astype(np.int16),
+            'street': self.street.copy(),
+            'seat': self.to_act.copy(),
+            'position': (seat - self.button - 1) % self.players,
+            'pot': self.contributed.sum(axis=1),
+            'to_call': self.current_bet - self.bets[rows, seat],
+            'stacks': self.stacks[rows[:, None], order],
+            'bets': self.bets[rows[:, None], order],
+            'folded': self.folded[rows[:, None], order],
+            'mask': self.legal_mask(),
+            'done': self.done.copy(),
+        }
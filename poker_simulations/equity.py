@@ -0,0 +1,520 @@
+import logging
+import multiprocessing
+import os
+import random
+from collections import deque
+from itertools import permutations
+from math import sqrt, erf
+from timeit import default_timer
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from game import MAX_PLAYERS, to_id
+from batch import evaluate_batch
+
+LOG = logging.getLogger(__name__)
+
+
+class EquityResult(object):
+    """
+    Outcome counts of an equity calculation from the point
+    of view of one player.
+
+    A tie is any showdown where the player shares the pot.
+    Each sample is worth 1 for a win, 1 / k for a k way tie and
+    0 for a loss; equity is the mean of those values. Results
+    from separate runs can be merged with +. exact results come
+    from a full enumeration and have no standard errors.
+    """
+    def __init__(self, wins=0, ties=0, losses=0, equity_sum=0.0, equity_sq_sum=0.0, exact=False):
+        self.wins = wins
+        self.ties = ties
+        self.losses = losses
+        self.equity_sum = equity_sum
+        self.equity_sq_sum = equity_sq_sum
+        self.exact = exact
+
+    def __str__(self):
+        return "EquityResult(equity={:.4f} +/- {:.4f}, win={:.4f}, tie={:.4f}, loss={:.4f}, n={})".format(
+            self.equity, self.equity_se, self.win, self.tie, self.loss, self.iterations
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __add__(self, other):
+        if not isinstance(other, EquityResult):
+            return NotImplemented
+        return EquityResult(
+            self.wins + other.wins,
+            self.ties + other.ties,
+            self.losses + other.losses,
+            self.equity_sum + other.equity_sum,
+            self.equity_sq_sum + other.equity_sq_sum,
+            self.exact and other.exact,
+        )
+
+    def __radd__(self, other):
+        ## so that sum() works
+        if other == 0:
+            return self
+        return self.__add__(other)
+
+    @property
+    def iterations(self):
+        return self.wins + self.ties + self.losses
+
+    def _frequency(self, count):
+        if not self.iterations:
+            return 0.0
+        return float(count) / self.iterations
+
+    def _binomial_se(self, p):
+        if not self.iterations or self.exact:
+            return 0.0
+        return sqrt(p * (1 - p) / self.iterations)
+
+    @property
+    def win(self):
+        return self._frequency(self.wins)
+
+    @property
+    def tie(self):
+        return self._frequency(self.ties)
+
+    @property
+    def loss(self):
+        return self._frequency(self.losses)
+
+    @property
+    def win_se(self):
+        return self._binomial_se(self.win)
+
+    @property
+    def tie_se(self):
+        return self._binomial_se(self.tie)
+
+    @property
+    def loss_se(self):
+        return self._binomial_se(self.loss)
+
+    @property
+    def equity(self):
+        return self._frequency(self.equity_sum)
+
+    @property
+    def variance(self):
+        """
+        sample variance of the per deal equity
+        """
+        n = self.iterations
+        if n < 2:
+            return 0.0
+        mean = self.equity_sum / n
+        return max(self.equity_sq_sum - n * mean * mean, 0.0) / (n - 1)
+
+    @property
+    def equity_se(self):
+        if not self.iterations or self.exact:
+            return 0.0
+        return sqrt(self.variance / self.iterations)
+
+    def half_width(self, confidence=0.95):
+        """
+        half width of the normal confidence interval of equity
+        """
+        return z_score(confidence) * self.equity_se
+
+
+class AdaptiveResult(EquityResult):
+    """
+    EquityResult of adaptive_equity with how and why it stopped.
+    reason is 'precision', 'time' or 'iterations'.
+    """
+    def __init__(self, result, confidence, target, reason, elapsed):
+        super(AdaptiveResult, self).__init__(
+            result.wins, result.ties, result.losses, result.equity_sum, result.equity_sq_sum
+        )
+        self.confidence = confidence
+        self.target = target
+        self.reason = reason
+        self.elapsed = elapsed
+
+    def __str__(self):
+        return "AdaptiveResult(equity={:.4f} +/- {:.4f} ({:.0%}), n={}, reason={}, elapsed={:.3f}s)".format(
+            self.equity, self.precision, self.confidence, self.iterations, self.reason, self.elapsed
+        )
+
+    @property
+    def precision(self):
+        """
+        achieved confidence interval half width
+        """
+        return self.half_width(self.confidence)
+
+
+def z_score(confidence):
+    """
+    z such that a standard normal lies within +/- z with
+    probability confidence
+    """
+    if not 0 < confidence < 1:
+        raise ValueError('confidence should be between 0 and 1. Got "{}"'.format(confidence))
+    low, high = 0.0, 40.0
+    for _ in range(100):
+        mid = (low + high) / 2
+        if erf(mid / sqrt(2)) < confidence:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def _check_cards(hole_cards, board, players, opponent=None):
+    """
+    Convert cards to ids and check they describe a valid deal
+    :return: tuple of (hole ids, board ids)
+    """
+    hole = [to_id(i) for i in hole_cards]
+    board = [to_id(i) for i in (board or [])]
+    opponent = [to_id(i) for i in (opponent or [])]
+    if len(hole) != 2:
+        raise ValueError('hole_cards should be 2 cards. Got "{}"'.format(len(hole)))
+    if len(opponent) not in (0, 2):
+        raise ValueError('opponent should be 2 cards. Got "{}"'.format(len(opponent)))
+    if len(board) not in (0, 3, 4, 5):
+        raise ValueError('board should be 0, 3, 4 or 5 cards. Got "{}"'.format(len(board)))
+    known = hole + board + opponent
+    if len(set(known)) != len(known):
+        raise ValueError('hole_cards, board and opponent contain duplicate cards')
+    if not 2 <= players <= MAX_PLAYERS:
+        raise ValueError('players should be between 2 and {}. Got "{}"'.format(MAX_PLAYERS, players))
+    return hole, board
+
+
+def showdown_shares(strengths):
+    """
+    Share of the pot won by the first player of each row.
+    :param strengths: (N, players) array of hand strengths
+    :return: float array of length N. 1 for a win, 1 / k for a k way tie
+    """
+    hero = strengths[:, 0]
+    best = strengths[:, 1:].max(axis=1)
+    shares = np.where(hero > best, 1.0, 0.0)
+    ## ties are split between everyone holding the best hand
+    split = 1.0 + (strengths[:, 1:] == hero[:, None]).sum(axis=1)
+    return np.where(hero == best, 1.0 / split, shares)
+
+
+def showdown(strengths):
+    """
+    Score the first player of each row against the others.
+    :param strengths: (N, players) array of hand strengths
+    :return: EquityResult for player 0
+    """
+    hero = strengths[:, 0]
+    best = strengths[:, 1:].max(axis=1)
+    shares = showdown_shares(strengths)
+    wins = int((hero > best).sum())
+    ties = int((hero == best).sum())
+    return EquityResult(
+        wins, ties, len(hero) - wins - ties,
+        float(shares.sum()), float((shares * shares).sum())
+    )
+
+
+def deal_completions(rng, hole, board, players, iterations):
+    """
+    Deal random opponent hole cards and board completions.
+    :return: (iterations, players, 7) array of card ids with
+        the hero's cards in player 0
+    """
+    known = set(hole + board)
+    deck = np.array([i for i in range(52) if i not in known], dtype=np.int16)
+    n_board = 5 - len(board)
+    need = n_board + 2 * (players - 1)
+
+    order = np.argsort(rng.random_sample((iterations, len(deck))), axis=1)[:, :need]
+    drawn = deck[order]
+
+    runout = np.empty((iterations, 5), dtype=np.int16)
+    runout[:, :len(board)] = board
+    runout[:, len(board):] = drawn[:, :n_board]
+
+    cards = np.empty((iterations, players, 7), dtype=np.int16)
+    cards[:, :, 2:] = runout[:, None, :]
+    cards[:, 0, :2] = hole
+    cards[:, 1:, :2] = drawn[:, n_board:].reshape(iterations, players - 1, 2)
+    return cards
+
+
+def simulate_chunk(hole, board, players, iterations, seed, sampler=None):
+    """
+    Run one chunk of a Monte Carlo equity calculation. This is
+    the unit of work sent to each worker process; the result
+    only depends on the arguments.
+    :param seed: sequence of ints used to seed numpy.random.RandomState
+    :param sampler: function with the arguments of deal_completions,
+        e.g. a sampling.Sampler. deal_completions by default
+    :return: EquityResult
+    """
+    rng = np.random.RandomState(seed)
+    cards = (sampler or deal_completions)(rng, hole, board, players, iterations)
+    strengths = evaluate_batch(cards.reshape(-1, 7))[0].reshape(iterations, players)
+    return showdown(strengths)
+
+
+def _simulate_chunk(args):
+    return simulate_chunk(*args)
+
+
+def monte_carlo_equity(hole_cards, board=None, players=2, iterations=100000,
+                       seed=None, workers=1, chunk_size=10000, sampler=None):
+    """
+    Estimate the equity of hole_cards against players - 1
+    opponents holding random cards.
+
+    The iterations are split into chunks of chunk_size deals and
+    chunk i is seeded with (seed, i), so a given seed gives the same
+    answer whatever the number of workers.
+    :param hole_cards: 2 Cards or card ids
+    :param board: 0, 3, 4 or 5 known board Cards or card ids
+    :param players: number of players including the hero
+    :param iterations: number of random deals
+    :param seed: int. A random seed is chosen when None
+    :param workers: number of worker processes. 1 runs in this
+        process and None uses one worker per cpu.
+    :param chunk_size: deals per unit of work
+    :param sampler: how to deal the unknown cards (see simulate_chunk)
+    :return: EquityResult
+    """
+    hole, board = _check_cards(hole_cards, board, players)
+    if iterations < 1:
+        raise ValueError('iterations should be at least 1. Got "{}"'.format(iterations))
+    if chunk_size < 1:
+        raise ValueError('chunk_size should be at least 1. Got "{}"'.format(chunk_size))
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 32 - 1)
+
+    jobs = []
+    for i, start in enumerate(range(0, iterations, chunk_size)):
+        n = min(chunk_size, iterations - start)
+        jobs.append((hole, board, players, n, [seed, i], sampler))
+
+    if workers is None:
+        workers = os.cpu_count() if hasattr(os, 'cpu_count') else None
+    if workers == 1 or len(jobs) == 1:
+        return sum(simulate_chunk(*i) for i in jobs)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(_simulate_chunk, jobs))
+
+
+def adaptive_equity(hole_cards, board=None, players=2, precision=0.005, confidence=0.95,
+                    max_iterations=1000000, max_time=None, seed=None, workers=1, batch_size=5000,
+                    sampler=None):
+    """
+    Monte Carlo equity that stops as soon as the confidence
+    interval is narrow enough.
+
+    Deals are run in batches of batch_size seeded like the chunks of
+    monte_carlo_equity. After each batch the running mean and variance
+    are checked and the run stops once the half width of the confidence
+    interval is at most precision, max_time seconds have passed or
+    max_iterations deals are done. Batches are checked in order, so
+    without max_time the result doesn't depend on workers.
+    :param precision: target half width of the confidence interval
+    :param confidence: e.g. 0.95 for a 95% interval
+    :param max_iterations: largest number of deals
+    :param max_time: seconds. No limit when None
+    :param workers: number of worker processes. None uses one per cpu
+    :param sampler: how to deal the unknown cards (see simulate_chunk)
+    :return: AdaptiveResult
+    """
+    hole, board = _check_cards(hole_cards, board, players)
+    if max_iterations < 1:
+        raise ValueError('max_iterations should be at least 1. Got "{}"'.format(max_iterations))
+    if batch_size < 1:
+        raise ValueError('batch_size should be at least 1. Got "{}"'.format(batch_size))
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 32 - 1)
+    z_score(confidence)
+    start = default_timer()
+
+    def jobs():
+        for i, first in enumerate(range(0, max_iterations, batch_size)):
+            yield (hole, board, players, min(batch_size, max_iterations - first), [seed, i], sampler)
+
+    def done(result):
+        if result.iterations > 1 and result.half_width(confidence) <= precision:
+            return 'precision'
+        if max_time is not None and default_timer() - start >= max_time:
+            return 'time'
+        return None
+
+    result = EquityResult()
+    reason = 'iterations'
+    if workers is None:
+        ## the executor's own default, needed here to size the window
+        workers = multiprocessing.cpu_count()
+    if workers == 1:
+        for job in jobs():
+            result += simulate_chunk(*job)
+            reason = done(result) or reason
+            if reason != 'iterations':
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            ## keep every worker busy while results are checked in order
+            pending = deque()
+            queue = jobs()
+            for job in queue:
+                pending.append(executor.submit(simulate_chunk, *job))
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                result += pending.popleft().result()
+                reason = done(result) or reason
+                if reason != 'iterations':
+                    for future in pending:
+                        future.cancel()
+                    break
+                for job in queue:
+                    pending.append(executor.submit(simulate_chunk, *job))
+                    break
+    return AdaptiveResult(result, confidence, precision, reason, default_timer() - start)
+
+
+def combinations_array(n, k):
+    """
+    Every k combination of range(n) as rows of an array,
+    in the same order as itertools.combinations.
+    :return: (C(n, k), k) int16 array
+    """
+    rows = np.arange(n, dtype=np.int16)[:, None]
+    for _ in range(k - 1):
+        last = rows[:, -1].astype(np.int64)
+        counts = n - 1 - last
+        repeated = np.repeat(rows, counts, axis=0)
+        ## position of each new row within its group of repeats
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        within = np.arange(len(repeated)) - starts
+        new = np.repeat(last + 1, counts) + within
+        rows = np.hstack([repeated, new[:, None].astype(np.int16)])
+    if k == 0:
+        return np.zeros((1, 0), dtype=np.int16)
+    return rows
+
+
+def suit_symmetries(*fixed):
+    """
+    Suit permutations that map each set of cards in fixed
+    onto itself. Situations related by one of these
+    permutations have the same equity.
+    :param fixed: sequences of card ids
+    :return: list of length 52 arrays mapping card id to card id
+    """
+    group = []
+    for perm in permutations(range(4)):
+        mapping = np.array([(i & ~3) | perm[i & 3] for i in range(52)], dtype=np.int16)
+        if all(set(mapping[list(cards)].tolist()) == set(cards) for cards in fixed):
+            group.append(mapping)
+    return group
+
+
+def _encode(segments):
+    """
+    pack rows of sorted card ids into one int64 per row
+    """
+    key = np.zeros(len(segments[0]), dtype=np.int64)
+    for segment in segments:
+        for col in range(segment.shape[1]):
+            key = key * 52 + segment[:, col]
+    return key
+
+
+def canonical_situations(segments, group):
+    """
+    Collapse rows that are equivalent under the suit permutations
+    in group. Each segment is an (N, k) array of unordered cards,
+    e.g. the opponent's hole cards and the board runout, with
+    each row sorted in ascending order.
+    :return: tuple of (representative segments, weights) where
+        weights counts how many of the original rows each
+        representative stands for
+    """
+    if len(group) < 2:
+        return segments, np.ones(len(segments[0]), dtype=np.int64)
+
+    best = None
+    for mapping in group:
+        key = _encode([np.sort(mapping[i], axis=1) for i in segments])
+        best = key if best is None else np.minimum(best, key)
+
+    keys, weights = np.unique(best, return_counts=True)
+
+    ## decode the representative cards from the keys
+    sizes = [i.shape[1] for i in segments]
+    cards = np.empty((len(keys), sum(sizes)), dtype=np.int16)
+    rest = keys.copy()
+    for col in range(sum(sizes) - 1, -1, -1):
+        cards[:, col] = rest % 52
+        rest //= 52
+    reps = np.split(cards, np.cumsum(sizes)[:-1], axis=1)
+    return reps, weights
+
+
+def exact_equity(hole_cards, board=None, opponent=None):
+    """
+    Exact heads up equity, enumerating every board completion
+    and, when opponent is not given, every opponent holding.
+
+    Situations that differ only by a relabelling of suits that
+    leaves the known cards unchanged are evaluated once and weighted.
+    :param hole_cards: 2 Cards or card ids
+    :param board: 0, 3, 4 or 5 known board cards
+    :param opponent: 2 known opponent cards or None for a random hand
+    :return: EquityResult with counts over every enumerated situation
+    """
+    hole, board = _check_cards(hole_cards, board, 2, opponent)
+    opponent = [to_id(i) for i in (opponent or [])]
+    if not opponent and not board:
+        raise ValueError('enumerating preflop against a random hand is too expensive. '
+                         'Give the opponent cards or use monte_carlo_equity')
+
+    known = set(hole + board + opponent)
+    deck = np.array([i for i in range(52) if i not in known], dtype=np.int16)
+    n_board = 5 - len(board)
+
+    runouts = deck[combinations_array(len(deck), n_board)]
+    if opponent:
+        segments = [runouts]
+    else:
+        pairs = deck[combinations_array(len(deck), 2)]
+        runout_index = np.repeat(np.arange(len(runouts)), len(pairs))
+        pair_index = np.tile(np.arange(len(pairs)), len(runouts))
+        r = runouts[runout_index]
+        p = pairs[pair_index]
+        ## drop opponent hands that share a card with the runout
+        overlap = (r[:, :, None] == p[:, None, :]).any(axis=(1, 2))
+        segments = [p[~overlap], r[~overlap]]
+
+    group = suit_symmetries(hole, board, opponent)
+    reps, weights = canonical_situations(segments, group)
+
+    n = len(weights)
+    runout = reps[-1]
+    opp = reps[0] if not opponent else np.tile(np.array(opponent, dtype=np.int16), (n, 1))
+
+    cards = np.empty((n, 2, 7), dtype=np.int16)
+    cards[:, :, 2:2 + len(board)] = board
+    cards[:, :, 2 + len(board):] = runout[:, None, :]
+    cards[:, 0, :2] = hole
+    cards[:, 1, :2] = opp
+    strengths = evaluate_batch(cards.reshape(-1, 7))[0].reshape(n, 2)
+
+    hero, villain = strengths[:, 0], strengths[:, 1]
+    wins = int(weights[hero > villain].sum())
+    ties = int(weights[hero == villain].sum())
+    losses = int(weights.sum()) - wins - ties
+    equity_sum = wins + 0.5 * ties
+    return EquityResult(wins, ties, losses, equity_sum, wins + 0.25 * ties, exact=True)
@@ -0,0 +1,498 @@
+import logging
+from collections import OrderedDict, deque
+
+LOG = logging.getLogger(__name__)
+
+## hand categories in ascending order. The position of a
+## category in this tuple is the same as Hand.hand_rank_order
+CATEGORIES = (
+    'HighCard',
+    'Pair',
+    'TwoPair',
+    'ThreeOfAKind',
+    'Straight',
+    'Flush',
+    'FullHouse',
+    'FourOfAKind',
+    'StraightFlush',
+    'RoyalFlush',
+)
+(HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH,
+ FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH, ROYAL_FLUSH) = range(len(CATEGORIES))
+
+## number of cards in each rank group of a category, most
+## significant group first. Straights and flushes are handled separately
+GROUPS = {
+    HIGH_CARD: (1, 1, 1, 1, 1),
+    PAIR: (2, 1, 1, 1),
+    TWO_PAIR: (2, 2, 1),
+    THREE_OF_A_KIND: (3, 1, 1),
+    FULL_HOUSE: (3, 2),
+    FOUR_OF_A_KIND: (4, 1),
+}
+
+CATEGORY_SHIFT = 20
+
+## per card id lookups. A card id is internal_rank << 2 | suit
+## so these are indexed directly by the id.
+RANK_BIT = tuple(1 << (i >> 2) for i in range(52))
+RANK_KEY = tuple(5 ** (i >> 2) for i in range(52))
+SUIT_KEY = tuple(1 << 4 * (i & 3) for i in range(52))
+
+## each suit count lives in its own nibble and starts at 3 so
+## that the top bit of a nibble is set once a suit reaches 5 cards
+SUIT_COUNT_START = 0x3333
+FLUSH_BITS = 0x8888
+FLUSH_SUIT = {0x8: 0, 0x80: 1, 0x800: 2, 0x8000: 3}
+
+
+def make_strength(category, kickers):
+    """
+    Pack a category and its ordered kicker ranks into a single
+    integer. Larger integers are stronger hands.
+
+    The category occupies the bits from CATEGORY_SHIFT upwards
+    and each kicker takes 4 bits below it, most significant first.
+    :param category: index into CATEGORIES
+    :param kickers: internal ranks of the significant cards, in order
+    :return: int
+    """
+    strength = category << CATEGORY_SHIFT
+    shift = CATEGORY_SHIFT
+    for rank in kickers:
+        shift -= 4
+        strength |= rank << shift
+    return strength
+
+
+def category(strength):
+    """
+    :param strength: int from evaluate
+    :return: index into CATEGORIES
+    """
+    return strength >> CATEGORY_SHIFT
+
+
+def kickers(strength):
+    """
+    Unpack the five kicker ranks of strength. Unused
+    slots are 0.
+    :param strength: int from evaluate
+    :return: list of internal ranks
+    """
+    return [(strength >> (16 - 4 * i)) & 0xF for i in range(5)]
+
+
+def hand_strength(category, ranks):
+    """
+    Strength of five cards that are already known to make
+    category, e.g. the five_best of a Hand subclass.
+    :param category: index into CATEGORIES
+    :param ranks: internal ranks of the five cards
+    :return: int
+    """
+    if category in (STRAIGHT, STRAIGHT_FLUSH, ROYAL_FLUSH):
+        mask = 0
+        for r in ranks:
+            mask |= 1 << r
+        if STRAIGHT_TOP[mask] < 0:
+            raise ValueError('ranks should make a straight. Got "{}"'.format(ranks))
+        return make_strength(category, [STRAIGHT_TOP[mask]])
+
+    ranks = sorted(ranks, reverse=True)
+    if category in (HIGH_CARD, FLUSH):
+        return make_strength(category, ranks[:5])
+
+    ## bigger groups first then higher ranks
+    order = sorted(set(ranks), key=lambda r: (ranks.count(r), r), reverse=True)
+    return make_strength(category, order)
+
+
+def _straight_top(mask):
+    """
+    Internal rank of the highest card of the best straight
+    in a 13 bit rank mask or -1 if there isn't one.
+    The wheel (A, 2, 3, 4, 5) is five high.
+    """
+    for top in range(12, 3, -1):
+        pattern = 0x1F << (top - 4)
+        if mask & pattern == pattern:
+            return top
+    if mask & 0x100F == 0x100F:
+        return 3
+    return -1
+
+
+def _straight_ranks(top):
+    """
+    The ranks that make up the straight with top card top
+    """
+    if top == 3:
+        return [3, 2, 1, 0, 12]
+    return list(range(top, top - 5, -1))
+
+
+def _flush_strength(mask):
+    top = STRAIGHT_TOP[mask]
+    if top == 12:
+        return make_strength(ROYAL_FLUSH, [top])
+    if top >= 0:
+        return make_strength(STRAIGHT_FLUSH, [top])
+    ranks = [r for r in range(12, -1, -1) if mask & (1 << r)]
+    return make_strength(FLUSH, ranks[:5])
+
+
+def _rank_strength(counts):
+    """
+    Strength of the best non flush hand made from rank counts
+    :param counts: list of 13 counts indexed by internal rank
+    :return: int
+    """
+    present = [r for r in range(12, -1, -1) if counts[r]]
+    quads = [r for r in present if counts[r] == 4]
+    trips = [r for r in present if counts[r] == 3]
+    pairs = [r for r in present if counts[r] == 2]
+
+    if quads:
+        others = [r for r in present if r != quads[0]]
+        return make_strength(FOUR_OF_A_KIND, [quads[0]] + others[:1])
+
+    if trips and (len(trips) > 1 or pairs):
+        second = max(trips[1:] + pairs)
+        return make_strength(FULL_HOUSE, [trips[0], second])
+
+    mask = 0
+    for r in present:
+        mask |= 1 << r
+    top = STRAIGHT_TOP[mask]
+    if top >= 0:
+        return make_strength(STRAIGHT, [top])
+
+    if trips:
+        others = [r for r in present if r != trips[0]]
+        return make_strength(THREE_OF_A_KIND, [trips[0]] + others[:2])
+
+    if len(pairs) > 1:
+        others = [r for r in present if r not in pairs[:2]]
+        return make_strength(TWO_PAIR, pairs[:2] + others[:1])
+
+    if pairs:
+        others = [r for r in present if r != pairs[0]]
+        return make_strength(PAIR, [pairs[0]] + others[:3])
+
+    return make_strength(HIGH_CARD, present[:5])
+
+
+def _rank_multisets(size, rank=0):
+    """
+    generate every list of 13 rank counts (max 4 of each rank)
+    whose counts sum to size
+    """
+    if rank == 12:
+        if size <= 4:
+            yield [size]
+        return
+    for n in range(min(size, 4) + 1):
+        for rest in _rank_multisets(size - n, rank + 1):
+            yield [n] + rest
+
+
+class RankTable(dict):
+    """
+    Maps the sum of RANK_KEY over 5, 6 or 7 cards to the strength
+    of the best non flush hand those ranks make.
+
+    Entries are computed the first time they are looked
+    up so that importing the module stays cheap. Use
+    build to compute every entry up front.
+    """
+    def __missing__(self, key):
+        counts = []
+        rest = key
+        for r in range(13):
+            rest, n = divmod(rest, 5)
+            counts.append(n)
+        if rest or not 5 <= sum(counts) <= 7:
+            raise KeyError(key)
+        strength = self[key] = _rank_strength(counts)
+        return strength
+
+    def build(self, sizes=(5, 6, 7)):
+        """
+        compute every entry for hands of sizes cards
+        :return: self
+        """
+        for size in sizes:
+            for counts in _rank_multisets(size):
+                key = 0
+                for r in range(13):
+                    key += counts[r] * 5 ** r
+                if key not in self:
+                    self[key] = _rank_strength(counts)
+        return self
+
+
+## indexed by a 13 bit rank mask
+STRAIGHT_TOP = tuple(_straight_top(mask) for mask in range(1 << 13))
+FLUSH_TABLE = tuple(_flush_strength(mask) for mask in range(1 << 13))
+
+## keyed by the sum of RANK_KEY over the cards, which
+## uniquely identifies the ranks of 5, 6 or 7 cards
+RANK_TABLE = RankTable()
+
+
+def evaluate(ids):
+    """
+    Strength of the best five card hand that can be made
+    from 5, 6 or 7 cards.
+
+    Cost is two table lookups plus a pass over the
+    cards; no intermediate objects are created.
+    :param ids: sequence of integer card ids
+    :return: int. Compare with other strengths to rank hands
+    """
+    key = 0
+    suits = SUIT_COUNT_START
+    for i in ids:
+        key += RANK_KEY[i]
+        suits += SUIT_KEY[i]
+
+    flush = suits & FLUSH_BITS
+    if flush:
+        suit = FLUSH_SUIT[flush]
+        mask = 0
+        for i in ids:
+            if i & 3 == suit:
+                mask |= RANK_BIT[i]
+        return FLUSH_TABLE[mask]
+    return RANK_TABLE[key]
+
+
+class EvalState(object):
+    """
+    Evaluation state of a growing set of cards, e.g. the hole
+    cards plus the board so far.
+
+    The sum of RANK_KEY, the suit nibble counters and a rank
+    mask per suit are kept current, so add and remove are O(1) and
+    strength is two lookups with no pass over the cards. Use copy
+    to branch, e.g. to try each possible turn card.
+    """
+    __slots__ = ('ids', 'key', 'suits', 'suit_masks', 'rank_mask')
+
+    def __init__(self, ids=()):
+        self.ids = []
+        self.key = 0
+        self.suits = SUIT_COUNT_START
+        self.suit_masks = [0, 0, 0, 0]
+        self.rank_mask = 0
+        for i in ids:
+            self.add(i)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __str__(self):
+        return 'EvalState(ids={})'.format(self.ids)
+
+    def __repr__(self):
+        return self.__str__()
+
+    def add(self, i):
+        """
+        :param i: card id not already in the state
+        :return: self
+        """
+        self.ids.append(i)
+        self.key += RANK_KEY[i]
+        self.suits += SUIT_KEY[i]
+        self.suit_masks[i & 3] |= RANK_BIT[i]
+        self.rank_mask |= RANK_BIT[i]
+        return self
+
+    def remove(self, i):
+        """
+        Undo add of card id i
+        :return: self
+        """
+        self.ids.remove(i)
+        self.key -= RANK_KEY[i]
+        self.suits -= SUIT_KEY[i]
+        self.suit_masks[i & 3] &= ~RANK_BIT[i]
+        ## another card of the same rank keeps the rank bit
+        if not (self.suit_masks[0] | self.suit_masks[1] | self.suit_masks[2] | self.suit_masks[3]) & RANK_BIT[i]:
+            self.rank_mask &= ~RANK_BIT[i]
+        return self
+
+    def copy(self):
+        state = EvalState.__new__(EvalState)
+        state.ids = list(self.ids)
+        state.key = self.key
+        state.suits = self.suits
+        state.suit_masks = list(self.suit_masks)
+        state.rank_mask = self.rank_mask
+        return state
+
+    def suit_count(self, suit):
+        """
+        number of cards of a suit index
+        """
+        return (self.suits >> 4 * suit & 0xF) - 3
+
+    @property
+    def strength(self):
+        """
+        Strength of the best five card hand in the state. The same
+        as evaluate(self.ids) for 5, 6 or 7 cards.
+        """
+        if not 5 <= len(self.ids) <= 7:
+            raise ValueError('strength needs 5 to 7 cards. Got "{}"'.format(len(self.ids)))
+        flush = self.suits & FLUSH_BITS
+        if flush:
+            return FLUSH_TABLE[self.suit_masks[FLUSH_SUIT[flush]]]
+        return RANK_TABLE[self.key]
+
+
+def five_best(ids, strength=None):
+    """
+    Pick out the five cards that make up strength.
+
+    Cards are returned most significant first, e.g.
+    the pair before the kickers. When there is a choice
+    between equal cards the earliest in ids wins.
+    :param ids: sequence of integer card ids
+    :param strength: evaluate(ids). Computed if not given.
+    :return: list of 5 card ids
+    """
+    if strength is None:
+        strength = evaluate(ids)
+    cat = category(strength)
+    ranks = kickers(strength)
+
+    if cat in (STRAIGHT, FLUSH, STRAIGHT_FLUSH, ROYAL_FLUSH):
+        if cat == FLUSH:
+            wanted = ranks
+        else:
+            wanted = _straight_ranks(ranks[0])
+
+        suit = None
+        if cat != STRAIGHT:
+            counts = [0] * 4
+            for i in ids:
+                counts[i & 3] += 1
+            suit = counts.index(max(counts))
+
+        best = []
+        for rank in wanted:
+            for i in ids:
+                if i >> 2 == rank and (suit is None or i & 3 == suit):
+                    best.append(i)
+                    break
+        return best
+
+    best = []
+    for rank, n in zip(ranks, GROUPS[cat]):
+        best += [i for i in ids if i >> 2 == rank][:n]
+    return best
+
+
+def card_mask(ids, normalise_suits=False):
+    """
+    52 bit mask of a set of cards, 13 rank bits per suit.
+
+    Strength doesn't depend on which suit is which, so with
+    normalise_suits the four suit masks are sorted first and every
+    suit relabelling of the same cards gives the same mask.
+    :param ids: sequence of integer card ids
+    :return: int
+    """
+    masks = [0, 0, 0, 0]
+    for i in ids:
+        masks[i & 3] |= RANK_BIT[i]
+    if normalise_suits:
+        masks.sort()
+    return masks[0] | masks[1] << 13 | masks[2] << 26 | masks[3] << 39
+
+
+class EvalCache(object):
+    """
+    Bounded cache of hand strengths. Entries are keyed by the
+    frozenset of card ids, or by card_mask with normalise_suits,
+    and the oldest entry is evicted first.
+
+    Set Hand.cache to an instance to have Hand.eval, and so
+    Table.best_cards, look strengths up here before evaluating.
+    evaluate itself is a few table lookups, so a hit costs about the
+    same as evaluate once call overhead is counted (both about 1.3us in
+    the benchmarks) and the normalised key costs more. It is off by
+    default and pays off only with an expensive evaluate function.
+    """
+    def __init__(self, maxsize=100000, normalise_suits=False, evaluate=evaluate):
+        """
+        :param maxsize: maximum number of entries. None for no limit
+        :param normalise_suits: share entries between suit relabellings
+            of the same cards
+        :param evaluate: function from card ids to strength for misses
+        """
+        self.maxsize = maxsize
+        self.normalise_suits = normalise_suits
+        self._evaluate = evaluate
+        self.entries = {}
+        ## keys in insertion order for eviction
+        self._order = deque()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return 'EvalCache(size={}, maxsize={}, hits={}, misses={}, evictions={})'.format(
+            len(self), self.maxsize, self.hits, self.misses, self.evictions
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def evaluate(self, ids):
+        """
+        Strength of ids, from the cache when possible
+        :param ids: sequence of integer card ids
+        :return: int
+        """
+        key = card_mask(ids, True) if self.normalise_suits else frozenset(ids)
+        strength = self.entries.get(key)
+        if strength is not None:
+            self.hits += 1
+            return strength
+
+        self.misses += 1
+        strength = self.entries[key] = self._evaluate(ids)
+        self._order.append(key)
+        if self.maxsize is not None and len(self.entries) > self.maxsize:
+            del self.entries[self._order.popleft()]
+            self.evictions += 1
+        return strength
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return 0.0
+        return float(self.hits) / lookups
+
+    def stats(self):
+        return OrderedDict([
+            ('size', len(self)),
+            ('maxsize', self.maxsize),
+            ('hits', self.hits),
+            ('misses', self.misses),
+            ('evictions', self.evictions),
+            ('hit_rate', self.hit_rate),
+        ])
+
+    def clear(self):
+        self.entries.clear()
+        self._order.clear()
+        self.hits = self.misses = self.evictions = 0
@@ -0,0 +1,209 @@
+import logging
+import os
+import numpy as np
+from evaluator import STRAIGHT_TOP
+from equity import combinations_array, suit_symmetries
+from game import to_id, CARDS
+
+LOG = logging.getLogger(__name__)
+
+N_FLOPS = 22100
+N_CLASSES = 1755
+
+## texture flags
+MONOTONE = 1
+TWO_TONE = 2
+RAINBOW = 4
+PAIRED = 8
+TRIPS = 16
+## at least one pair of hole card ranks makes a straight
+STRAIGHT_POSSIBLE = 32
+## all three cards within a window of five ranks
+CONNECTED = 64
+FLAG_NAMES = (
+    (MONOTONE, 'monotone'),
+    (TWO_TONE, 'two_tone'),
+    (RAINBOW, 'rainbow'),
+    (PAIRED, 'paired'),
+    (TRIPS, 'trips'),
+    (STRAIGHT_POSSIBLE, 'straight_possible'),
+    (CONNECTED, 'connected'),
+)
+
+FLOP_DTYPE = np.dtype([
+    ('class_id', '<u2'),
+    ('canonical', '<u2'),
+    ('high', 'u1'),
+    ('middle', 'u1'),
+    ('low', 'u1'),
+    ('suits', 'u1'),
+    ('straights', 'u1'),
+    ('flags', 'u1'),
+])
+
+## C(i, 1), C(i, 2) and C(i, 3) for the colex index of a flop
+_C1 = tuple(range(52))
+_C2 = tuple(i * (i - 1) // 2 for i in range(52))
+_C3 = tuple(i * (i - 1) * (i - 2) // 6 for i in range(52))
+
+
+def flop_index(cards):
+    """
+    Colex index of three distinct cards in range(22100)
+    :param cards: 3 Cards or card ids in any order
+    :return: int
+    """
+    a, b, c = sorted(to_id(i) for i in cards)
+    return _C1[a] + _C2[b] + _C3[c]
+
+
+def _colex(rows):
+    rows = np.sort(rows, axis=1).astype(np.int64)
+    return rows[:, 0] + rows[:, 1] * (rows[:, 1] - 1) // 2 + rows[:, 2] * (rows[:, 2] - 1) * (rows[:, 2] - 2) // 6
+
+
+## card ids of every flop indexed by flop_index
+FLOPS = combinations_array(52, 3)
+FLOPS = FLOPS[np.argsort(_colex(FLOPS))]
+
+
+## _straights by board rank mask, filled in on first use
+_STRAIGHTS = {}
+
+
+def _straights(mask):
+    """
+    number of pairs of distinct hole card ranks that make a
+    straight with a board rank mask
+    """
+    if mask not in _STRAIGHTS:
+        _STRAIGHTS[mask] = sum(
+            1 for r1 in range(13) for r2 in range(r1 + 1, 13)
+            if STRAIGHT_TOP[mask | 1 << r1 | 1 << r2] >= 0
+        )
+    return _STRAIGHTS[mask]
+
+
+def build_flops():
+    """
+    Compute the features of every flop
+    :return: array of FLOP_DTYPE indexed by flop_index
+    """
+    flops = FLOPS
+    canonical = None
+    for mapping in suit_symmetries():
+        key = _colex(mapping[flops])
+        canonical = key if canonical is None else np.minimum(canonical, key)
+    classes, class_id = np.unique(canonical, return_inverse=True)
+    assert len(classes) == N_CLASSES
+
+    ranks = np.sort(flops >> 2, axis=1)
+    suits = flops & 3
+    n_suits = np.array([len(set(i)) for i in suits.tolist()])
+    n_ranks = np.array([len(set(i)) for i in ranks.tolist()])
+    masks = np.bitwise_or.reduce(1 << ranks, axis=1)
+    straights = np.array([_straights(int(m)) for m in masks])
+    ## the wheel counts the ace as low
+    span = np.minimum(ranks[:, 2] - ranks[:, 0], np.where(ranks[:, 2] == 12, ranks[:, 1] + 1, 13))
+
+    flags = np.zeros(N_FLOPS, dtype=np.uint8)
+    flags[n_suits == 1] |= MONOTONE
+    flags[n_suits == 2] |= TWO_TONE
+    flags[n_suits == 3] |= RAINBOW
+    flags[n_ranks == 2] |= PAIRED
+    flags[n_ranks == 1] |= TRIPS
+    flags[straights > 0] |= STRAIGHT_POSSIBLE
+    flags[(n_ranks == 3) & (span <= 4)] |= CONNECTED
+
+    table = np.zeros(N_FLOPS, dtype=FLOP_DTYPE)
+    table['class_id'] = class_id
+    table['canonical'] = canonical
+    table['high'] = ranks[:, 2]
+    table['middle'] = ranks[:, 1]
+    table['low'] = ranks[:, 0]
+    table['suits'] = n_suits
+    table['straights'] = straights
+    table['flags'] = flags
+    return table
+
+
+def build_flop_table(path):
+    """
+    Compute the flop table and save it to path as a .npy file
+    """
+    table = build_flops()
+    np.save(path, table)
+    LOG.info('wrote {} flops in {} classes to {}'.format(N_FLOPS, N_CLASSES, path))
+    return table
+
+
+class FlopTable(object):
+    """
+    Texture features of every flop, looked up by its cards.
+
+    The table is loaded the first time it is used: memory mapped
+    from path when the file exists, otherwise built and, if path is
+    given, saved there for next time.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self._table = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            if self.path and os.path.isfile(self.path):
+                self._table = np.load(self.path, mmap_mode='r')
+            elif self.path:
+                self._table = build_flop_table(self.path)
+            else:
+                self._table = build_flops()
+        return self._table
+
+    def __len__(self):
+        return N_FLOPS
+
+    def __getitem__(self, cards):
+        """
+        :param cards: 3 Cards or card ids
+        :return: numpy record of FLOP_DTYPE
+        """
+        return self.table[flop_index(cards)]
+
+    def class_id(self, cards):
+        """
+        Index in range(1755) of the suit isomorphism class of a flop
+        """
+        return int(self.table['class_id'][flop_index(cards)])
+
+    def texture(self, cards):
+        """
+        Names of the FLAG_NAMES that apply to a flop
+        :return: list of str
+        """
+        flags = int(self.table['flags'][flop_index(cards)])
+        return [name for flag, name in FLAG_NAMES if flags & flag]
+
+    def class_ids(self, flops):
+        """
+        Vectorised class_id
+        :param flops: (n, 3) array of card ids
+        :return: array of class ids
+        """
+        return self.table['class_id'][_colex(np.asarray(flops))]
+
+    def class_sizes(self):
+        """
+        number of flops in each class
+        :return: array of N_CLASSES ints summing to 22100
+        """
+        return np.bincount(self.table['class_id'], minlength=N_CLASSES)
+
+    def class_flop(self, class_id):
+        """
+        The canonical flop of a class
+        :return: list of 3 Cards
+        """
+        index = self.table['canonical'][np.flatnonzero(self.table['class_id'] == class_id)[0]]
+        return [CARDS[i] for i in FLOPS[index]]
+
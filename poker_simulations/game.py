@@ -1,19 +1,87 @@
 import os, glob
-from collections import OrderedDict, Counter, deque
-from random import shuffle
+from collections import OrderedDict, Counter, deque, namedtuple
+import random
 from copy import deepcopy
 import logging
+import evaluator
 
 FORMAT = "%(name)s: %(levelname)s: %(funcName)s: %(message)s"
 logging.basicConfig(format=FORMAT)
 LOG = logging.getLogger(__name__)
 
+## ranks in ascending order. The position of a rank
+## in this tuple is its internal rank
+RANKS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 'J', 'Q', 'K', 'A')
+SUITS = ('C', 'D', 'H', 'S')
+
+RANK_ORDER = OrderedDict((RANKS[i], i) for i in range(len(RANKS)))
+SUIT_ORDER = OrderedDict((SUITS[i], i) for i in range(len(SUITS)))
+HAND_RANK_ORDER = OrderedDict(
+    (evaluator.CATEGORIES[i], i) for i in range(len(evaluator.CATEGORIES))
+)
+
+
+def card_id(rank, suit):
+    """
+    Encode a card as a single integer between 0 and 51.
+
+    The two low bits hold the suit index and the
+    remaining bits hold the internal rank so that
+    ``card_id >> 2`` is the internal rank of the card
+    and ``card_id & 3`` is the index of its suit in SUITS.
+    :param rank: one of RANKS
+    :param suit: one of SUITS
+    :return: int
+    """
+    return RANK_ORDER[rank] << 2 | SUIT_ORDER[suit]
+
+
+def to_card(card):
+    """
+    Return card as a Card. Integer card ids are converted
+    to the equivalent Card and Card objects are returned as is.
+    :param card: Card or int
+    :return: Card
+    """
+    if isinstance(card, Card):
+        return card
+    return CARDS[card]
+
+
+def to_id(card):
+    """
+    Return card as an integer card id. The inverse of to_card
+    :param card: Card or int
+    :return: int
+    """
+    if isinstance(card, Card):
+        return card.id
+    return int(card)
+
 
 class Card(object):
     def __init__(self, rank, suit):
         self.rank = rank
         self.suit = suit
         self.do_checks()
+        self.id = card_id(rank, suit)
+
+    @classmethod
+    def from_id(cls, i):
+        """
+        Get the Card for an integer card id. Cards
+        are shared between callers so should not
+        be modified.
+        :param i: int between 0 and 51
+        :return: Card
+        """
+        return CARDS[i]
+
+    def __int__(self):
+        return self.id
+
+    def __index__(self):
+        return self.id
 
     def __str__(self):
         if isinstance(self.rank, str):
@@ -27,7 +95,7 @@ class Card(object):
     def __eq__(self, other):
         """Overrides the default implementation"""
         if isinstance(self, other.__class__):
-            return self.__dict__ == other.__dict__
+            return self.id == other.id
         return NotImplemented
 
     def __ne__(self, other):
@@ -39,47 +107,43 @@ class Card(object):
 
     def __hash__(self):
         """Overrides the default implementation"""
-        return hash(tuple(sorted(self.__dict__.items())))
+        return self.id
 
     def __lt__(self, other):
         if not isinstance(other, Card):
             raise TypeError('Cannot make comparison between Card and "{}"'.format(type(other)))
-        return self.rank_order[self.rank] < self.rank_order[other.rank]
+        return self.id >> 2 < other.id >> 2
 
     def __le__(self, other):
         if not isinstance(other, Card):
             raise TypeError('Cannot make comparison between Card and "{}"'.format(type(other)))
-        return self.rank_order[self.rank] <= self.rank_order[other.rank]
+        return self.id >> 2 <= other.id >> 2
 
     def __gt__(self, other):
         if not isinstance(other, Card):
             raise TypeError('Cannot make comparison between Card and "{}"'.format(type(other)))
-        return self.rank_order[self.rank] > self.rank_order[other.rank]
+        return self.id >> 2 > other.id >> 2
 
     def __ge__(self, other):
         if not isinstance(other, Card):
             raise TypeError('Cannot make comparison between Card and "{}"'.format(type(other)))
-        return self.rank_order[self.rank] >= self.rank_order[other.rank]
+        return self.id >> 2 >= other.id >> 2
 
     def do_checks(self):
-        if self.rank not in ['A', 'K', 'Q', 'J'] + range(2, 11):
-            raise ValueError('"num" should be between A, K, Q, J or a number from 2 to 10. Got "{}"'.format(self.num))
+        if self.rank not in RANK_ORDER:
+            raise ValueError('"num" should be between A, K, Q, J or a number from 2 to 10. Got "{}"'.format(self.rank))
 
-        if self.suit not in ['H', 'D', 'S', 'C']:
+        if self.suit not in SUIT_ORDER:
             raise ValueError('"suit" should be one of H, D, S or C. Got "{}"'.format(self.suit))
 
     @property
     def rank_order(self):
         """
-        create a dict for internal representation
+        dict for internal representation
         of ranks such that picture cards are correctly ordered
         :return:
         """
-        d = OrderedDict()
-        order = [2, 3, 4, 5, 6, 7, 8, 9, 10, 'J', 'Q', 'K', 'A']
-        for i in range(len(order)):
-            d[order[i]] = i
-        return d
+        return RANK_ORDER
 
     @property
     def internal_rank(self):
@@ -87,24 +151,50 @@ class Card(object):
         return the internal rank of current card from rank order
         :return:
         """
-        return self.rank_order[self.rank]
+        return self.id >> 2
+
+
+## one Card per card id, indexed by id
+CARDS = tuple(Card(RANKS[i >> 2], SUITS[i & 3]) for i in range(52))
 
 
 class Deck(object):
-    def __init__(self):
-        self.cards = self.create()
-        self.shuffle()
+    """
+    A deck of cards held as a fixed array of the 52 integer
+    card ids (see card_id) plus the position of each id in it.
+
+    The first size entries of ids are the cards still in the
+    deck. Drawing swaps a random live card to the end of the live
+    region (one step of a Fisher-Yates shuffle) so only the cards
+    that are dealt get shuffled, removing a known card is a swap
+    found through positions, and reset just makes every card live
+    again without allocating.
+    """
+    def __init__(self, rng=None, shuffle=True):
+        """
+        :param rng: random.Random to draw with. The random module is used by default
+        :param shuffle: shuffle the whole deck so that pop deals random cards
+        """
+        self.random = (rng or random).random
+        self.ids = self.create()
+        self.positions = list(range(52))
+        self.size = 52
+        if shuffle:
+            self.shuffle()
 
     def __str__(self):
         return str(self.cards)
 
     def __len__(self):
-        return len(self.cards)
+        return self.size
+
+    def __contains__(self, card):
+        return self.positions[to_id(card)] < self.size
 
     def __eq__(self, other):
-        """Overrides the default implementation"""
+        """Decks are equal when they hold the same cards in the same order"""
         if isinstance(self, other.__class__):
-            return self.__dict__ == other.__dict__
+            return self.card_ids == other.card_ids
         return NotImplemented
 
     def __ne__(self, other):
@@ -116,39 +206,163 @@ class Deck(object):
 
     def __hash__(self):
         """Overrides the default implementation"""
-        return hash(tuple(sorted(self.__dict__.items())))
+        return hash(tuple(self.card_ids))
+
+    @property
+    def cards(self):
+        """
+        Cards still in the deck, in deck order
+        :return: list of Card
+        """
+        return [CARDS[i] for i in self.ids[:self.size]]
+
+    @property
+    def card_ids(self):
+        """
+        Like cards but the integer card ids
+        :return: list of int
+        """
+        return self.ids[:self.size]
 
     def create(self):
-        cards = deque()
-        for rank in ['A', 'K', 'Q', 'J'] + range(2, 11):
-            for suit in ['H', 'C', 'S', 'D']:
-                cards.append(Card(rank, suit))
-        return cards
+        return list(range(52))
 
     def shuffle(self):
-        shuffle(self.cards)
+        """
+        Fisher-Yates shuffle of the cards still in the deck
+        :return: the Cards in their new order
+        """
+        ids = self.ids
+        rand = self.random
+        for k in range(self.size - 1, 0, -1):
+            j = int(rand() * (k + 1))
+            ids[k], ids[j] = ids[j], ids[k]
+        positions = self.positions
+        for k in range(self.size):
+            positions[ids[k]] = k
         return self.cards
 
+    def reset(self):
+        """
+        Put every card back in the deck without reallocating.
+        The order is not random afterwards so deal with
+        draw_id rather than pop.
+        """
+        self.size = 52
+
     def pop(self):
-        return self.cards.pop()
+        return CARDS[self.pop_id()]
+
+    def pop_id(self):
+        """
+        Like pop but return the integer card id
+        :return: int
+        """
+        if not self.size:
+            raise IndexError('pop from an empty deck')
+        self.size -= 1
+        return self.ids[self.size]
+
+    def draw_id(self):
+        """
+        Remove a random card from the deck, whatever its order
+        :return: int card id
+        """
+        size = self.size
+        if not size:
+            raise IndexError('draw from an empty deck')
+        ids = self.ids
+        positions = self.positions
+        j = int(self.random() * size)
+        size -= 1
+        card, last = ids[j], ids[size]
+        ids[j], ids[size] = last, card
+        positions[last], positions[card] = j, size
+        self.size = size
+        return card
+
+    def draw_ids(self, n):
+        """
+        Remove n random cards from the deck
+        :return: list of int card ids
+        """
+        return [self.draw_id() for i in range(n)]
+
+    def draw(self):
+        return CARDS[self.draw_id()]
+
+    def remove_id(self, i):
+        """
+        Take a known card out of the deck in constant time.
+        :param i: int card id
+        :return: True if the card was in the deck
+        """
+        p = self.positions[i]
+        size = self.size - 1
+        if p > size:
+            return False
+        ids = self.ids
+        last = ids[size]
+        ids[p], ids[size] = last, i
+        self.positions[last], self.positions[i] = p, size
+        self.size = size
+        return True
 
     def get(self, rank, suit):
-        for i in self.cards:
-            if i.rank == rank and i.suit == suit:
-                self.cards.remove(i)
-                return i
+        i = card_id(rank, suit)
+        if self.remove_id(i):
+            return CARDS[i]
+
+
+## the cards of one dealt hand as integer card ids. hole holds
+## a (card 1, card 2) tuple per seat in seat order and board holds
+## the flop, turn and river
+Deal = namedtuple('Deal', ['hole', 'board'])
+
+
+## 23 players use 46 hole cards, which with the board is all but one card
+MAX_PLAYERS = 23
 
 
 class Table(object):
-    def __init__(self, num=6):
+    """
+    A table of num players. One hand is dealt from a single
+    Deck when the Table is created and kept until
+    deal is called again, so every seat's cards and the board
+    are unique and reading them doesn't re-deal.
+    """
+    def __init__(self, num=6, rng=None):
+        """
+        :param num: number of players, from 2 to MAX_PLAYERS
+        :param rng: random.Random to deal with
+        """
+        if not 2 <= num <= MAX_PLAYERS:
+            raise ValueError('num should be between 2 and {}. Got "{}"'.format(MAX_PLAYERS, num))
         self.num = num
+        self.deck = Deck(rng, shuffle=False)
+        self.dealt = None
+        self.deal()
+
+    def deal(self):
+        """
+        Deal a new hand: one card to each seat, then a second
+        card to each seat, then the five board cards.
+        :return: Deal
+        """
+        self.deck.reset()
+        pop = self.deck.draw_id
+        first = [pop() for i in range(self.num)]
+        second = [pop() for i in range(self.num)]
+        board = tuple(pop() for i in range(5))
+        self.dealt = Deal(tuple(zip(first, second)), board)
+        return self.dealt
 
     @property
     def cards(self):
-        cards = deepcopy(self.hole_cards)
-        cards['flop'] = deepcopy(self.flop)
-        cards['turn'] = deepcopy(self.turn)
-        cards['river'] = deepcopy(self.river)
+        cards = self.hole_cards
+        cards['flop'] = self.flop
+        cards['turn'] = self.turn
+        cards['river'] = self.river
         return cards
 
     def __str__(self):
@@ -161,38 +375,34 @@ class Table(object):
         return string
 
     def __len__(self):
-        return len(self.hole_cards)
-
-    @property
-    def deck(self):
-        return Deck().shuffle()
+        return self.num
 
     @property
     def hole_cards(self):
         hole = OrderedDict()
-        ## card 1
-        for i in range(1, self.num+1):
-            hole[i] = [self.deck.pop()]
-
-        ## card 2
-        for i in range(1, self.num+1):
-            hole[i].append(self.deck.pop())
+        for i in range(self.num):
+            hole[i + 1] = [CARDS[j] for j in self.dealt.hole[i]]
         return hole
 
     @property
     def flop(self):
-        flop = []
-        for i in range(3):
-            flop.append(self.deck.pop())
-        return flop
+        return [CARDS[i] for i in self.dealt.board[:3]]
 
     @property
     def turn(self):
-        return self.deck.pop()
+        return CARDS[self.dealt.board[3]]
 
     @property
     def river(self):
-        return self.deck.pop()
+        return CARDS[self.dealt.board[4]]
+
+    def hand_ids(self):
+        """
+        The 7 card ids available to each seat
+        :return: list with one list of 7 card ids per seat
+        """
+        board = list(self.dealt.board)
+        return [list(i) + board for i in self.dealt.hole]
 
     def best_cards(self):
         """
@@ -201,29 +411,330 @@ class Table(object):
         :return:
         """
         results = OrderedDict()
-        for i in self.hole_cards:
-            all7 = self.hole_cards[i] + self.flop + [self.river] + [self.turn]
-            results[i] = Hand(all7).eval()
+        for i, ids in enumerate(self.hand_ids()):
+            results[i + 1] = Hand(ids).eval()
 
-        winner_dct = {i: results[i] for i in results if results[i] == max(results.values())}
+        best = max(results.values())
+        winner_dct = {i: results[i] for i in results if results[i] == best}
         return winner_dct, results
 
+
+def _internal_rank(card):
+    return card.id >> 2
+
+
+## betting streets and the action kinds recorded in GameState.actions
+STREETS = ('preflop', 'flop', 'turn', 'river')
+PREFLOP, FLOP, TURN, RIVER = range(len(STREETS))
+ACTIONS = ('fold', 'check', 'call', 'bet', 'raise', 'blind')
+FOLD, CHECK, CALL, BET, RAISE, BLIND = range(len(ACTIONS))
+
+## number of board cards showing on each street
+BOARD_SIZE = (0, 3, 4, 5)
+
+
+class GameState(object):
+    """
+    The state of one No-Limit Hold'em hand as flat per seat
+    lists of ints and bools, so copy is a few list copies.
+
+    bets are the chips put in on the current street and
+    contributed the chips put in over the whole hand. acted is
+    whether a seat has acted since the last full raise. runout
+    holds all five board cards, dealt up front; board is the part
+    showing. actions is a list of (seat, street, action, amount)
+    where amount is the chips added for a call or blind and the
+    street total for a bet or raise. Once finished, payoffs are the
+    net chips won by each seat and winners is a bit mask of the
+    seats that took the main pot.
+    """
+    __slots__ = (
+        'stacks', 'start_stacks', 'bets', 'contributed', 'folded', 'all_in', 'acted',
+        'hole', 'runout', 'street', 'to_act', 'current_bet', 'min_raise', 'button',
+        'finished', 'payoffs', 'winners', 'actions',
+    )
+
+    def copy(self):
+        state = GameState.__new__(GameState)
+        for name in ('stacks', 'start_stacks', 'bets', 'contributed', 'folded', 'all_in', 'acted',
+                     'payoffs', 'actions'):
+            setattr(state, name, getattr(self, name)[:])
+        for name in ('hole', 'runout', 'street', 'to_act', 'current_bet', 'min_raise', 'button',
+                     'finished', 'winners'):
+            setattr(state, name, getattr(self, name))
+        return state
+
+    @property
+    def board(self):
+        return self.runout[:BOARD_SIZE[self.street]]
+
+    @property
+    def pot(self):
+        return sum(self.contributed)
+
+    @property
+    def num(self):
+        return len(self.stacks)
+
+
 class Dealer(object):
-    def __self__(self, num):
+    """
+    Deals and runs No-Limit Hold'em hands: blinds, betting
+    rounds, legal actions, side pots and showdown.
+
+    Call new_hand, then act for the seat in state.to_act with one of
+    legal_actions until state.finished. Stacks carry over from
+    hand to hand and the button moves one seat each hand.
+    """
+    def __init__(self, num=6, stacks=200, small_blind=1, big_blind=2, rng=None):
+        """
+        :param num: number of seats
+        :param stacks: starting chips, one int for every seat or a list
+        :param rng: random.Random to deal with
+        """
+        if num < 2:
+            raise ValueError('need at least 2 seats. Got "{}"'.format(num))
         self.num = num
+        self.stacks = list(stacks) if isinstance(stacks, (list, tuple)) else [stacks] * num
+        if len(self.stacks) != num:
+            raise ValueError('stacks should have {} entries. Got "{}"'.format(num, len(self.stacks)))
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.deck = Deck(rng, shuffle=False)
+        self.button = num - 1
+        self.state = None
+
+    def _next(self, seat, state=None):
+        """
+        next seat after seat that can still act, or None
+        """
+        state = state or self.state
+        for i in range(1, self.num + 1):
+            j = (seat + i) % self.num
+            if not state.folded[j] and not state.all_in[j]:
+                return j
+        return None
+
+    def new_hand(self):
+        """
+        Move the button, deal and post the blinds. Seats without
+        chips sit the hand out.
+        :return: GameState
+        """
+        seated = [i for i in range(self.num) if self.stacks[i] > 0]
+        if len(seated) < 2:
+            raise ValueError('need at least 2 seats with chips')
+        n = self.num
+        self.button = next((self.button + i) % n for i in range(1, n + 1) if self.stacks[(self.button + i) % n] > 0)
+
+        s = self.state = GameState()
+        s.stacks = self.stacks[:]
+        s.start_stacks = self.stacks[:]
+        s.bets = [0] * n
+        s.contributed = [0] * n
+        s.folded = [self.stacks[i] <= 0 for i in range(n)]
+        s.all_in = [False] * n
+        s.acted = [False] * n
+        s.payoffs = [0] * n
+        s.actions = []
+        s.street = PREFLOP
+        s.button = self.button
+        s.finished = False
+        s.winners = 0
+
+        ## deal like Table: a card to each seat from the left of the button, then a second
+        self.deck.reset()
+        pop = self.deck.draw_id
+        order = [(self.button + i) % n for i in range(1, n + 1) if not s.folded[(self.button + i) % n]]
+        first = dict((i, pop()) for i in order)
+        second = dict((i, pop()) for i in order)
+        s.hole = tuple((first[i], second[i]) if i in first else None for i in range(n))
+        s.runout = tuple(pop() for i in range(5))
+
+        ## heads up the button posts the small blind
+        if len(order) == 2:
+            sb, bb = self.button, self._next(self.button)
+        else:
+            sb = self._next(self.button)
+            bb = self._next(sb)
+        self._put(sb, min(self.small_blind, s.stacks[sb]))
+        s.actions.append((sb, PREFLOP, BLIND, s.bets[sb]))
+        self._put(bb, min(self.big_blind, s.stacks[bb]))
+        s.actions.append((bb, PREFLOP, BLIND, s.bets[bb]))
+        s.current_bet = max(s.bets)
+        s.min_raise = self.big_blind
+        s.to_act = self._next(bb)
+        if s.to_act is None or self._round_over():
+            self._end_round()
+        return s
+
+    def _put(self, seat, chips):
+        s = self.state
+        s.stacks[seat] -= chips
+        s.bets[seat] += chips
+        s.contributed[seat] += chips
+        if not s.stacks[seat]:
+            s.all_in[seat] = True
+
+    def legal_actions(self):
+        """
+        Actions open to the seat to act
+        :return: list of (action, min amount, max amount). Amounts of a
+            bet or raise are the street total to bet or raise to
+        """
+        s = self.state
+        if s.finished:
+            return []
+        seat = s.to_act
+        stack = s.stacks[seat]
+        to_call = s.current_bet - s.bets[seat]
+        legal = []
+        if to_call > 0:
+            legal.append((FOLD, 0, 0))
+            legal.append((CALL, min(to_call, stack), min(to_call, stack)))
+        else:
+            legal.append((CHECK, 0, 0))
+        ## an all in for less than a full raise doesn't reopen the betting
+        if stack > to_call and not s.acted[seat]:
+            most = s.bets[seat] + stack
+            if s.current_bet == 0:
+                legal.append((BET, min(self.big_blind, most), most))
+            else:
+                legal.append((RAISE, min(s.current_bet + s.min_raise, most), most))
+        return legal
+
+    def act(self, action, amount=0):
+        """
+        Apply an action of the seat to act
+        :param action: one of FOLD, CHECK, CALL, BET or RAISE
+        :param amount: street total for BET and RAISE
+        :return: GameState
+        """
+        s = self.state
+        if s.finished:
+            raise ValueError('the hand is over')
+        for kind, low, high in self.legal_actions():
+            if kind == action:
+                break
+        else:
+            raise ValueError('"{}" is not a legal action'.format(ACTIONS[action] if 0 <= action < len(ACTIONS) else action))
+        seat = s.to_act
+
+        if action == FOLD:
+            s.folded[seat] = True
+        elif action == CALL:
+            amount = low
+            self._put(seat, amount)
+        elif action in (BET, RAISE):
+            if not low <= amount <= high:
+                raise ValueError('{} should be between {} and {}. Got "{}"'.format(ACTIONS[action], low, high, amount))
+            raise_by = amount - s.current_bet
+            self._put(seat, amount - s.bets[seat])
+            if raise_by >= s.min_raise:
+                s.min_raise = raise_by
+                s.acted = [False] * self.num
+            s.current_bet = amount
+        s.acted[seat] = True
+        s.actions.append((seat, s.street, action, 0 if action in (FOLD, CHECK) else amount))
+
+        if s.folded.count(False) == 1:
+            self._finish()
+        elif self._round_over():
+            self._end_round()
+        else:
+            s.to_act = self._next(seat)
+        return s
+
+    def _round_over(self):
+        s = self.state
+        for i in range(self.num):
+            if s.folded[i] or s.all_in[i]:
+                continue
+            if not s.acted[i] or s.bets[i] != s.current_bet:
+                return False
+        return True
+
+    def _end_round(self):
+        s = self.state
+        able = [i for i in range(self.num) if not s.folded[i] and not s.all_in[i]]
+        if s.street == RIVER or len(able) < 2:
+            ## nobody left to bet against, deal the rest of the board
+            s.street = RIVER
+            self._finish()
+            return
+        s.street += 1
+        s.bets = [0] * self.num
+        s.acted = [False] * self.num
+        s.current_bet = 0
+        s.min_raise = self.big_blind
+        s.to_act = self._next(s.button)
+
+    def _finish(self):
+        s = self.state
+        live = [i for i in range(self.num) if not s.folded[i]]
+        won = [0] * self.num
+        if len(live) == 1:
+            won[live[0]] = s.pot
+            s.winners = 1 << live[0]
+        else:
+            strengths = dict((i, evaluator.evaluate(list(s.hole[i]) + list(s.runout))) for i in live)
+            ## odd chips go to the first winner left of the button
+            position = dict(((s.button + j) % self.num, j) for j in range(1, self.num + 1))
+            levels = sorted(set(s.contributed[i] for i in live))
+            low = 0
+            for k, level in enumerate(levels):
+                ## the last pot also takes anything folded seats put in above it
+                high = level if k < len(levels) - 1 else max(s.contributed)
+                amount = sum(min(c, high) - min(c, low) for c in s.contributed)
+                low = high
+                eligible = [i for i in live if s.contributed[i] >= level]
+                best = max(strengths[i] for i in eligible)
+                winners = sorted((i for i in eligible if strengths[i] == best), key=position.get)
+                share, odd = divmod(amount, len(winners))
+                for j, i in enumerate(winners):
+                    won[i] += share + (1 if j < odd else 0)
+                    ## winners records who took the main pot
+                    if not k:
+                        s.winners |= 1 << i
+        for i in range(self.num):
+            s.stacks[i] += won[i]
+            s.payoffs[i] = s.stacks[i] - s.start_stacks[i]
+        s.finished = True
+        s.to_act = None
+        self.stacks = s.stacks[:]
+
+    def play(self, policy):
+        """
+        Play a new hand to the end
+        :param policy: function of (dealer, legal actions) returning (action, amount)
+        :return: GameState
+        """
+        self.new_hand()
+        while not self.state.finished:
+            self.act(*policy(self, self.legal_actions()))
+        return self.state
+
 
 class Hand(object):
+    ## optional evaluator.EvalCache used by eval
+    cache = None
+
     def __init__(self, cards):
+        """
+        :param cards: 7 Card objects or integer card ids
+        """
+        if len(cards) != 7:
+            raise ValueError("should be 7 cards")
+
         ## sort in decending order
-        self.cards = list(reversed(sorted(cards)))
+        self.cards = list(reversed(sorted([to_card(i) for i in cards], key=_internal_rank)))
+        self.ids = [i.id for i in self.cards]
 
         ## indicator for whether condition has been met
         self.isa = False
 
-        if len(cards) is not 7:
-            raise ValueError("should be 7 cards")
-
         self.five_best = self.get_five_best()
+        self.strength = self.get_strength()
 
     def __str__(self):
         return str("{}({})".format(self.__class__.__name__, self.cards))
@@ -232,9 +743,9 @@ class Hand(object):
         return self.__str__()
 
     def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(self, other.__class__):
-            return self.__dict__ == other.__dict__
+        """Hands are equal when they have the same strength"""
+        if isinstance(other, Hand):
+            return self.strength == other.strength
         return NotImplemented
 
     def __ne__(self, other):
@@ -246,81 +757,75 @@ class Hand(object):
 
     def __hash__(self):
         """Overrides the default implementation"""
-        return hash(tuple(sorted(self.__dict__.items())))
+        return hash(self.strength)
 
     def __lt__(self, other):
         if not isinstance(other, Hand):
             raise TypeError('Cannot make comparison between Hand and "{}"'.format(type(other)))
-        if self.internal_rank == other.internal_rank:
-            self_sum = sum([i.internal_rank for i in self.five_best])
-            other_sum = sum([i.internal_rank for i in other.five_best])
-            return self_sum < other_sum
-
-        ## otherwise compare the internal ranks
-        else:
-            return self.internal_rank < other.internal_rank
+        return self.strength < other.strength
 
     def __le__(self, other):
         if not isinstance(other, Hand):
             raise TypeError('Cannot make comparison between Hand and "{}"'.format(type(other)))
-        if self.internal_rank == other.internal_rank:
-            self_sum = sum([i.internal_rank for i in self.five_best])
-            other_sum = sum([i.internal_rank for i in other.five_best])
-            return self_sum <= other_sum
-
-        ## otherwise compare the internal ranks
-        else:
-            return self.internal_rank <= other.internal_rank
+        return self.strength <= other.strength
 
     def __gt__(self, other):
         if not isinstance(other, Hand):
             raise TypeError('Cannot make comparison between Hand and "{}"'.format(type(other)))
-
-        if self.internal_rank == other.internal_rank:
-            self_sum = sum([i.internal_rank for i in self.five_best])
-            other_sum = sum([i.internal_rank for i in other.five_best])
-            return self_sum > other_sum
-
-        ## otherwise compare the internal ranks
-        else:
-            return self.internal_rank > other.internal_rank
+        return self.strength > other.strength
 
     def __ge__(self, other):
         if not isinstance(other, Hand):
             raise TypeError('Cannot make comparison between Hand and "{}"'.format(type(other)))
-
-        if self.internal_rank == other.internal_rank:
-            self_sum = sum([i.internal_rank for i in self.five_best])
-            other_sum = sum([i.internal_rank for i in other.five_best])
-            return self_sum <= other_sum
-
-        ## otherwise compare the internal ranks
-        else:
-            return self.internal_rank <= other.internal_rank
+        return self.strength >= other.strength
 
     @staticmethod
     def hand_rank_order():
-        d = OrderedDict()
-        hand_order = [
-            'HighCard',
-            'Pair',
-            'TwoPair',
-            'ThreeOfAKind',
-            'Straight',
-            'Flush',
-            'FullHouse',
-            'FourOfAKind',
-            'StraightFlush',
-            'RoyalFlush'
-        ]
-        for i in range(len(hand_order)):
-            d[hand_order[i]] = i
-
-        return d
+        return HAND_RANK_ORDER
 
     @property
     def internal_rank(self):
-        return self.hand_rank_order()[self.__class__.__name__]
+        return HAND_RANK_ORDER[self.__class__.__name__]
+
+    @staticmethod
+    def evaluate_ids(ids):
+        """
+        Strength of the best hand in ids, through Hand.cache
+        when one is set
+        :param ids: integer card ids
+        :return: int
+        """
+        if Hand.cache is None:
+            return evaluator.evaluate(ids)
+        return Hand.cache.evaluate(ids)
+
+    def get_strength(self):
+        """
+        Compute the integer key that all comparisons between
+        hands use: the category in the high bits followed by the
+        significant ranks in order (see evaluator.make_strength).
+        The base class evaluates the best hand from all 7 cards.
+        A subclass that matches the best hand has the same strength,
+        otherwise it scores its own five_best.
+        :return: int
+        """
+        if type(self) is Hand:
+            return self.evaluate_ids(self.ids)
+        if self.isa:
+            strength = self.evaluate_ids(self.ids)
+            if evaluator.category(strength) == self.internal_rank:
+                return strength
+
+        ## subclasses fall back on a HighCard when they don't match
+        if isinstance(self.five_best, Hand):
+            return self.five_best.strength
+        if self.five_best is None:
+            return HighCard(self.cards).strength
+
+        ranks = [i.internal_rank for i in self.five_best]
+        if not self.isa:
+            return evaluator.hand_strength(evaluator.HIGH_CARD, ranks)
+        return evaluator.hand_strength(self.internal_rank, ranks)
 
     def get_five_best(self):
         """
@@ -332,18 +837,35 @@ class Hand(object):
 
     def eval(self):
         """
-        return the maximum hand
-        :return:
+        return the maximum hand. The strength of the hand comes
+        from the lookup tables in evaluator rather than from
+        trying every Hand subclass in turn.
+        :return: instance of the Hand subclass that matches the best hand
         """
-        isa_list = []
-        for hand in Hand.__subclasses__():
-            hand_type = hand(self.cards)
-            if hand_type.isa:
-                isa_list.append(hand_type)
-
-        max_isalist = max(isa_list)
+        ## the base class has already evaluated all 7 cards
+        if self.five_best is None:
+            strength = self.strength
+        else:
+            strength = self.evaluate_ids(self.ids)
+        hand_type = HAND_TYPES[evaluator.category(strength)]
+        return hand_type.from_strength(self.cards, strength)
 
-        return max_isalist
+    @classmethod
+    def from_strength(cls, cards, strength):
+        """
+        Build a hand of this type from a strength computed
+        by evaluator.evaluate without calling get_five_best.
+        :param cards: 7 Card objects, sorted in descending order
+        :param strength: evaluator.evaluate(cards)
+        :return: instance of cls
+        """
+        hand = cls.__new__(cls)
+        hand.cards = cards
+        hand.ids = [i.id for i in cards]
+        hand.isa = True
+        hand.strength = strength
+        hand.five_best = [CARDS[i] for i in evaluator.five_best(hand.ids, strength)]
+        return hand
 
     def max(self, lst):
         if not isinstance(lst, list):
@@ -364,24 +886,23 @@ class RoyalFlush(Hand):
             if ranks == ['A', 'K', 'Q', 'J', 10]:
                 self.isa = True
                 return cards
-        else:
-            return HighCard(cards)
+        return HighCard(cards)
 
 
 class StraightFlush(Hand):
     def get_five_best(self):
         cards = deepcopy(self.cards)
-        S = Straight(cards)
-        F = Flush(cards)
+        most_common = Counter([i.suit for i in cards]).most_common(1)
 
-        if F.isa and S.isa:
-            self.isa = True
-            assert F.five_best == S.five_best
-            five_best = deepcopy(F.five_best)
-            assert len(five_best) == 5
-            return five_best
-        else:
-            return HighCard(cards)
+        if most_common[0][1] >= 5:
+            ## the straight has to be made from the flush suit alone
+            suited = dict((i.internal_rank, i) for i in cards if i.suit == most_common[0][0])
+            runs = [range(i, i + 5) for i in range(8, -1, -1)] + [[12, 0, 1, 2, 3]]
+            for run in runs:
+                if set(run).issubset(suited):
+                    self.isa = True
+                    return list(reversed(sorted(suited[i] for i in run)))
+        return HighCard(cards)
 
 
 class FourOfAKind(Hand):
@@ -458,31 +979,18 @@ class Flush(Hand):
 
 class Straight(Hand):
     def get_five_best(self):
-        cards = sorted(deepcopy(self.cards))
-        internal_ranks = [i.internal_rank for i in cards]
-        possible_straights = OrderedDict()
-        for i in range(9):
-            possible_straights[i] = range(i, i+5)
-        possible_straights[12] = [12, 0, 1, 2, 3]
-
-        best_five = []
-        for k, v in possible_straights.items():
-            if set(v).issubset(set(internal_ranks)):
-                for card in cards:
-                    for i in v:
-                        if card.internal_rank is i:
-                            best_five.append(card)
-
-        if best_five == []:
-            return HighCard(cards)
-
-        else:
-            self.isa = True
-            best_five = set(best_five)
-            best_five = list(reversed(sorted(best_five)))
-            best_five = best_five[:5]
-            assert len(best_five) == 5
-            return list(reversed(sorted(best_five)))
+        cards = deepcopy(self.cards)
+        ## one card of each rank, the highest suit when there are several
+        by_rank = OrderedDict()
+        for card in sorted(cards, reverse=True):
+            by_rank.setdefault(card.internal_rank, card)
+
+        runs = [range(i, i + 5) for i in range(8, -1, -1)] + [[12, 0, 1, 2, 3]]
+        for run in runs:
+            if set(run).issubset(by_rank):
+                self.isa = True
+                return list(reversed(sorted(by_rank[i] for i in run)))
+        return HighCard(cards)
 
 
 class ThreeOfAKind(Hand):
@@ -579,31 +1087,16 @@ class HighCard(Hand):
         return self.cards[:5]
 
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+## Hand subclasses indexed by evaluator category
+HAND_TYPES = (
+    HighCard,
+    Pair,
+    TwoPair,
+    ThreeOfAKind,
+    Straight,
+    Flush,
+    FullHouse,
+    FourOfAKind,
+    StraightFlush,
+    RoyalFlush,
+)
@@ -0,0 +1,293 @@
+import logging
+import os
+import struct
+import numpy as np
+import evaluator
+from evaluator import CATEGORY_SHIFT
+from game import CARDS, STREETS, ACTIONS
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'PKHH'
+VERSION = 2
+## magic, version, max seats, max actions, record size
+HEADER = struct.Struct('<4sHHHH4x')
+
+MAX_SEATS = 10
+## actions kept in the record. The rest of a longer hand goes to the overflow file
+MAX_ACTIONS = 48
+## most actions in one hand
+MAX_HAND_ACTIONS = 2 ** 16 - 1
+## the overflow file is the history file's path plus this
+OVERFLOW_SUFFIX = '.actions'
+
+## card id of an unused hole card or board slot
+NO_CARD = 255
+
+ACTION_DTYPE = np.dtype([
+    ('seat', 'u1'),
+    ('street', 'u1'),
+    ('kind', 'u1'),
+    ('amount', '<u4'),
+], align=False)
+
+RECORD_DTYPE = np.dtype([
+    ('hand', '<u8'),
+    ('seats', 'u1'),
+    ('hole', 'u1', (MAX_SEATS, 2)),
+    ('board', 'u1', (5,)),
+    ('n_actions', '<u2'),
+    ('actions', ACTION_DTYPE, (MAX_ACTIONS,)),
+    ## index in the overflow file of the actions after the first MAX_ACTIONS
+    ('overflow', '<u8'),
+    ('winners', '<u4'),
+    ('category', 'i1', (MAX_SEATS,)),
+    ('payoff', '<i4', (MAX_SEATS,)),
+])
+
+
+def empty_records(n):
+    """
+    n blank records with every card slot set to NO_CARD
+    """
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['hole'] = NO_CARD
+    records['board'] = NO_CARD
+    records['category'] = -1
+    return records
+
+
+def _header():
+    return HEADER.pack(MAGIC, VERSION, MAX_SEATS, MAX_ACTIONS, RECORD_DTYPE.itemsize)
+
+
+class HistoryWriter(object):
+    """
+    Append hands to a binary hand history file.
+
+    The file is a short header followed by fixed size records of
+    RECORD_DTYPE, so it can be memory mapped by HistoryReader.
+    Records are buffered and written buffer_size at a time. Hands
+    with more than MAX_ACTIONS actions keep the rest in an overflow
+    file of ACTION_DTYPE next to it.
+    """
+    def __init__(self, path, append=False, buffer_size=4096):
+        self.path = path
+        exists = append and os.path.isfile(path)
+        overflow = path + OVERFLOW_SUFFIX
+        if exists:
+            _check_header(path)
+            self.count = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+        else:
+            self.count = 0
+            if os.path.isfile(overflow):
+                os.remove(overflow)
+        self.overflow_count = 0
+        if exists and os.path.isfile(overflow):
+            self.overflow_count = os.path.getsize(overflow) // ACTION_DTYPE.itemsize
+        self.file = open(path, 'ab' if exists else 'wb')
+        self.overflow_file = None
+        if not exists:
+            self.file.write(_header())
+        self.buffer = empty_records(buffer_size)
+        self.used = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, hole, board, actions=(), winners=None, category=None, payoff=None):
+        """
+        Add a hand
+        :param hole: list of (id, id) per seat
+        :param board: up to 5 card ids
+        :param actions: list of (seat, street, kind, amount). street and
+            kind are indices of STREETS and ACTIONS
+        :param winners: bit mask of winning seats. Worked out from the
+            cards when the board is complete and this is None
+        :param category: hand category per seat. Worked out like winners
+        :param payoff: net chips won per seat
+        :return: index of the record
+        """
+        seats = len(hole)
+        if not 1 <= seats <= MAX_SEATS:
+            raise ValueError('seats should be between 1 and {}. Got "{}"'.format(MAX_SEATS, seats))
+        if len(actions) > MAX_HAND_ACTIONS:
+            raise ValueError('at most {} actions per hand. Got "{}"'.format(MAX_HAND_ACTIONS, len(actions)))
+
+        if (winners is None or category is None) and len(board) == 5:
+            strengths = [evaluator.evaluate(list(i) + list(board)) for i in hole]
+            best = max(strengths)
+            if winners is None:
+                winners = sum(1 << i for i, s in enumerate(strengths) if s == best)
+            if category is None:
+                category = [s >> CATEGORY_SHIFT for s in strengths]
+
+        if self.used == len(self.buffer):
+            self.flush()
+        record = self.buffer[self.used]
+        record['hand'] = self.count
+        record['seats'] = seats
+        record['hole'][:seats] = hole
+        record['board'][:len(board)] = board
+        record['n_actions'] = len(actions)
+        for i, action in enumerate(actions[:MAX_ACTIONS]):
+            record['actions'][i] = tuple(action)
+        if len(actions) > MAX_ACTIONS:
+            record['overflow'] = self._write_overflow(actions[MAX_ACTIONS:])
+        record['winners'] = winners or 0
+        if category is not None:
+            record['category'][:seats] = category
+        if payoff is not None:
+            record['payoff'][:seats] = payoff
+        self.used += 1
+        self.count += 1
+        return self.count - 1
+
+    def write_table(self, table, actions=(), payoff=None):
+        """
+        Add the hand currently dealt at a Table
+        """
+        return self.write(table.dealt.hole, table.dealt.board, actions, payoff=payoff)
+
+    def write_dealer(self, dealer):
+        """
+        Add the hand just played by a Dealer. Seats sitting the
+        hand out get NO_CARD hole cards and only the board cards
+        that were shown are kept.
+        """
+        state = dealer.state
+        if not state.finished:
+            raise ValueError('the hand is not finished')
+        hole = [i or (NO_CARD, NO_CARD) for i in state.hole]
+        board = state.board
+        category = [-1] * len(hole)
+        if len(board) == 5:
+            for seat, cards in enumerate(state.hole):
+                if cards and not state.folded[seat]:
+                    category[seat] = evaluator.evaluate(list(cards) + list(board)) >> CATEGORY_SHIFT
+        return self.write(hole, board, state.actions, state.winners, category, state.payoffs)
+
+    def _write_overflow(self, actions):
+        if self.overflow_file is None:
+            self.overflow_file = open(self.path + OVERFLOW_SUFFIX, 'ab')
+        np.array([tuple(i) for i in actions], dtype=ACTION_DTYPE).tofile(self.overflow_file)
+        self.overflow_count += len(actions)
+        return self.overflow_count - len(actions)
+
+    def flush(self):
+        if self.overflow_file is not None:
+            self.overflow_file.flush()
+        if self.used:
+            self.buffer[:self.used].tofile(self.file)
+            self.buffer[:self.used] = empty_records(self.used)
+            self.used = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+        if self.overflow_file is not None:
+            self.overflow_file.close()
+            self.overflow_file = None
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError('"{}" is not a hand history file'.format(path))
+    magic, version, seats, actions, size = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise ValueError('"{}" is not a hand history file'.format(path))
+    if (version, seats, actions, size) != (VERSION, MAX_SEATS, MAX_ACTIONS, RECORD_DTYPE.itemsize):
+        raise ValueError('"{}" has an unsupported record layout (version {})'.format(path, version))
+
+
+class HistoryReader(object):
+    """
+    Read only, memory mapped access to a file written by
+    HistoryWriter. Records are numpy structured values and
+    slices are views into the file; Card objects are only
+    created by cards.
+    """
+    def __init__(self, path):
+        self.path = path
+        _check_header(path)
+        size = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+        if size:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(size,))
+        else:
+            self.records = empty_records(0)
+        overflow = path + OVERFLOW_SUFFIX
+        if os.path.isfile(overflow) and os.path.getsize(overflow):
+            self.overflow = np.memmap(overflow, dtype=ACTION_DTYPE, mode='r')
+        else:
+            self.overflow = np.zeros(0, dtype=ACTION_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, item):
+        return self.records[item]
+
+    def chunks(self, chunk_size=65536):
+        """
+        :return: generator of consecutive views of at most chunk_size records
+        """
+        for start in range(0, len(self.records), chunk_size):
+            yield self.records[start:start + chunk_size]
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            for record in chunk:
+                yield record
+
+    def filter(self, predicate, chunk_size=65536):
+        """
+        Records matching a vectorised predicate
+        :param predicate: function of a chunk of records returning a boolean array,
+            e.g. lambda r: r['category'][:, 0] >= evaluator.FLUSH
+        :return: generator of arrays of matching records
+        """
+        for chunk in self.chunks(chunk_size):
+            mask = predicate(chunk)
+            if mask.any():
+                yield chunk[mask]
+
+    def indices(self, predicate, chunk_size=65536):
+        """
+        Like filter but only the record indices
+        :return: numpy array of int
+        """
+        found = [np.flatnonzero(predicate(chunk)) + start
+                 for start, chunk in zip(range(0, len(self.records), chunk_size), self.chunks(chunk_size))]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.intp)
+
+    @staticmethod
+    def cards(record):
+        """
+        Card objects of a record
+        :return: (list of [Card, Card] per seat, list of board Cards).
+            Seats that sat the hand out have None
+        """
+        seats = int(record['seats'])
+        hole = [[CARDS[j] for j in i] if i[0] != NO_CARD else None for i in record['hole'][:seats]]
+        board = [CARDS[i] for i in record['board'] if i != NO_CARD]
+        return hole, board
+
+    def actions(self, record):
+        """
+        :return: list of (seat, street name, action name, amount)
+        """
+        n = int(record['n_actions'])
+        actions = list(record['actions'][:n])
+        if n > MAX_ACTIONS:
+            start = int(record['overflow'])
+            actions.extend(self.overflow[start:start + n - MAX_ACTIONS])
+        return [(int(a['seat']), STREETS[a['street']], ACTIONS[a['kind']], int(a['amount'])) for a in actions]
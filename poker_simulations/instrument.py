@@ -0,0 +1,157 @@
+import logging
+import marshal
+from collections import OrderedDict
+from timeit import default_timer
+import evaluator
+from game import Deck, Hand, Table, HAND_TYPES
+
+LOG = logging.getLogger(__name__)
+
+
+def default_targets():
+    """
+    The hot paths of a simulation as (name, owner, attribute)
+    where owner.attribute is the function to time
+    """
+    targets = [
+        ('deck.shuffle', Deck, 'shuffle'),
+        ('table.deal', Table, 'deal'),
+        ('hand.eval', Hand, 'eval'),
+        ('evaluator.evaluate', evaluator, 'evaluate'),
+        ('table.best_cards', Table, 'best_cards'),
+    ]
+    for hand_type in HAND_TYPES:
+        targets.append(('{}.get_five_best'.format(hand_type.__name__), hand_type, 'get_five_best'))
+    return targets
+
+
+class Instrumentation(object):
+    """
+    Call counters and timers for the simulation hot paths.
+
+    Nothing is wrapped until enable is called and disable puts
+    the original functions back, so there is no cost at all
+    while instrumentation is off. For each target the number of
+    calls, the total time (including anything it calls) and its own
+    time (excluding other instrumented targets) are kept. Snapshots
+    are plain dicts so they can be sent back from worker processes
+    and combined with merge.
+    """
+    def __init__(self):
+        self.stats = OrderedDict()
+        self._originals = []
+        self._locations = {}
+        ## [start, time spent in instrumented callees] per active call
+        self._stack = []
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    def enable(self, targets=None):
+        """
+        Wrap targets with timers
+        :param targets: list of (name, owner, attribute). default_targets() by default
+        """
+        if self.enabled:
+            return
+        for name, owner, attribute in (targets or default_targets()):
+            ## only wrap functions defined on owner itself
+            original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+            self.stats.setdefault(name, [0, 0.0, 0.0])
+            self._locations[name] = _location(original)
+            setattr(owner, attribute, self._wrap(name, original))
+            self._originals.append((owner, attribute, original))
+
+    def disable(self):
+        for owner, attribute, original in reversed(self._originals):
+            setattr(owner, attribute, original)
+        self._originals = []
+
+    def reset(self):
+        self.stats = OrderedDict((i, [0, 0.0, 0.0]) for i in self.stats)
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+    def _wrap(self, name, func):
+        stats = self.stats
+        stack = self._stack
+
+        def wrapper(*args, **kwargs):
+            frame = [default_timer(), 0.0]
+            stack.append(frame)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = default_timer() - frame[0]
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                entry = stats[name]
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += elapsed - frame[1]
+
+        wrapper.__name__ = getattr(func, '__name__', name)
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def snapshot(self):
+        """
+        :return: dict of name to [calls, total time, own time]
+        """
+        return dict((k, list(v)) for k, v in self.stats.items())
+
+    def merge(self, snapshot):
+        """
+        Add the counts and times of a snapshot, e.g. one
+        returned from a worker process, into this instance
+        """
+        for name, (calls, total, own) in snapshot.items():
+            entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] += own
+
+    def summary(self):
+        """
+        stats as a text table, most expensive first
+        """
+        lines = ['{:<28} {:>10} {:>12} {:>12} {:>12}'.format('name', 'calls', 'total (s)', 'own (s)', 'per call (us)')]
+        rows = sorted(self.stats.items(), key=lambda i: i[1][1], reverse=True)
+        for name, (calls, total, own) in rows:
+            per_call = total / calls * 1e6 if calls else 0.0
+            lines.append('{:<28} {:>10} {:>12.4f} {:>12.4f} {:>12.2f}'.format(name, calls, total, own, per_call))
+        return '\n'.join(lines)
+
+    def dump_stats(self, path):
+        """
+        Write stats in the format read by pstats.Stats so they can
+        be viewed with the usual profiling tools
+        """
+        locations = self._locations
+        stats = {}
+        for name, (calls, total, own) in self.stats.items():
+            if not calls:
+                continue
+            key = locations.get(name, ('~', 0, name))
+            stats[key] = (calls, calls, own, total, {})
+        with open(path, 'wb') as f:
+            marshal.dump(stats, f)
+
+
+def _location(func):
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return ('~', 0, getattr(func, '__name__', str(func)))
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+## shared instance for a process
+INSTRUMENTATION = Instrumentation()
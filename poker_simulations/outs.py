@@ -0,0 +1,199 @@
+import logging
+from collections import OrderedDict, namedtuple
+from evaluator import (
+    EvalState, RANK_BIT, RANK_KEY, SUIT_KEY, FLUSH_BITS, FLUSH_SUIT, FLUSH_TABLE,
+    RANK_TABLE, STRAIGHT_TOP, CATEGORIES, category,
+    HIGH_CARD, PAIR, TWO_PAIR, THREE_OF_A_KIND, FOUR_OF_A_KIND,
+)
+from game import to_id
+
+LOG = logging.getLogger(__name__)
+
+## names of the draws reported by analyse
+DRAWS = ('flush_draw', 'backdoor_flush_draw', 'open_ended', 'gutshot', 'overcards')
+
+Outs = namedtuple('Outs', ['strength', 'category', 'outs', 'draws'])
+
+
+def _straight_outs(mask):
+    """
+    13 bit mask of the ranks that would complete a straight
+    for a rank mask that doesn't already hold one
+    """
+    if STRAIGHT_TOP[mask] >= 0:
+        return 0
+    outs = 0
+    for r in range(13):
+        if not mask & 1 << r and STRAIGHT_TOP[mask | 1 << r] >= 0:
+            outs |= 1 << r
+    return outs
+
+
+## indexed by a 13 bit rank mask
+STRAIGHT_OUTS = tuple(_straight_outs(mask) for mask in range(1 << 13))
+
+
+def _bits(mask):
+    return bin(mask).count('1')
+
+
+def analyse(hole_cards, board):
+    """
+    Outs and draws of a holding on the flop or turn.
+
+    Unseen cards are scored with the rank key, suit counters and
+    suit masks of an EvalState. Without a flush the strength only
+    depends on the new card's rank, so that is one table lookup per
+    rank rather than per card, and no trial evaluation. That is about
+    35-80us a query in CPython 2.7, tens of microseconds rather than a
+    few, so batch spots through numpy when that matters.
+    :param hole_cards: 2 Cards or card ids
+    :param board: 3 or 4 Cards or card ids
+    :return: Outs where outs maps each unseen card id that improves the
+        hand category, by more than it improves the board alone, to the
+        new category, and draws lists the names from DRAWS that apply
+    """
+    hole = [to_id(i) for i in hole_cards]
+    board = [to_id(i) for i in board]
+    if len(hole) != 2:
+        raise ValueError('hole_cards should be 2 cards. Got "{}"'.format(len(hole)))
+    if len(board) not in (3, 4):
+        raise ValueError('board should be 3 or 4 cards. Got "{}"'.format(len(board)))
+    known = hole + board
+    if len(set(known)) != len(known):
+        raise ValueError('hole_cards and board contain duplicate cards')
+
+    state = EvalState(known)
+    strength = state.strength
+    current = category(strength)
+    board_state = EvalState(board) if len(board) == 4 else None
+    board_counts = [0] * 13
+    for i in board:
+        board_counts[i >> 2] += 1
+    known_mask = 0
+    for i in known:
+        known_mask |= 1 << i
+
+    ## suit of the flush a card of each suit would complete, or -1
+    hand_flush = [_flush_suit(state, s) for s in range(4)]
+    board_flush = [_flush_suit(board_state, s) for s in range(4)] if board_state is not None else [-1] * 4
+    flush_suits = [s for s in range(4) if hand_flush[s] >= 0]
+    ## on a flop the board category only depends on how many of the rank it holds
+    four_card = {}
+
+    ## without a flush the new strength only depends on the rank, so
+    ## most ranks are ruled out with one lookup for all four cards
+    outs = OrderedDict()
+    for r in range(13):
+        if known_mask >> (r << 2) & 15 == 15:
+            continue
+        key = RANK_KEY[r << 2]
+        new = category(RANK_TABLE[state.key + key])
+        if new <= current and not flush_suits:
+            continue
+        ## cards that improve the board as much as the hand help everyone
+        if board_state is not None:
+            on_board = category(RANK_TABLE[board_state.key + key])
+        else:
+            n = board_counts[r]
+            if n not in four_card:
+                four_card[n] = _four_card_category(board_counts, r)
+            on_board = four_card[n]
+        for s in (range(4) if new > current else flush_suits):
+            c = r << 2 | s
+            if known_mask >> c & 1:
+                continue
+            hand = new if hand_flush[s] < 0 else category(_flush_strength(state, hand_flush[s], c))
+            if hand <= current:
+                continue
+            if board_flush[s] >= 0 and hand <= category(_flush_strength(board_state, board_flush[s], c)):
+                continue
+            if hand > on_board:
+                outs[c] = hand
+
+    return Outs(strength, current, outs, _draws(state, hole, board))
+
+
+def _flush_suit(state, suit):
+    """
+    Suit of the flush that state plus a card of suit holds, or -1
+    """
+    flush = (state.suits + SUIT_KEY[suit]) & FLUSH_BITS
+    return FLUSH_SUIT[flush] if flush else -1
+
+
+def _flush_strength(state, flush_suit, c):
+    """
+    Strength of state plus card id c when that holds a flush in flush_suit
+    """
+    mask = state.suit_masks[flush_suit]
+    if flush_suit == c & 3:
+        mask |= RANK_BIT[c]
+    return FLUSH_TABLE[mask]
+
+
+def _four_card_category(counts, rank):
+    """
+    Category of a 3 card board plus a card of rank. Four cards
+    can't make a straight or flush.
+    """
+    counts = sorted([n + (r == rank) for r, n in enumerate(counts) if n or r == rank], reverse=True)
+    if counts[0] == 4:
+        return FOUR_OF_A_KIND
+    if counts[0] == 3:
+        return THREE_OF_A_KIND
+    if counts[0] == 2:
+        return TWO_PAIR if counts[1] == 2 else PAIR
+    return HIGH_CARD
+
+
+def _draws(state, hole, board):
+    draws = []
+    for suit in range(4):
+        ## the draw has to use a hole card
+        if not any(i & 3 == suit for i in hole):
+            continue
+        n = state.suit_count(suit)
+        if n == 4:
+            draws.append('flush_draw')
+        elif n == 3 and len(board) == 3:
+            draws.append('backdoor_flush_draw')
+
+    hole_ranks = RANK_BIT[hole[0]] | RANK_BIT[hole[1]]
+    board_ranks = 0
+    for i in board:
+        board_ranks |= RANK_BIT[i]
+    straight = STRAIGHT_OUTS[state.rank_mask] & ~STRAIGHT_OUTS[board_ranks]
+    ## ignore draws the hole cards don't take part in
+    if hole_ranks & ~board_ranks:
+        n = _bits(straight)
+        ## two completing ranks, which includes double gutshots
+        if n >= 2:
+            draws.append('open_ended')
+        elif n == 1:
+            draws.append('gutshot')
+
+    if min(hole[0] >> 2, hole[1] >> 2) > max(i >> 2 for i in board):
+        draws.append('overcards')
+    return draws
+
+
+def out_count(hole_cards, board):
+    """
+    :return: number of unseen cards that improve the hand category
+    """
+    return len(analyse(hole_cards, board).outs)
+
+
+def outs_by_category(outs):
+    """
+    Group the outs of analyse by the category they make
+    :param outs: Outs or its outs dict
+    :return: OrderedDict of category name to list of card ids, strongest first
+    """
+    if isinstance(outs, Outs):
+        outs = outs.outs
+    grouped = OrderedDict()
+    for cat in sorted(set(outs.values()), reverse=True):
+        grouped[CATEGORIES[cat]] = [c for c, i in outs.items() if i == cat]
+    return grouped
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import random
+import numpy as np
+from batch import evaluate_batch
+from evaluator import CATEGORY_SHIFT
+from game import MAX_PLAYERS
+
+LOG = logging.getLogger(__name__)
+
+## name, dtype and per hand shape of each column. "players"
+## is replaced with the number of seats at the table
+COLUMNS = (
+    ('hole', 'uint8', ('players', 2)),
+    ('board', 'uint8', (5,)),
+    ('category', 'int8', ('players',)),
+    ('winners', 'uint32', ()),
+)
+
+META_FILE = 'meta.json'
+
+
+def _shape(shape, players):
+    return tuple(players if i == 'players' else i for i in shape)
+
+
+def deal_chunk(rng, players, n):
+    """
+    Deal n independent hands to players seats and resolve
+    the showdowns.
+    :param rng: numpy.random.RandomState
+    :return: dict of column name to array with n rows
+    """
+    need = 2 * players + 5
+    keys = rng.random_sample((n, 52))
+    ## a full argsort so the dealt cards are in random order; the first
+    ## need columns of an argpartition are ordered by card id
+    cards = np.argsort(keys, axis=1)[:, :need].astype(np.uint8)
+    hole = cards[:, :2 * players].reshape(n, players, 2)
+    board = cards[:, 2 * players:]
+
+    hands = np.empty((n, players, 7), dtype=np.int16)
+    hands[:, :, :2] = hole
+    hands[:, :, 2:] = board[:, None, :]
+    strengths = evaluate_batch(hands.reshape(-1, 7))[0].reshape(n, players)
+
+    best = strengths.max(axis=1)
+    seat_bits = (np.uint32(1) << np.arange(players, dtype=np.uint32))
+    winners = ((strengths == best[:, None]) * seat_bits).sum(axis=1).astype(np.uint32)
+    return {
+        'hole': hole,
+        'board': board,
+        'category': (strengths >> CATEGORY_SHIFT).astype(np.int8),
+        'winners': winners,
+    }
+
+
+def simulate_chunks(hands, players=6, chunk_size=10000, seed=None):
+    """
+    Generate simulated hands in chunks of chunk_size hands so
+    only one chunk is ever held in memory.
+    :param hands: total number of hands
+    :param players: seats per table
+    :param seed: int. Chunk i is seeded with (seed, i)
+    :return: generator of column dicts (see deal_chunk)
+    """
+    if not 2 <= players <= MAX_PLAYERS:
+        raise ValueError('players should be between 2 and {}. Got "{}"'.format(MAX_PLAYERS, players))
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 32 - 1)
+    for i, start in enumerate(range(0, hands, chunk_size)):
+        rng = np.random.RandomState([seed, i])
+        yield deal_chunk(rng, players, min(chunk_size, hands - start))
+
+
+def simulate_hands(hands, players=6, chunk_size=10000, seed=None):
+    """
+    Like simulate_chunks but yield one hand at a time
+    :return: generator of dicts of column name to value
+    """
+    for chunk in simulate_chunks(hands, players, chunk_size, seed):
+        for i in range(len(chunk['winners'])):
+            yield dict((k, v[i]) for k, v in chunk.items())
+
+
+class ColumnarWriter(object):
+    """
+    Append simulated hands to a directory of raw binary column
+    files, one per entry of COLUMNS, plus a small JSON meta file
+    that records dtypes, shapes and the number of rows.
+    """
+    def __init__(self, path, players):
+        self.path = path
+        self.players = players
+        self.rows = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.files = dict(
+            (name, open(os.path.join(path, name + '.bin'), 'wb')) for name, _, _ in COLUMNS
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, chunk):
+        """
+        :param chunk: dict of column name to array, as from simulate_chunks
+        """
+        for name, dtype, shape in COLUMNS:
+            column = np.ascontiguousarray(chunk[name], dtype=dtype)
+            if column.shape[1:] != _shape(shape, self.players):
+                raise ValueError('column "{}" has shape {}'.format(name, column.shape))
+            column.tofile(self.files[name])
+        self.rows += len(chunk['winners'])
+
+    def close(self):
+        if self.files is None:
+            return
+        for f in self.files.values():
+            f.close()
+        self.files = None
+        meta = {
+            'rows': self.rows,
+            'players': self.players,
+            'columns': [[name, dtype, list(_shape(shape, self.players))] for name, dtype, shape in COLUMNS],
+        }
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+
+class ColumnarReader(object):
+    """
+    Memory mapped, read only access to the columns written by
+    a ColumnarWriter. Columns are mapped when first accessed.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.rows = self.meta['rows']
+        self.players = self.meta['players']
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            for column, dtype, shape in self.meta['columns']:
+                if column == name:
+                    break
+            else:
+                raise KeyError(name)
+            self._columns[name] = np.memmap(
+                os.path.join(self.path, name + '.bin'), dtype=dtype, mode='r',
+                shape=(self.rows,) + tuple(shape)
+            )
+        return self._columns[name]
+
+    @property
+    def columns(self):
+        return [i[0] for i in self.meta['columns']]
+
+
+def run_simulation(path, hands, players=6, chunk_size=10000, seed=None):
+    """
+    Simulate hands and stream them to a columnar file
+    :return: ColumnarReader over the result
+    """
+    with ColumnarWriter(path, players) as writer:
+        for chunk in simulate_chunks(hands, players, chunk_size, seed):
+            writer.write(chunk)
+    return ColumnarReader(path)
@@ -0,0 +1,155 @@
+import logging
+import os
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import evaluator
+from batch import evaluate_batch
+from equity import _check_cards, combinations_array
+
+LOG = logging.getLogger(__name__)
+
+## rows and columns of Potential.transitions
+AHEAD, TIED, BEHIND = 0, 1, 2
+
+## evaluations per call to evaluate_batch
+BATCH_SIZE = 2 ** 20
+
+Potential = namedtuple('Potential', ['hs', 'ppot', 'npot', 'ehs', 'transitions'])
+
+
+def _states(hero, villain):
+    return np.where(hero > villain, AHEAD, np.where(hero == villain, TIED, BEHIND))
+
+
+def _masks(cards):
+    """
+    52 bit mask of each row of card ids
+    """
+    masks = np.zeros(len(cards), dtype=np.int64)
+    for col in range(cards.shape[1]):
+        masks |= np.int64(1) << cards[:, col].astype(np.int64)
+    return masks
+
+
+def _evaluate(rows, *columns):
+    """
+    Evaluate hands built by stacking the columns, each either
+    a fixed list of card ids or an array with one row per hand
+    """
+    parts = [np.tile(np.array(i, dtype=np.int16), (rows, 1)) if not isinstance(i, np.ndarray) else i
+             for i in columns]
+    strengths = np.empty(rows, dtype=np.int32)
+    for start in range(0, rows, BATCH_SIZE):
+        chunk = np.hstack([i[start:start + BATCH_SIZE] for i in parts])
+        strengths[start:start + BATCH_SIZE] = evaluate_batch(chunk)[0]
+    return strengths
+
+
+def _potential(hs, transitions, opponents):
+    """
+    PPOT, NPOT and EHS from a 3 x 3 array counting (now, final) states
+    """
+    hp = transitions.astype(np.float64)
+    totals = hp.sum(axis=1)
+    denom = totals[BEHIND] + totals[TIED] / 2.0
+    ppot = (hp[BEHIND, AHEAD] + hp[BEHIND, TIED] / 2.0 + hp[TIED, AHEAD] / 2.0) / denom if denom else 0.0
+    denom = totals[AHEAD] + totals[TIED] / 2.0
+    npot = (hp[AHEAD, BEHIND] + hp[TIED, BEHIND] / 2.0 + hp[AHEAD, TIED] / 2.0) / denom if denom else 0.0
+    hs = hs ** opponents
+    return Potential(hs, ppot, npot, hs + (1 - hs) * ppot, transitions)
+
+
+def hand_potential(hole_cards, board, exact=None, samples=20000, seed=None, opponents=1):
+    """
+    Hand strength (HS), positive potential (PPOT), negative
+    potential (NPOT) and effective hand strength (EHS) of hole cards.
+
+    HS is the chance of being ahead of a random opponent hand now,
+    counting ties as half. PPOT is the chance of ending up ahead when
+    behind now and NPOT the chance of ending up behind when ahead now.
+    EHS = HS + (1 - HS) * PPOT. HS is always enumerated; the potentials
+    enumerate every opponent hand and runout when exact, or use samples
+    random (opponent hand, runout) pairs otherwise.
+    :param hole_cards: 2 Cards or card ids
+    :param board: 3, 4 or 5 Cards or card ids
+    :param exact: enumerate the potentials. By default True on the
+        turn and False on the flop
+    :param samples: number of samples when not exact
+    :param seed: for numpy.random.RandomState when sampling
+    :param opponents: HS and EHS are for this many opponents, HS ** opponents
+    :return: Potential. transitions is a 3 x 3 array counting
+        (state now, final state) pairs indexed by AHEAD, TIED and BEHIND
+    """
+    hole, board = _check_cards(hole_cards, board, 2)
+    if len(board) < 3:
+        raise ValueError('board should be 3, 4 or 5 cards. Got "{}"'.format(len(board)))
+    known = set(hole + board)
+    deck = np.array([i for i in range(52) if i not in known], dtype=np.int16)
+    opps = deck[combinations_array(len(deck), 2)]
+
+    hero_now = evaluator.evaluate(hole + board)
+    opp_now = _evaluate(len(opps), opps, board)
+    now = _states(hero_now, opp_now)
+    hs = float(np.mean(np.where(now == AHEAD, 1.0, np.where(now == TIED, 0.5, 0.0))))
+
+    n_board = 5 - len(board)
+    if not n_board:
+        return _potential(hs, np.diag(np.bincount(now, minlength=3)), opponents)
+
+    if exact is None:
+        exact = n_board == 1
+    if exact:
+        runouts = deck[combinations_array(len(deck), n_board)]
+        hero_final = _evaluate(len(runouts), hole, board, runouts)
+        valid = (_masks(opps)[:, None] & _masks(runouts)[None, :]) == 0
+        o, r = np.nonzero(valid)
+        hero_final = hero_final[r]
+        runout = runouts[r]
+    else:
+        rng = np.random.RandomState(seed)
+        o = rng.randint(len(opps), size=samples)
+        keys = rng.random_sample((samples, 52))
+        rows = np.arange(samples)[:, None]
+        ## dead cards can never be among the smallest keys
+        keys[:, list(known)] = 2.0
+        keys[rows, opps[o]] = 2.0
+        runout = np.argpartition(keys, n_board, axis=1)[:, :n_board].astype(np.int16)
+        hero_final = _evaluate(samples, hole, board, runout)
+
+    opp_final = _evaluate(len(o), opps[o], board, runout)
+    final = _states(hero_final, opp_final)
+    transitions = np.bincount(now[o] * 3 + final, minlength=9).reshape(3, 3)
+    return _potential(hs, transitions, opponents)
+
+
+def _hand_potential(args):
+    query, kwargs = args
+    return hand_potential(*query, **kwargs)
+
+
+def hand_potentials(queries, exact=None, samples=20000, seed=None, opponents=1, workers=1):
+    """
+    hand_potential of many (hole cards, board) queries, e.g. every
+    decision in a batch of training hands.
+
+    Query i is seeded with (seed, i), so the answers don't depend
+    on the number of workers.
+    :param queries: list of (hole cards, board)
+    :param workers: number of worker processes. 1 runs in this
+        process and None uses one worker per cpu.
+    :return: list of Potential in the order of queries
+    """
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 32 - 1)
+    jobs = [(query, dict(exact=exact, samples=samples, seed=[seed, i], opponents=opponents))
+            for i, query in enumerate(queries)]
+
+    if workers is None:
+        workers = os.cpu_count() if hasattr(os, 'cpu_count') else None
+    if workers == 1 or len(jobs) < 2:
+        return [_hand_potential(i) for i in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_hand_potential, jobs))
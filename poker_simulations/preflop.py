@@ -0,0 +1,179 @@
+import logging
+import os
+from itertools import combinations
+import numpy as np
+from numpy.lib.format import open_memmap
+from game import to_id
+from batch import evaluate_batch
+
+LOG = logging.getLogger(__name__)
+
+N_CLASSES = 169
+
+RANK_NAMES = ('2', '3', '4', '5', '6', '7', '8', '9', 'T', 'J', 'Q', 'K', 'A')
+
+
+def hand_class(card1, card2):
+    """
+    Index of the canonical starting hand of two hole cards.
+
+    Classes are laid out on a 13 x 13 grid of internal ranks:
+    pairs on the diagonal, suited hands at high * 13 + low and
+    offsuit hands at low * 13 + high.
+    :param card1: Card or card id
+    :param card2: Card or card id
+    :return: int in range(169)
+    """
+    return CLASS_OF[to_id(card1) * 52 + to_id(card2)]
+
+
+def _hand_class(i, j):
+    high, low = max(i >> 2, j >> 2), min(i >> 2, j >> 2)
+    if i & 3 == j & 3:
+        return high * 13 + low
+    return low * 13 + high
+
+
+## hand class of every ordered pair of card ids, indexed by id1 * 52 + id2
+CLASS_OF = tuple(_hand_class(i, j) for i in range(52) for j in range(52))
+
+
+def class_name(index):
+    """
+    Name of a hand class, e.g. 'AKs', 'T9o' or '77'
+    :param index: int in range(169)
+    :return: str
+    """
+    a, b = divmod(index, 13)
+    if a == b:
+        return RANK_NAMES[a] * 2
+    if a > b:
+        return RANK_NAMES[a] + RANK_NAMES[b] + 's'
+    return RANK_NAMES[b] + RANK_NAMES[a] + 'o'
+
+
+def class_combos(index):
+    """
+    Every concrete pair of card ids in a hand class.
+    There are 6 for a pair, 4 suited and 12 offsuit.
+    :return: list of (id, id) tuples
+    """
+    return CLASS_COMBOS[index]
+
+
+def cell_equity(i, j, samples, seed):
+    """
+    Monte Carlo equity of class i against class j.
+
+    Every pair of combos that share no card is equally likely, which
+    gives each class pair its natural suit combo weighting.
+    :param samples: number of random deals
+    :param seed: sequence of ints for numpy.random.RandomState
+    :return: float
+    """
+    pairs = [(a, b) for a in class_combos(i) for b in class_combos(j) if not set(a) & set(b)]
+    pairs = np.array(pairs, dtype=np.int16).reshape(-1, 4)
+    rng = np.random.RandomState(seed)
+
+    holes = pairs[rng.randint(len(pairs), size=samples)]
+    rows = np.arange(samples)[:, None]
+    keys = rng.random_sample((samples, 52))
+    ## dead cards can never be among the 5 smallest keys
+    keys[rows, holes] = 2.0
+    board = np.argpartition(keys, 5, axis=1)[:, :5].astype(np.int16)
+
+    cards = np.empty((samples, 2, 7), dtype=np.int16)
+    cards[:, 0, :2] = holes[:, :2]
+    cards[:, 1, :2] = holes[:, 2:]
+    cards[:, :, 2:] = board[:, None, :]
+    strengths = evaluate_batch(cards.reshape(-1, 7))[0].reshape(samples, 2)
+    wins = (strengths[:, 0] > strengths[:, 1]).sum()
+    ties = (strengths[:, 0] == strengths[:, 1]).sum()
+    return (wins + 0.5 * ties) / float(samples)
+
+
+def build_preflop_table(path, samples=20000, seed=0, rows=None):
+    """
+    Compute the 169 x 169 preflop equity matrix and write it to
+    path as a float32 .npy file. Cell [i, j] is the equity of class i
+    against class j.
+
+    Cells that are not computed yet hold NaN and the file is
+    flushed after every row, so calling this again with the same path
+    resumes a partial build. Each cell is seeded with (seed, i, j) so
+    a resumed build gives the same matrix as an uninterrupted one.
+    :param path: output file
+    :param samples: random deals per cell
+    :param seed: int
+    :param rows: optional iterable of row indices to compute. All rows by default
+    :return: the matrix as a numpy.memmap
+    """
+    if os.path.isfile(path):
+        matrix = open_memmap(path, mode='r+')
+    else:
+        matrix = open_memmap(path, mode='w+', dtype=np.float32, shape=(N_CLASSES, N_CLASSES))
+        matrix[:] = np.nan
+
+    for i in (range(N_CLASSES) if rows is None else rows):
+        if not np.isnan(matrix[i]).any():
+            continue
+        for j in range(i, N_CLASSES):
+            if not np.isnan(matrix[i, j]):
+                continue
+            ## the same distribution on both sides is an even split
+            e = 0.5 if i == j else cell_equity(i, j, samples, [seed, i, j])
+            matrix[i, j] = e
+            matrix[j, i] = 1.0 - e
+        matrix.flush()
+        LOG.info('preflop row {} ({}) done'.format(i, class_name(i)))
+    return matrix
+
+
+class PreflopTable(object):
+    """
+    Read only access to a matrix written by build_preflop_table.
+    The file is memory mapped the first time it is used.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._matrix = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = np.load(self.path, mmap_mode='r')
+        return self._matrix
+
+    @property
+    def complete(self):
+        return not np.isnan(self.matrix).any()
+
+    def class_equity(self, class1, class2):
+        """
+        :param class1: hand class index or name, e.g. 'AKs'
+        :param class2: hand class index or name
+        :return: float
+        """
+        if isinstance(class1, str):
+            class1 = CLASS_NAMES[class1]
+        if isinstance(class2, str):
+            class2 = CLASS_NAMES[class2]
+        return float(self.matrix[class1, class2])
+
+    def equity(self, hand1, hand2):
+        """
+        Equity of hand1 against hand2
+        :param hand1: two Cards or card ids
+        :param hand2: two Cards or card ids
+        :return: float
+        """
+        i = CLASS_OF[to_id(hand1[0]) * 52 + to_id(hand1[1])]
+        j = CLASS_OF[to_id(hand2[0]) * 52 + to_id(hand2[1])]
+        return float(self.matrix[i, j])
+
+
+CLASS_NAMES = dict((class_name(i), i) for i in range(N_CLASSES))
+
+CLASS_COMBOS = tuple([] for i in range(N_CLASSES))
+for _i, _j in combinations(range(52), 2):
+    CLASS_COMBOS[CLASS_OF[_i * 52 + _j]].append((_i, _j))
@@ -0,0 +1,318 @@
+import logging
+import re
+import numpy as np
+from game import to_id, SUITS
+from batch import evaluate_batch
+from equity import EquityResult, combinations_array
+from preflop import RANK_NAMES, CLASS_COMBOS
+
+LOG = logging.getLogger(__name__)
+
+## every unordered pair of card ids, in the order of itertools.combinations
+COMBOS = combinations_array(52, 2)
+N_COMBOS = len(COMBOS)
+
+## index of the combo holding card ids i and j, at i * 52 + j and j * 52 + i
+COMBO_INDEX = np.full(52 * 52, -1, dtype=np.int32)
+COMBO_INDEX[COMBOS[:, 0] * 52 + COMBOS[:, 1]] = np.arange(N_COMBOS)
+COMBO_INDEX[COMBOS[:, 1] * 52 + COMBOS[:, 0]] = np.arange(N_COMBOS)
+
+## 52 bit mask of the cards in each combo
+COMBO_MASKS = (np.int64(1) << COMBOS[:, 0].astype(np.int64)) | (np.int64(1) << COMBOS[:, 1].astype(np.int64))
+
+RANK_CHARS = dict((j, i) for i, j in enumerate(RANK_NAMES))
+SUIT_CHARS = dict((j.lower(), i) for i, j in enumerate(SUITS))
+
+_TOKEN = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)(\+?)$')
+_SPAN = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)-([2-9TJQKA])([2-9TJQKA])([so]?)$')
+_COMBO = re.compile(r'^([2-9TJQKA])([cdhs])([2-9TJQKA])([cdhs])$')
+
+## pairs with more evaluations than this are evaluated in several batches
+BATCH_SIZE = 2 ** 21
+
+
+def _classes(high, low, kind):
+    """
+    hand class indices of two internal ranks. kind is 's', 'o' or ''
+    """
+    if high == low:
+        return [high * 13 + high]
+    high, low = max(high, low), min(high, low)
+    classes = []
+    if kind in ('s', ''):
+        classes.append(high * 13 + low)
+    if kind in ('o', ''):
+        classes.append(low * 13 + high)
+    return classes
+
+
+def _parse_token(token):
+    """
+    :return: list of combo indices described by one range token
+    """
+    match = _COMBO.match(token)
+    if match:
+        r1, s1, r2, s2 = match.groups()
+        i = RANK_CHARS[r1] << 2 | SUIT_CHARS[s1]
+        j = RANK_CHARS[r2] << 2 | SUIT_CHARS[s2]
+        if i == j:
+            raise ValueError('invalid range "{}"'.format(token))
+        return [COMBO_INDEX[i * 52 + j]]
+
+    classes = []
+    match = _TOKEN.match(token)
+    span = _SPAN.match(token)
+    if match:
+        a, b, kind, plus = match.groups()
+        high, low = max(RANK_CHARS[a], RANK_CHARS[b]), min(RANK_CHARS[a], RANK_CHARS[b])
+        if high == low and kind:
+            raise ValueError('invalid range "{}"'.format(token))
+        if not plus:
+            classes = _classes(high, low, kind)
+        elif high == low:
+            ## QQ+ is every pair from QQ up
+            for r in range(low, 13):
+                classes += _classes(r, r, kind)
+        else:
+            ## ATs+ raises the kicker up to one below the top card
+            for r in range(low, high):
+                classes += _classes(high, r, kind)
+    elif span:
+        a1, b1, kind1, a2, b2, kind2 = span.groups()
+        start = (RANK_CHARS[a1], RANK_CHARS[b1])
+        end = (RANK_CHARS[a2], RANK_CHARS[b2])
+        if kind1 != kind2:
+            raise ValueError('invalid range "{}"'.format(token))
+        top, bottom = max(start, end), min(start, end)
+        if top[0] == top[1] and bottom[0] == bottom[1]:
+            ## QQ-88
+            for r in range(bottom[0], top[0] + 1):
+                classes += _classes(r, r, kind1)
+        elif top[0] == bottom[0] and top[1] != top[0]:
+            ## A5s-A2s keeps the top card and steps the kicker
+            for r in range(bottom[1], top[1] + 1):
+                classes += _classes(top[0], r, kind1)
+        elif top[0] - top[1] == bottom[0] - bottom[1] and top[0] != top[1]:
+            ## 76s-54s steps both cards keeping the gap
+            for r in range(0, top[0] - bottom[0] + 1):
+                classes += _classes(bottom[0] + r, bottom[1] + r, kind1)
+        else:
+            raise ValueError('invalid range "{}"'.format(token))
+    else:
+        raise ValueError('invalid range "{}"'.format(token))
+
+    return [COMBO_INDEX[i * 52 + j] for c in classes for i, j in CLASS_COMBOS[c]]
+
+
+class Range(object):
+    """
+    A weighted set of hole card combos.
+
+    weights is a float array with one entry for each of the 1326
+    combos in COMBOS. A weight of 0 means the combo isn't in the
+    range and 1 means it is fully in it.
+    """
+    def __init__(self, weights=None):
+        if weights is None:
+            weights = np.zeros(N_COMBOS)
+        self.weights = np.array(weights, dtype=np.float64)
+        if self.weights.shape != (N_COMBOS,):
+            raise ValueError('weights should have {} entries. Got "{}"'.format(N_COMBOS, self.weights.shape))
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Range from standard notation, e.g. "QQ+, AKs, 76s-54s, AhKd".
+        A token can end with a weight, e.g. "AQo:0.5". Later tokens
+        overwrite the weight of combos given earlier.
+        """
+        weights = np.zeros(N_COMBOS)
+        for token in text.replace(' ', '').split(','):
+            if not token:
+                continue
+            weight = 1.0
+            if ':' in token:
+                token, weight = token.split(':', 1)
+                try:
+                    weight = float(weight)
+                except ValueError:
+                    raise ValueError('invalid weight "{}"'.format(weight))
+                if weight < 0:
+                    raise ValueError('invalid weight "{}"'.format(weight))
+            weights[_parse_token(token)] = weight
+        return cls(weights)
+
+    @classmethod
+    def from_hands(cls, hands):
+        """
+        :param hands: list of two Cards or card ids
+        """
+        weights = np.zeros(N_COMBOS)
+        for hand in hands:
+            weights[COMBO_INDEX[to_id(hand[0]) * 52 + to_id(hand[1])]] = 1.0
+        return cls(weights)
+
+    @classmethod
+    def full(cls):
+        return cls(np.ones(N_COMBOS))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.weights))
+
+    def __contains__(self, hand):
+        return self.weights[COMBO_INDEX[to_id(hand[0]) * 52 + to_id(hand[1])]] > 0
+
+    def __str__(self):
+        return 'Range({} combos)'.format(len(self))
+
+    def __repr__(self):
+        return self.__str__()
+
+    def remove(self, dead):
+        """
+        Copy of the range without combos that use any of the dead cards
+        :param dead: Cards or card ids
+        """
+        mask = np.int64(0)
+        for card in dead:
+            mask |= np.int64(1) << np.int64(to_id(card))
+        weights = self.weights.copy()
+        weights[(COMBO_MASKS & mask) != 0] = 0.0
+        return Range(weights)
+
+    def combos(self):
+        """
+        Combos with a positive weight
+        :return: tuple of (combo indices, (n, 2) card ids, weights)
+        """
+        index = np.flatnonzero(self.weights > 0)
+        return index, COMBOS[index], self.weights[index]
+
+
+def parse_range(text):
+    return Range.parse(text)
+
+
+def _as_range(hands):
+    if isinstance(hands, Range):
+        return hands
+    return Range.parse(hands)
+
+
+def _pairs(range1, range2):
+    """
+    Every pair of combos from the two ranges that share no card
+    :return: tuple of (combo index 1, combo index 2, pair weight)
+    """
+    i1, _, w1 = range1.combos()
+    i2, _, w2 = range2.combos()
+    disjoint = (COMBO_MASKS[i1][:, None] & COMBO_MASKS[i2][None, :]) == 0
+    a, b = np.nonzero(disjoint)
+    return i1[a], i2[b], w1[a] * w2[b]
+
+
+def _exact(pairs, board, dead):
+    """
+    Enumerate every runout for every pair of combos
+    """
+    c1, c2, w = pairs
+    used, inverse = np.unique(np.concatenate([c1, c2]), return_inverse=True)
+    a, b = inverse[:len(c1)], inverse[len(c1):]
+
+    deck = np.array([i for i in range(52) if i not in board and i not in dead], dtype=np.int16)
+    runouts = deck[combinations_array(len(deck), 5 - len(board))]
+    n, r = len(used), len(runouts)
+
+    ## strength of every used combo on every runout, and whether
+    ## the runout is possible with that combo
+    cards = np.empty((n, r, 7), dtype=np.int16)
+    cards[:, :, :2] = COMBOS[used][:, None, :]
+    cards[:, :, 2:2 + len(board)] = board
+    cards[:, :, 2 + len(board):] = runouts[None, :, :]
+    strengths = np.empty((n, r), dtype=np.int32)
+    rows = max(BATCH_SIZE // r, 1)
+    for start in range(0, n, rows):
+        chunk = cards[start:start + rows]
+        strengths[start:start + rows] = evaluate_batch(chunk.reshape(-1, 7))[0].reshape(len(chunk), r)
+    runout_masks = np.zeros(r, dtype=np.int64)
+    for col in range(runouts.shape[1]):
+        runout_masks |= np.int64(1) << runouts[:, col].astype(np.int64)
+    valid = (COMBO_MASKS[used][:, None] & runout_masks[None, :]) == 0
+
+    wins = ties = losses = 0.0
+    for start in range(0, len(a), rows):
+        pa, pb, pw = a[start:start + rows], b[start:start + rows], w[start:start + rows]
+        both = valid[pa] & valid[pb]
+        sa, sb = strengths[pa], strengths[pb]
+        wins += float(np.dot(((sa > sb) & both).sum(axis=1), pw))
+        ties += float(np.dot(((sa == sb) & both).sum(axis=1), pw))
+        losses += float(np.dot(((sa < sb) & both).sum(axis=1), pw))
+    return EquityResult(wins, ties, losses, wins + 0.5 * ties, wins + 0.25 * ties, exact=True)
+
+
+def _sampled(pairs, board, dead, samples, seed):
+    """
+    Sample a pair of combos by weight, then a runout
+    """
+    c1, c2, w = pairs
+    rng = np.random.RandomState(seed)
+    result = EquityResult()
+    n_board = 5 - len(board)
+    rows = max(BATCH_SIZE // 2, 1)
+    for start in range(0, samples, rows):
+        m = min(rows, samples - start)
+        pick = rng.choice(len(w), size=m, p=w / w.sum())
+        hole1, hole2 = COMBOS[c1[pick]], COMBOS[c2[pick]]
+        keys = rng.random_sample((m, 52))
+        index = np.arange(m)[:, None]
+        ## dead cards can never be among the smallest keys
+        keys[:, board + dead] = 2.0
+        keys[index, hole1] = 2.0
+        keys[index, hole2] = 2.0
+        runout = np.argpartition(keys, n_board, axis=1)[:, :n_board].astype(np.int16)
+
+        cards = np.empty((m, 2, 7), dtype=np.int16)
+        cards[:, 0, :2] = hole1
+        cards[:, 1, :2] = hole2
+        cards[:, :, 2:2 + len(board)] = board
+        cards[:, :, 2 + len(board):] = runout[:, None, :]
+        strengths = evaluate_batch(cards.reshape(-1, 7))[0].reshape(m, 2)
+        wins = int((strengths[:, 0] > strengths[:, 1]).sum())
+        ties = int((strengths[:, 0] == strengths[:, 1]).sum())
+        result += EquityResult(wins, ties, m - wins - ties, wins + 0.5 * ties, wins + 0.25 * ties)
+    return result
+
+
+def range_equity(range1, range2, board=None, dead=None, samples=None, seed=None):
+    """
+    Equity of range1 against range2.
+
+    Each pair of combos that share no card with each other, the
+    board or the dead cards is weighted by the product of the combo
+    weights. With 3 or more board cards every runout is enumerated;
+    preflop, or whenever samples is given, pairs and runouts are sampled.
+    :param range1: Range or range notation
+    :param range2: Range or range notation
+    :param board: 0, 3, 4 or 5 Cards or card ids
+    :param dead: other Cards or card ids known to be out of play
+    :param samples: number of random deals. Exact enumeration when None
+        and the board has at least 3 cards
+    :param seed: for numpy.random.RandomState when sampling
+    :return: EquityResult from the point of view of range1
+    """
+    board = [to_id(i) for i in (board or [])]
+    dead = [to_id(i) for i in (dead or [])]
+    if len(board) not in (0, 3, 4, 5):
+        raise ValueError('board should be 0, 3, 4 or 5 cards. Got "{}"'.format(len(board)))
+    if len(set(board + dead)) != len(board + dead):
+        raise ValueError('board and dead contain duplicate cards')
+    range1 = _as_range(range1).remove(board + dead)
+    range2 = _as_range(range2).remove(board + dead)
+
+    pairs = _pairs(range1, range2)
+    if not len(pairs[2]):
+        raise ValueError('no combos of the two ranges can be dealt together')
+
+    if samples is None and board:
+        return _exact(pairs, board, dead)
+    return _sampled(pairs, board, dead, samples or 100000, seed)
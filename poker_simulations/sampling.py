@@ -0,0 +1,270 @@
+import logging
+import random
+from math import sqrt
+import numpy as np
+from batch import evaluate_batch
+from equity import EquityResult, _check_cards, showdown_shares
+
+LOG = logging.getLogger(__name__)
+
+## bases of the Halton sequence, one per dealt card
+PRIMES = (
+    2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53, 59, 61, 67, 71,
+    73, 79, 83, 89, 97, 101, 103, 107, 109, 113, 127, 131, 137, 139, 149, 151,
+    157, 163, 167, 173, 179, 181, 191, 193, 197, 199, 211, 223, 227, 229,
+)
+
+
+def _deal(deck, hole, board, players, u):
+    """
+    Deal from deck by a partial Fisher-Yates shuffle driven by
+    uniforms, board cards first then the opponents' hole cards.
+    :param deck: card ids that can still be dealt
+    :param u: (N, need) uniforms in [0, 1)
+    :return: (N, players, 7) array of card ids with the hero in player 0
+    """
+    n, need = u.shape
+    rows = np.tile(np.asarray(deck, dtype=np.int16), (n, 1))
+    index = np.arange(n)
+    size = rows.shape[1]
+    for j in range(need):
+        pick = j + np.minimum((u[:, j] * (size - j)).astype(np.int64), size - j - 1)
+        chosen = rows[index, pick]
+        rows[index, pick] = rows[:, j]
+        rows[:, j] = chosen
+    return _assemble(rows[:, :need], hole, board, players)
+
+
+def _assemble(drawn, hole, board, players):
+    n = len(drawn)
+    n_board = 5 - len(board)
+    cards = np.empty((n, players, 7), dtype=np.int16)
+    cards[:, :, 2:2 + len(board)] = board
+    cards[:, :, 2 + len(board):] = drawn[:, None, :n_board]
+    cards[:, 0, :2] = hole
+    cards[:, 1:, :2] = drawn[:, n_board:].reshape(n, players - 1, 2)
+    return cards
+
+
+class Sampler(object):
+    """
+    Plain random dealing of the unknown cards.
+
+    A sampler is called like equity.deal_completions, so it can be
+    passed as the sampler of monte_carlo_equity, adaptive_equity or
+    simulate_chunk. deal also returns a group for each deal; groups
+    are independent and equally distributed, which is what
+    sampled_equity needs to estimate the variance of the mean.
+    """
+    name = 'plain'
+
+    def __call__(self, rng, hole, board, players, iterations):
+        return self.deal(rng, hole, board, players, iterations)[0]
+
+    def deal(self, rng, hole, board, players, iterations):
+        """
+        :return: tuple of ((N, players, 7) card ids, group of each deal)
+        """
+        deck = _deck(hole, board)
+        u = rng.random_sample((iterations, _need(board, players)))
+        return _deal(deck, hole, board, players, u), np.arange(iterations)
+
+
+class AntitheticSampler(Sampler):
+    """
+    Pairs of deals from uniforms u and 1 - u, which take cards
+    from opposite ends of the remaining deck.
+    """
+    name = 'antithetic'
+
+    def deal(self, rng, hole, board, players, iterations):
+        deck = _deck(hole, board)
+        pairs = (iterations + 1) // 2
+        u = rng.random_sample((pairs, _need(board, players)))
+        u = np.stack([u, 1.0 - u], axis=1).reshape(2 * pairs, -1)[:iterations]
+        ## 1 - u can be exactly 1
+        u = np.minimum(u, 1.0 - 1e-12)
+        return _deal(deck, hole, board, players, u), np.arange(iterations) // 2
+
+
+class QuasiRandomSampler(Sampler):
+    """
+    Randomly shifted Halton points, one dimension per dealt card,
+    so the deals cover the remaining deck more evenly than random ones.
+    Each of the replicates has its own shift.
+    """
+    name = 'quasi_random'
+
+    def __init__(self, replicates=8):
+        self.replicates = replicates
+
+    def deal(self, rng, hole, board, players, iterations):
+        deck = _deck(hole, board)
+        need = _need(board, players)
+        per = -(-iterations // self.replicates)
+        points = np.empty((per, need))
+        ## skip the first point, which is 0 in every dimension
+        index = np.arange(1, per + 1)
+        for d in range(need):
+            points[:, d] = _radical_inverse(index, PRIMES[d])
+        u = np.vstack([(points + rng.random_sample(need)) % 1.0 for _ in range(self.replicates)])
+        groups = np.repeat(np.arange(self.replicates), per)
+        return _deal(deck, hole, board, players, u[:iterations]), groups[:iterations]
+
+
+class StratifiedFlopSampler(Sampler):
+    """
+    Preflop sampling stratified over the 1755 suit isomorphism
+    classes of the flop.
+
+    The possible flops are sorted by class and each replicate takes a
+    systematic sample of them, so every class gets its share of the
+    deals and every flop is still equally likely. The turn, river and
+    opponents' cards are dealt at random.
+    """
+    name = 'stratified_flop'
+
+    def __init__(self, replicates=8, flop_table=None):
+        self.replicates = replicates
+        self.flop_table = flop_table
+
+    def _flops(self, hole):
+        from flops import FlopTable, FLOPS
+        if self.flop_table is None:
+            self.flop_table = FlopTable()
+        mask = ~np.isin(FLOPS, hole).any(axis=1)
+        flops = FLOPS[mask]
+        order = np.argsort(self.flop_table.table['class_id'][mask], kind='mergesort')
+        return flops[order]
+
+    def deal(self, rng, hole, board, players, iterations):
+        if board:
+            raise ValueError('StratifiedFlopSampler is for preflop deals. Got a board of "{}"'.format(len(board)))
+        flops = self._flops(hole)
+        per = -(-iterations // self.replicates)
+        step = len(flops) / float(per)
+        picks = []
+        for _ in range(self.replicates):
+            start = rng.random_sample() * step
+            picks.append(np.minimum((start + step * np.arange(per)).astype(np.int64), len(flops) - 1))
+        flop = flops[np.concatenate(picks)[:iterations]]
+
+        n = len(flop)
+        keys = rng.random_sample((n, 52))
+        rows = np.arange(n)[:, None]
+        ## dead cards can never be among the smallest keys
+        keys[:, list(hole)] = 2.0
+        keys[rows, flop] = 2.0
+        rest = np.argsort(keys, axis=1)[:, :_need(board, players) - 3].astype(np.int16)
+        drawn = np.hstack([flop, rest])
+        groups = np.repeat(np.arange(self.replicates), per)[:iterations]
+        return _assemble(drawn, hole, board, players), groups
+
+
+SAMPLERS = dict((i.name, i) for i in (Sampler, AntitheticSampler, QuasiRandomSampler, StratifiedFlopSampler))
+
+
+def _deck(hole, board):
+    known = set(hole) | set(board)
+    return [i for i in range(52) if i not in known]
+
+
+def _need(board, players):
+    return 5 - len(board) + 2 * (players - 1)
+
+
+def _radical_inverse(index, base):
+    """
+    van der Corput radical inverse of each index in base
+    """
+    result = np.zeros(len(index))
+    factor = 1.0 / base
+    index = index.copy()
+    while index.any():
+        index, digit = np.divmod(index, base)
+        result += digit * factor
+        factor /= base
+    return result
+
+
+class SampledResult(EquityResult):
+    """
+    EquityResult of sampled_equity. equity_se is the standard error
+    of the sampler's estimate, worked out from its independent groups,
+    plain_variance is the variance plain sampling would have with the
+    same number of deals and ess is the number of plain random deals
+    that would give the same standard error as the sampler.
+    """
+    def __init__(self, result, sampler, estimator_variance, plain_variance):
+        super(SampledResult, self).__init__(
+            result.wins, result.ties, result.losses, result.equity_sum, result.equity_sq_sum
+        )
+        self.sampler = sampler
+        self.estimator_variance = estimator_variance
+        self.plain_variance = plain_variance
+
+    def __str__(self):
+        return "SampledResult(equity={:.4f} +/- {:.4f}, n={}, sampler={}, ess={:.0f}, gain={:.2f})".format(
+            self.equity, self.equity_se, self.iterations, self.sampler, self.ess, self.ess_gain
+        )
+
+    @property
+    def equity_se(self):
+        return sqrt(self.estimator_variance)
+
+    @property
+    def ess(self):
+        """
+        effective sample size
+        """
+        if not self.estimator_variance:
+            return float(self.iterations)
+        return self.iterations * self.plain_variance / self.estimator_variance
+
+    @property
+    def ess_gain(self):
+        """
+        ess per deal. Above 1 means the sampler beats plain sampling
+        """
+        if not self.iterations:
+            return 0.0
+        return self.ess / self.iterations
+
+
+def sampled_equity(hole_cards, board=None, players=2, iterations=20000, sampler=None, seed=None):
+    """
+    Equity of hole_cards with a variance reducing sampler and its
+    effective sample size
+    :param sampler: Sampler instance or name in SAMPLERS. Plain by default
+    :return: SampledResult
+    """
+    hole, board = _check_cards(hole_cards, board, players)
+    if sampler is None:
+        sampler = Sampler()
+    elif not isinstance(sampler, Sampler):
+        sampler = SAMPLERS[sampler]()
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 32 - 1)
+
+    rng = np.random.RandomState(seed)
+    cards, groups = sampler.deal(rng, hole, board, players, iterations)
+    n = len(cards)
+    strengths = evaluate_batch(cards.reshape(-1, 7))[0].reshape(n, players)
+    shares = showdown_shares(strengths)
+
+    hero, best = strengths[:, 0], strengths[:, 1:].max(axis=1)
+    wins = int((hero > best).sum())
+    ties = int((hero == best).sum())
+    result = EquityResult(wins, ties, n - wins - ties, float(shares.sum()), float((shares * shares).sum()))
+
+    sizes = np.bincount(groups)
+    means = np.bincount(groups, shares) / sizes
+    plain_variance = result.variance / n
+    if len(means) > 1:
+        ## weight groups by size in case the last one is short
+        mean = np.average(means, weights=sizes)
+        group_variance = np.average((means - mean) ** 2, weights=sizes) * len(means) / (len(means) - 1)
+        estimator_variance = group_variance * np.mean(sizes) / n
+    else:
+        estimator_variance = plain_variance
+    return SampledResult(result, sampler.name, estimator_variance, plain_variance)
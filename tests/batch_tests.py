@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+from batch import *
+from evaluator import evaluate, FLUSH, STRAIGHT_FLUSH
+from game import Card, Deck, Hand, Table
+
+
+class EvaluateBatchTests(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(4)
+        self.hands = np.argsort(rng.rand(5000, 52), axis=1)[:, :7]
+
+    def test_matches_evaluate(self):
+        strengths, categories = evaluate_batch(self.hands)
+        for hand, strength, category in zip(self.hands, strengths, categories):
+            self.assertEqual(strength, evaluate(hand.tolist()))
+            self.assertEqual(category, strength >> 20)
+
+    def test_matches_hand_eval(self):
+        strengths, categories = evaluate_batch(self.hands[:200])
+        for hand, strength in zip(self.hands[:200], strengths):
+            self.assertEqual(strength, Hand(hand.tolist()).eval().strength)
+
+    def test_five_and_six_cards(self):
+        for size in (5, 6):
+            strengths, categories = evaluate_batch(self.hands[:, :size])
+            for hand, strength in zip(self.hands[:, :size], strengths):
+                self.assertEqual(strength, evaluate(hand.tolist()))
+
+    def test_flushes(self):
+        hands = [
+            [Card(2, 'S'), Card(3, 'S'), Card(4, 'S'), Card(5, 'S'),
+             Card(6, 'S'), Card(10, 'D'), Card(7, 'S')],
+            [Card('A', 'S'), Card('K', 'S'), Card(3, 'S'), Card(9, 'S'),
+             Card(6, 'S'), Card(2, 'D'), Card(7, 'D')],
+        ]
+        strengths, categories = evaluate_batch(hands)
+        self.assertListEqual(categories.tolist(), [STRAIGHT_FLUSH, FLUSH])
+
+    def test_from_deck(self):
+        decks = [Deck() for i in range(10)]
+        cards = np.array([i.card_ids[:7] for i in decks])
+        strengths, categories = evaluate_batch(cards)
+        self.assertEqual(strengths.shape, (10,))
+
+    def test_deck_rows(self):
+        decks = [Deck() for i in range(3)]
+        for deck in decks:
+            deck.draw_ids(45)
+        strengths, categories = evaluate_batch(decks)
+        self.assertListEqual(strengths.tolist(), [evaluate(i.card_ids) for i in decks])
+        self.assertEqual(as_card_array(decks[0]).tolist(), [decks[0].card_ids])
+        self.assertEqual(evaluate_batch(decks[0])[0].tolist(), [evaluate(decks[0].card_ids)])
+
+    def test_from_table(self):
+        table = Table(6)
+        strengths, categories = evaluate_batch(table)
+        winner, results = table.best_cards()
+        self.assertListEqual(strengths.tolist(), [i.strength for i in results.values()])
+
+    def test_bad_size(self):
+        with self.assertRaises(ValueError):
+            evaluate_batch(self.hands[:, :4])
+
+
+if __name__ == '__main__':
+    unittest.main()
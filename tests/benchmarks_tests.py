@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+from benchmarks import *
+
+
+class PercentileTests(unittest.TestCase):
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 100), 4)
+        self.assertAlmostEqual(percentile([1, 2], 50), 1.5)
+
+
+class RunBenchmarksTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_default_benchmarks_run(self):
+        results = run_benchmarks(default_benchmarks(scale=0.001))
+        names = list(results['results'])
+        self.assertTrue('hand.eval' in names)
+        self.assertTrue('Pair.get_five_best' in names)
+        self.assertTrue('table.best_cards.9' in names)
+        self.assertTrue('dealer.hand.6' in names)
+        for r in results['results'].values():
+            self.assertTrue(r['ops_per_sec'] > 0)
+            self.assertTrue(r['p50'] <= r['p99'])
+
+    def test_allocations(self):
+        kept = []
+        keep = lambda: kept.append([[] for _ in range(10)])
+        allocations = Benchmark('keep', keep, 100, 1).allocations()
+        self.assertGreater(allocations['blocks'], 5)
+        self.assertTrue(allocations['peak_bytes'] is None or allocations['peak_bytes'] >= 0)
+
+    def test_names(self):
+        results = run_benchmarks(default_benchmarks(scale=0.001), names=['deck.'])
+        self.assertListEqual(list(results['results']), ['deck.create', 'deck.create_and_shuffle'])
+
+    def test_save_load_compare(self):
+        results = run_benchmarks([Benchmark('noop', lambda: None, 10, 3)])
+        path = os.path.join(self.dir, 'bench.json')
+        save(results, path)
+        old = load(path)
+        self.assertEqual(compare(old, results), {})
+        old['results']['noop']['ops_per_sec'] = results['results']['noop']['ops_per_sec'] * 2
+        self.assertListEqual(list(compare(old, results)), ['noop'])
+
+
+if __name__ == '__main__':
+    unittest.main()
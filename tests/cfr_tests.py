@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from cfr import *
+from preflop import N_CLASSES, CLASS_NAMES
+
+
+class GameTests(unittest.TestCase):
+    def test_kuhn_tree(self):
+        game = KuhnPoker()
+        self.assertEqual(game.n_infosets, 12)
+        self.assertEqual(game.max_actions, 2)
+        self.assertEqual(len(game.nodes), 9)
+        self.assertIsNone(game.node('pbp').player)
+        self.assertEqual(game.node('pb').player, 0)
+
+    def test_leduc_tree(self):
+        game = LeducPoker()
+        self.assertEqual(game.n_infosets, 288)
+        self.assertEqual(game.node('rc/').player, 0)
+        self.assertEqual(game.node('rr').actions, ('f', 'c'))
+        deals = np.array([[0, 2, 1], [4, 2, 3], [4, 5, 0]])
+        ## a jack pairing the board beats a queen, kings split
+        self.assertListEqual(game.utility(deals, 'rc/rc').tolist(), [7.0, -7.0, 0.0])
+        self.assertListEqual(game.utility(deals[:1], 'rrf').tolist(), [-3.0])
+        self.assertListEqual(game.utility(deals[:1], 'cc/crf').tolist(), [-1.0])
+        deals, probs = game.deals()
+        self.assertEqual(len(deals), 120)
+        self.assertAlmostEqual(probs.sum(), 1.0)
+
+    def test_push_fold_deals(self):
+        game = PushFoldGame(stack=20)
+        self.assertFalse(game.exact)
+        deals, probs = game.deals(np.random.RandomState(1), 500)
+        self.assertEqual(deals.shape, (500, 3))
+        self.assertTrue(set(np.unique(deals[:, 2])) <= set([-1.0, 0.0, 1.0]))
+        self.assertListEqual(game.utility(deals[:2], 'pf').tolist(), [2.0, 2.0])
+        ## both players are dealt from the same distribution
+        deals, probs = game.deals(np.random.RandomState(2), 20000)
+        self.assertAlmostEqual(deals[:, 0].mean(), deals[:, 1].mean(), delta=2)
+        with self.assertRaises(ValueError):
+            PushFoldGame(stack=2)
+
+
+class SolverTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_kuhn(self):
+        for method, iterations in (('cfr', 300), ('cfr+', 300), ('external', 3000)):
+            solver = CFRSolver(KuhnPoker(), method, seed=1).iterate(iterations)
+            self.assertAlmostEqual(solver.value(), -1 / 18.0, delta=0.005)
+            self.assertLess(solver.exploitability(), 0.02)
+        ## facing a bet the second player calls with the king and folds the jack
+        self.assertGreater(solver.strategy('b', 2)['b'], 0.95)
+        self.assertLess(solver.strategy('b', 0)['b'], 0.05)
+
+    def test_outcome_sampling(self):
+        solver = CFRSolver(KuhnPoker(), 'outcome', seed=2)
+        start = solver.exploitability()
+        solver.iterate(3000)
+        self.assertLess(solver.exploitability(), start / 5)
+
+    def test_leduc(self):
+        solver = CFRSolver(LeducPoker(), 'cfr+', seed=1).iterate(150)
+        ## the game value is about -0.0856
+        self.assertAlmostEqual(solver.value(), -0.0856, delta=0.005)
+        self.assertLess(solver.exploitability(), 0.01)
+
+    def test_push_fold(self):
+        solver = CFRSolver(PushFoldGame(stack=20, batch=4000), 'cfr+', seed=1).iterate(40)
+        self.assertGreater(solver.strategy('', CLASS_NAMES['AA'])['p'], 0.95)
+        self.assertGreater(solver.strategy('p', CLASS_NAMES['AA'])['c'], 0.95)
+        self.assertLess(solver.strategy('', CLASS_NAMES['72o'])['p'], 0.1)
+
+    def test_push_fold_with_equity_table(self):
+        ## with a coin flip for every all in both players always go all in
+        path = os.path.join(self.tmp, 'preflop.npy')
+        np.save(path, np.full((N_CLASSES, N_CLASSES), 0.5, dtype=np.float32))
+        game = PushFoldGame(stack=20, equity=path)
+        deals, probs = game.deals()
+        self.assertAlmostEqual(probs.sum(), 1.0)
+        aces = (deals[:, 0] == CLASS_NAMES['AA']) & (deals[:, 1] == CLASS_NAMES['AA'])
+        self.assertAlmostEqual(probs[aces][0], 6.0 / (1326 * 1225))
+        solver = CFRSolver(game, 'cfr').iterate(20)
+        self.assertGreater(solver.average_strategy()[game.legal][1::2].min(), 0.9)
+        self.assertAlmostEqual(solver.value(), 0.0, delta=0.05)
+
+    def test_checkpoint(self):
+        path = os.path.join(self.tmp, 'kuhn.npz')
+        for method in ('external', 'cfr+'):
+            whole = CFRSolver(KuhnPoker(), method, seed=5).iterate(50).iterate(50)
+            CFRSolver(KuhnPoker(), method, seed=5).iterate(50).save(path)
+            resumed = CFRSolver.load(path)
+            self.assertEqual((resumed.iteration, resumed.method), (50, method))
+            resumed.iterate(50)
+            self.assertTrue(np.array_equal(whole.regrets, resumed.regrets))
+            self.assertTrue(np.array_equal(whole.strategy_sum, resumed.strategy_sum))
+        with self.assertRaises(ValueError):
+            CFRSolver.load(path, LeducPoker())
+
+    def test_solve_resumes(self):
+        path = os.path.join(self.tmp, 'leduc.npz')
+        solve(LeducPoker(), 20, checkpoint=path, checkpoint_every=10)
+        solver = solve(LeducPoker(), 30, checkpoint=path, checkpoint_every=10)
+        self.assertEqual(solver.iteration, 30)
+        whole = solve(LeducPoker(), 30)
+        self.assertTrue(np.allclose(whole.strategy_sum, solver.strategy_sum))
+
+    def test_bad_method(self):
+        with self.assertRaises(ValueError):
+            CFRSolver(KuhnPoker(), 'dcfr')
+
+
+if __name__ == '__main__':
+    unittest.main()
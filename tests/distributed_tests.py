@@ -0,0 +1,77 @@
+import socket
+import time
+import unittest
+from distributed import *
+from game import Card
+
+EQUITY = {'type': 'equity', 'hole': [Card('A', 'S').id, Card('K', 'S').id], 'players': 3,
+          'iterations': 200, 'seed': 11}
+TABLE = {'type': 'table', 'players': 4, 'hands': 100, 'seed': 12}
+
+
+class ProtocolTests(unittest.TestCase):
+    def test_round_trip(self):
+        a, b = socket.socketpair()
+        try:
+            send_message(a, {'type': 'work', 'unit': 3})
+            self.assertEqual(recv_message(b), {'type': 'work', 'unit': 3})
+            a.close()
+            self.assertIsNone(recv_message(b))
+        finally:
+            b.close()
+
+    def test_merge(self):
+        self.assertEqual(merge({'a': 1, 'b': [1, 2]}, {'a': 2, 'b': [3, 4], 'c': 1.5}),
+                         {'a': 3, 'b': [4, 6], 'c': 1.5})
+
+
+class DistributedTests(unittest.TestCase):
+    def test_matches_local(self):
+        local = run_local(EQUITY, 12, unit_size=3)
+        for workers in (1, 3):
+            self.assertEqual(run_distributed(EQUITY, 12, workers=workers, unit_size=3, timeout=60), local)
+        self.assertEqual(to_equity_result(local).iterations, 12 * 200)
+
+    def test_table_scenario(self):
+        result = run_distributed(TABLE, 5, workers=2, unit_size=2, timeout=60)
+        self.assertEqual(result, run_local(TABLE, 5, unit_size=2))
+        self.assertEqual(result['hands'], 500)
+        self.assertEqual(sum(result['categories']), 500 * 4)
+        self.assertTrue(sum(result['wins']) >= 500)
+
+    def test_dropped_worker_is_requeued(self):
+        with Coordinator(TABLE, 4, unit_size=1) as coordinator:
+            ## take a unit and disconnect without answering
+            sock = socket.create_connection(coordinator.address)
+            send_message(sock, {'type': 'request'})
+            work = recv_message(sock)
+            self.assertEqual(work['type'], 'work')
+            sock.close()
+            self.assertEqual(run_worker(*coordinator.address), 4)
+            result = coordinator.wait(30)
+            self.assertEqual(coordinator.requeued, 1)
+        self.assertEqual(result, run_local(TABLE, 4, unit_size=1))
+
+    def test_late_result_is_not_counted_twice(self):
+        with Coordinator(TABLE, 2, unit_size=1, lease_timeout=0.2) as coordinator:
+            slow = socket.create_connection(coordinator.address)
+            send_message(slow, {'type': 'request'})
+            work = recv_message(slow)
+            time.sleep(0.3)
+            ## the lease has expired so another worker redoes the unit
+            self.assertEqual(run_worker(*coordinator.address), 2)
+            send_message(slow, {'type': 'result', 'unit': work['unit'],
+                                'result': run_unit(work['scenario'], work['start'], work['stop'])})
+            self.assertEqual(recv_message(slow)['type'], 'stop')
+            slow.close()
+            result = coordinator.wait(30)
+            self.assertEqual(coordinator.duplicates, 1)
+        self.assertEqual(result, run_local(TABLE, 2, unit_size=1))
+
+    def test_unknown_scenario(self):
+        with self.assertRaises(ValueError):
+            Coordinator({'type': 'nope'}, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
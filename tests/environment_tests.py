@@ -0,0 +1,113 @@
+import unittest
+import numpy as np
+from environment import *
+from game import Dealer, FOLD, CHECK, CALL, RAISE
+
+
+def random_actions(rng, mask):
+    return np.array([rng.choice(np.flatnonzero(row)) if row.any() else 0 for row in mask])
+
+
+class VectorEnvTests(unittest.TestCase):
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            VectorEnv(4, players=1)
+        env = VectorEnv(4, seed=1)
+        env.reset()
+        with self.assertRaises(ValueError):
+            env.step([0, 0])
+        ## not an action
+        with self.assertRaises(ValueError):
+            env.step([FOLD_ACTION] * 3 + [N_ACTIONS])
+
+    def test_heads_up_start(self):
+        env = VectorEnv(3, players=2, seed=1)
+        obs = env.reset()
+        self.assertListEqual(env.button.tolist(), [0, 0, 0])
+        self.assertListEqual(obs['seat'].tolist(), [0, 0, 0])
+        self.assertListEqual(obs['mask'][0].tolist(), [True, True, True, True, True])
+        self.assertListEqual(obs['to_call'].tolist(), [1, 1, 1])
+        self.assertListEqual(obs['pot'].tolist(), [3, 3, 3])
+        self.assertListEqual(obs['stacks'][0].tolist(), [199, 198])
+        self.assertListEqual(obs['board'][0].tolist(), [HIDDEN] * 5)
+        ## a pot raise is to 2 + 4 and half pot is less than a full raise
+        self.assertListEqual(env.amounts()[0].tolist(), [1, 2, 4, 6, 200])
+
+    def test_fold_and_reset(self):
+        env = VectorEnv(2, players=2, seed=1)
+        env.reset()
+        obs, rewards, done = env.step([FOLD_ACTION, CALL_ACTION])
+        self.assertListEqual(done.tolist(), [True, False])
+        self.assertListEqual(rewards.tolist(), [[-1, 1], [0, 0]])
+        ## the first table has a new hand with the button moved on
+        self.assertListEqual(env.button.tolist(), [1, 0])
+        self.assertListEqual(obs['seat'].tolist(), [1, 1])
+        self.assertEqual(env.hands, 3)
+        ## the big blind checks and the flop comes
+        obs, rewards, done = env.step([CALL_ACTION, CALL_ACTION])
+        self.assertEqual(obs['street'][1], 1)
+        self.assertListEqual(obs['board'][1].tolist(), env.runout[1, :3].tolist() + [HIDDEN] * 2)
+
+    def test_observation_starts_with_seat_to_act(self):
+        env = VectorEnv(8, players=4, seed=3)
+        obs = env.reset()
+        seat = obs['seat']
+        rows = np.arange(8)
+        self.assertTrue((obs['hole'] == env.hole[rows, seat]).all())
+        self.assertTrue((obs['bets'][:, 0] == env.bets[rows, seat]).all())
+        self.assertTrue((obs['stacks'][:, 1] == env.stacks[rows, (seat + 1) % 4]).all())
+
+    def test_deal_is_fair(self):
+        env = VectorEnv(20000, players=6, seed=4)
+        env.reset()
+        ## every seat and board card averages the middle card id
+        means = np.hstack([env.hole.mean(axis=(0, 2)), env.runout.mean(axis=0)])
+        self.assertLess(np.abs(means - 25.5).max(), 0.5)
+
+    def test_chips_are_kept(self):
+        rng = np.random.RandomState(5)
+        env = VectorEnv(256, players=6, stacks=50, seed=2)
+        obs = env.reset()
+        finished = 0
+        for _ in range(200):
+            obs, rewards, done = env.step(random_actions(rng, obs['mask']))
+            self.assertTrue((rewards.sum(axis=1) == 0).all())
+            self.assertTrue(((rewards != 0).any(axis=1) <= done).all())
+            self.assertTrue((env.stacks + env.contributed == 50).all())
+            finished += done.sum()
+        self.assertGreater(finished, 256)
+
+    def test_same_as_dealer(self):
+        """
+        Play the env's hands again with Dealers and the same cards
+        """
+        for players, stacks in ((2, 40), (3, 30), (6, 25)):
+            tables = 64
+            rng = np.random.RandomState(players)
+            env = VectorEnv(tables, players=players, stacks=stacks, seed=players, auto_reset=False)
+            dealers = [Dealer(players, stacks=stacks) for _ in range(tables)]
+            for _ in range(3):
+                obs = env.reset()
+                for t, dealer in enumerate(dealers):
+                    dealer.stacks = [stacks] * players
+                    dealer.button = (env.button[t] - 1) % players
+                    dealer.new_hand()
+                    dealer.state.hole = tuple(tuple(i) for i in env.hole[t].tolist())
+                    dealer.state.runout = tuple(env.runout[t].tolist())
+                while not env.done.all():
+                    actions = random_actions(rng, obs['mask'])
+                    kinds, amounts = env.dealer_actions(actions)
+                    for t in np.flatnonzero(~env.done):
+                        legal = dict((k, (lo, hi)) for k, lo, hi in dealers[t].legal_actions())
+                        self.assertEqual(dealers[t].state.to_act, env.to_act[t])
+                        self.assertEqual(set(legal) - set([CHECK, CALL, FOLD]) != set(),
+                                         bool(obs['mask'][t, HALF_POT_ACTION]))
+                        dealers[t].act(int(kinds[t]), int(amounts[t]))
+                    obs, rewards, done = env.step(actions)
+                    for t in np.flatnonzero(done):
+                        self.assertTrue(dealers[t].state.finished)
+                        self.assertListEqual(rewards[t].tolist(), dealers[t].state.payoffs)
+
+
+if __name__ == '__main__':
+    unittest.main()
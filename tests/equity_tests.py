@@ -0,0 +1,168 @@
+import unittest
+from itertools import combinations
+from equity import *
+from evaluator import evaluate
+from game import Card
+
+
+class EquityResultTests(unittest.TestCase):
+    def test_add(self):
+        r = EquityResult(1, 2, 3, 2.0, 1.5) + EquityResult(1, 0, 0, 1.0, 1.0)
+        self.assertEqual(r.iterations, 7)
+        self.assertEqual(r.wins, 2)
+        self.assertAlmostEqual(r.equity, 3.0 / 7)
+
+    def test_exact(self):
+        r = EquityResult(3, 1, 4, 3.5, 3.25, exact=True)
+        self.assertEqual(r.equity_se, 0.0)
+        self.assertTrue((r + EquityResult(1, 0, 0, 1.0, 1.0, exact=True)).exact)
+        self.assertFalse((r + EquityResult(1, 0, 0, 1.0, 1.0)).exact)
+        self.assertGreater(EquityResult(3, 1, 4, 3.5, 3.25).equity_se, 0.0)
+
+    def test_sum(self):
+        r = sum([EquityResult(1, 0, 0, 1.0, 1.0), EquityResult(0, 0, 1)])
+        self.assertEqual(r.win, 0.5)
+
+
+class MonteCarloEquityTests(unittest.TestCase):
+    def test_aces_heads_up(self):
+        r = monte_carlo_equity([Card('A', 'S'), Card('A', 'H')], iterations=20000, seed=1)
+        self.assertAlmostEqual(r.equity, 0.852, delta=5 * r.equity_se + 0.005)
+        self.assertAlmostEqual(r.win + r.tie + r.loss, 1.0)
+        self.assertTrue(r.equity_se < 0.005)
+
+    def test_complete_board(self):
+        board = [Card('A', 'D'), Card('A', 'C'), Card('K', 'D'), Card('K', 'C'), Card(2, 'H')]
+        r = monte_carlo_equity([Card('A', 'S'), Card('A', 'H')], board=board, iterations=1000, seed=1)
+        self.assertEqual(r.win, 1.0)
+
+    def test_seed_is_reproducible_across_workers(self):
+        hole = [Card(7, 'S'), Card(8, 'S')]
+        r1 = monte_carlo_equity(hole, players=4, iterations=4000, seed=3, workers=1, chunk_size=1000)
+        r2 = monte_carlo_equity(hole, players=4, iterations=4000, seed=3, workers=2, chunk_size=1000)
+        self.assertEqual(r1.wins, r2.wins)
+        self.assertEqual(r1.ties, r2.ties)
+        self.assertAlmostEqual(r1.equity, r2.equity)
+
+    def test_duplicate_cards(self):
+        with self.assertRaises(ValueError):
+            monte_carlo_equity([Card('A', 'S'), Card('A', 'S')])
+
+    def test_too_many_players(self):
+        with self.assertRaises(ValueError):
+            monte_carlo_equity([Card('A', 'S'), Card('A', 'H')], players=24)
+
+    def test_bad_sizes(self):
+        with self.assertRaises(ValueError):
+            monte_carlo_equity([Card('A', 'S'), Card('A', 'H')], iterations=0)
+        with self.assertRaises(ValueError):
+            monte_carlo_equity([Card('A', 'S'), Card('A', 'H')], chunk_size=0)
+
+
+class AdaptiveEquityTests(unittest.TestCase):
+    def test_z_score(self):
+        self.assertAlmostEqual(z_score(0.95), 1.95996, places=4)
+        with self.assertRaises(ValueError):
+            z_score(1.0)
+
+    def test_stops_at_precision(self):
+        hole = [Card('A', 'S'), Card('A', 'H')]
+        r = adaptive_equity(hole, precision=0.01, seed=1, batch_size=1000)
+        self.assertEqual(r.reason, 'precision')
+        self.assertTrue(r.precision <= 0.01)
+        self.assertEqual(r.iterations % 1000, 0)
+        ## the batch before was not precise enough
+        self.assertTrue(r.iterations < 20000)
+        fixed = monte_carlo_equity(hole, iterations=r.iterations, seed=1, chunk_size=1000)
+        self.assertAlmostEqual(r.equity, fixed.equity)
+
+    def test_close_spots_need_more_samples(self):
+        clear = adaptive_equity([Card('A', 'S'), Card('A', 'H')], board=[Card('A', 'D'), Card('A', 'C'), Card(2, 'D')],
+                                precision=0.005, seed=2, batch_size=1000)
+        close = adaptive_equity([Card(7, 'S'), Card(8, 'S')], precision=0.005, seed=2, batch_size=1000)
+        self.assertTrue(clear.iterations < close.iterations)
+
+    def test_budgets(self):
+        hole = [Card(7, 'S'), Card(8, 'S')]
+        r = adaptive_equity(hole, precision=1e-6, max_iterations=2500, seed=3, batch_size=1000)
+        self.assertEqual((r.reason, r.iterations), ('iterations', 2500))
+        r = adaptive_equity(hole, precision=1e-6, max_time=0.0, seed=3, batch_size=1000)
+        self.assertEqual((r.reason, r.iterations), ('time', 1000))
+
+    def test_bad_sizes(self):
+        hole = [Card(7, 'S'), Card(8, 'S')]
+        with self.assertRaises(ValueError):
+            adaptive_equity(hole, batch_size=0)
+        with self.assertRaises(ValueError):
+            adaptive_equity(hole, max_iterations=0)
+
+    def test_workers(self):
+        hole = [Card(7, 'S'), Card(8, 'S')]
+        r1 = adaptive_equity(hole, players=3, precision=0.01, seed=4, batch_size=500)
+        r2 = adaptive_equity(hole, players=3, precision=0.01, seed=4, batch_size=500, workers=2)
+        self.assertEqual((r1.iterations, r1.wins), (r2.iterations, r2.wins))
+
+
+class ExactEquityTests(unittest.TestCase):
+    def brute_force(self, hole, board, opponent):
+        deck = [i for i in range(52) if i not in hole + board + opponent]
+        wins = ties = n = 0
+        for runout in combinations(deck, 5 - len(board)):
+            a = evaluate(hole + board + list(runout))
+            b = evaluate(opponent + board + list(runout))
+            wins += a > b
+            ties += a == b
+            n += 1
+        return wins, ties, n
+
+    def test_combinations_array(self):
+        self.assertListEqual(
+            combinations_array(8, 3).tolist(),
+            [list(i) for i in combinations(range(8), 3)]
+        )
+
+    def test_suit_symmetries(self):
+        ## As Ah can swap spades with hearts and diamonds with clubs
+        aces = [Card('A', 'S').id, Card('A', 'H').id]
+        self.assertEqual(len(suit_symmetries(aces)), 4)
+        self.assertEqual(len(suit_symmetries(aces, [Card(2, 'D').id])), 2)
+
+    def test_flop_matches_brute_force(self):
+        hole = [Card('A', 'S').id, Card('A', 'H').id]
+        opponent = [Card(9, 'C').id, Card(8, 'C').id]
+        board = [Card(7, 'C').id, Card(2, 'D').id, Card('K', 'S').id]
+        r = exact_equity(hole, board, opponent)
+        wins, ties, n = self.brute_force(hole, board, opponent)
+        self.assertEqual((r.wins, r.ties, r.iterations), (wins, ties, n))
+        self.assertTrue(r.exact)
+        self.assertEqual((r.equity_se, r.win_se), (0.0, 0.0))
+
+    def test_symmetric_flop_matches_brute_force(self):
+        ## only the hero's spades are fixed so the other suits collapse
+        hole = [Card('A', 'S').id, Card('K', 'S').id]
+        opponent = [Card(5, 'S').id, Card(5, 'H').id]
+        board = [Card(7, 'S').id, Card(2, 'S').id, Card(5, 'D').id]
+        r = exact_equity(hole, board, opponent)
+        wins, ties, n = self.brute_force(hole, board, opponent)
+        self.assertEqual((r.wins, r.ties, r.iterations), (wins, ties, n))
+
+    def test_random_opponent_on_turn(self):
+        hole = [Card('A', 'S'), Card('A', 'H')]
+        board = [Card(7, 'C'), Card(2, 'D'), Card('K', 'S'), Card(9, 'H')]
+        r = exact_equity(hole, board)
+        self.assertEqual(r.iterations, 46 * 45 * 44 // 2)
+        mc = monte_carlo_equity(hole, board, iterations=20000, seed=2)
+        self.assertAlmostEqual(r.equity, mc.equity, delta=5 * mc.equity_se)
+
+    def test_preflop(self):
+        r = exact_equity([Card('A', 'S'), Card('A', 'H')], opponent=[Card('K', 'S'), Card('K', 'H')])
+        self.assertEqual(r.iterations, 1712304)
+        self.assertAlmostEqual(r.equity, 0.826, places=3)
+
+    def test_preflop_random_opponent(self):
+        with self.assertRaises(ValueError):
+            exact_equity([Card('A', 'S'), Card('A', 'H')])
+
+
+if __name__ == '__main__':
+    unittest.main()
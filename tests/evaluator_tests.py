@@ -0,0 +1,199 @@
+import unittest
+import random
+from itertools import combinations
+from evaluator import *
+from game import Card, Hand, Table, HAND_TYPES
+
+
+def ids(cards):
+    return [i.id for i in cards]
+
+
+class EvaluateTests(unittest.TestCase):
+    def test_high_card(self):
+        s = evaluate(ids([Card('A', 'D'), Card('K', 'S'), Card(3, 'H'), Card(9, 'H'),
+                          Card(6, 'D'), Card(2, 'D'), Card(7, 'D')]))
+        self.assertEqual(category(s), HIGH_CARD)
+        self.assertEqual(kickers(s), [12, 11, 7, 5, 4])
+
+    def test_two_trips_is_full_house(self):
+        s = evaluate(ids([Card(9, 'D'), Card(9, 'S'), Card(9, 'H'), Card(4, 'H'),
+                          Card(4, 'D'), Card(4, 'C'), Card(2, 'D')]))
+        self.assertEqual(category(s), FULL_HOUSE)
+        self.assertEqual(kickers(s)[:2], [7, 2])
+
+    def test_wheel(self):
+        s = evaluate(ids([Card('A', 'D'), Card(2, 'S'), Card(3, 'H'), Card(4, 'H'),
+                          Card(5, 'D'), Card('J', 'D'), Card('K', 'C')]))
+        self.assertEqual(category(s), STRAIGHT)
+        self.assertEqual(kickers(s)[0], 3)
+
+    def test_wheel_smaller_than_six_high_straight(self):
+        wheel = evaluate(ids([Card('A', 'D'), Card(2, 'S'), Card(3, 'H'), Card(4, 'H'),
+                              Card(5, 'D'), Card('J', 'D'), Card('K', 'C')]))
+        six = evaluate(ids([Card(6, 'D'), Card(2, 'S'), Card(3, 'H'), Card(4, 'H'),
+                            Card(5, 'D'), Card('J', 'D'), Card('K', 'C')]))
+        self.assertTrue(wheel < six)
+
+    def test_royal_flush(self):
+        s = evaluate(ids([Card('A', 'D'), Card('K', 'D'), Card('Q', 'D'), Card('J', 'D'),
+                          Card(10, 'D'), Card(2, 'S'), Card(7, 'S')]))
+        self.assertEqual(category(s), ROYAL_FLUSH)
+
+    def test_flush_uses_five_highest(self):
+        a = evaluate(ids([Card('A', 'S'), Card('K', 'S'), Card(3, 'S'), Card(9, 'S'),
+                          Card(6, 'S'), Card(2, 'S'), Card(7, 'D')]))
+        self.assertEqual(kickers(a), [12, 11, 7, 4, 1])
+
+    def test_five_and_six_cards(self):
+        five = [Card(4, 'D'), Card(4, 'S'), Card('J', 'H'), Card(9, 'H'), Card('Q', 'D')]
+        self.assertEqual(category(evaluate(ids(five))), PAIR)
+        six = five + [Card('Q', 'H')]
+        self.assertEqual(category(evaluate(ids(six))), TWO_PAIR)
+
+    def test_seven_is_best_five(self):
+        rand = random.Random(1)
+        for _ in range(2000):
+            hand = rand.sample(range(52), 7)
+            self.assertEqual(
+                evaluate(hand),
+                max(evaluate(i) for i in combinations(hand, 5))
+            )
+
+    def test_hand_strength_needs_a_straight(self):
+        self.assertEqual(hand_strength(STRAIGHT, [12, 3, 2, 1, 0]), evaluate([48, 12, 8, 4, 1]))
+        with self.assertRaises(ValueError):
+            hand_strength(STRAIGHT, [7, 6, 6, 5, 4])
+
+    def test_rank_table_build(self):
+        table = RankTable().build(sizes=(5,))
+        self.assertEqual(len(table), 6175)
+
+
+class FiveBestTests(unittest.TestCase):
+    def test_five_best_makes_strength(self):
+        rand = random.Random(2)
+        for _ in range(2000):
+            hand = rand.sample(range(52), 7)
+            best = five_best(hand)
+            self.assertEqual(len(set(best)), 5)
+            self.assertTrue(set(best).issubset(hand))
+            self.assertEqual(evaluate(best), evaluate(hand))
+
+    def test_pair_first(self):
+        hand = ids([Card('A', 'D'), Card('A', 'S'), Card(3, 'H'), Card(9, 'H'),
+                    Card(6, 'D'), Card(2, 'D'), Card(7, 'D')])
+        best = five_best(hand)
+        self.assertEqual([i >> 2 for i in best], [12, 12, 7, 5, 4])
+
+
+class HandEvalTests(unittest.TestCase):
+    def test_eval_matches_evaluate(self):
+        rand = random.Random(3)
+        for _ in range(500):
+            hand = rand.sample(range(52), 7)
+            best = Hand(hand).eval()
+            strength = evaluate(hand)
+            self.assertTrue(isinstance(best, HAND_TYPES[category(strength)]))
+            self.assertEqual(best.strength, strength)
+            self.assertEqual(evaluate(ids(best.five_best)), strength)
+
+    def test_subclasses_match_evaluate(self):
+        rand = random.Random(4)
+        for _ in range(1000):
+            hand = rand.sample(range(52), 7)
+            strength = evaluate(hand)
+            for hand_type in HAND_TYPES:
+                h = hand_type(hand)
+                if h.isa and h.internal_rank == category(strength):
+                    self.assertEqual(h.strength, strength)
+
+
+class EvalCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.hand = ids([Card('A', 'D'), Card('A', 'S'), Card(3, 'H'), Card(9, 'H'),
+                         Card(6, 'D'), Card(2, 'D'), Card(7, 'D')])
+
+    def tearDown(self):
+        Hand.cache = None
+
+    def test_card_mask(self):
+        self.assertEqual(bin(card_mask(self.hand)).count('1'), 7)
+        swapped = [i ^ 1 for i in self.hand]
+        self.assertNotEqual(card_mask(self.hand), card_mask(swapped))
+        self.assertEqual(card_mask(self.hand, True), card_mask(swapped, True))
+
+    def test_hits_and_misses(self):
+        cache = EvalCache()
+        self.assertEqual(cache.evaluate(self.hand), evaluate(self.hand))
+        self.assertEqual(cache.evaluate(list(reversed(self.hand))), evaluate(self.hand))
+        self.assertEqual(cache.evaluate([i ^ 1 for i in self.hand]), evaluate(self.hand))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache = EvalCache(normalise_suits=True)
+        cache.evaluate(self.hand)
+        self.assertEqual(cache.evaluate([i ^ 1 for i in self.hand]), evaluate(self.hand))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_eviction(self):
+        cache = EvalCache(maxsize=10, normalise_suits=False)
+        rand = random.Random(5)
+        hands = [rand.sample(range(52), 7) for i in range(20)]
+        for hand in hands:
+            self.assertEqual(cache.evaluate(hand), evaluate(hand))
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.evictions, 10)
+        ## the most recent hands are still cached, the oldest are not
+        cache.evaluate(hands[-1])
+        cache.evaluate(hands[0])
+        self.assertEqual((cache.hits, cache.misses), (1, 21))
+
+    def test_hand_eval_uses_cache(self):
+        Hand.cache = EvalCache()
+        first = Hand(self.hand).eval()
+        second = Hand(self.hand).eval()
+        self.assertEqual(first, second)
+        self.assertEqual(Hand.cache.stats()['hits'], 1)
+
+    def test_best_cards_uses_cache(self):
+        Hand.cache = EvalCache()
+        Table(6).best_cards()
+        self.assertEqual(Hand.cache.misses + Hand.cache.hits, 6)
+
+
+class EvalStateTests(unittest.TestCase):
+    def test_streets_match_evaluate(self):
+        rand = random.Random(3)
+        for _ in range(300):
+            cards = rand.sample(range(52), 7)
+            state = EvalState(cards[:5])
+            self.assertEqual(state.strength, evaluate(cards[:5]))
+            state.add(cards[5])
+            self.assertEqual(state.strength, evaluate(cards[:6]))
+            state.add(cards[6])
+            self.assertEqual(state.strength, evaluate(cards))
+
+    def test_remove(self):
+        rand = random.Random(4)
+        for _ in range(100):
+            cards = rand.sample(range(52), 7)
+            state = EvalState(cards)
+            state.remove(cards[2])
+            fresh = EvalState(cards[:2] + cards[3:])
+            self.assertEqual(state.strength, evaluate(cards[:2] + cards[3:]))
+            self.assertEqual((state.key, state.suits, state.suit_masks, state.rank_mask),
+                             (fresh.key, fresh.suits, fresh.suit_masks, fresh.rank_mask))
+
+    def test_copy(self):
+        state = EvalState(ids([Card('A', 'D'), Card('K', 'D'), Card(3, 'D'), Card(9, 'D')]))
+        flush = state.copy().add(Card(7, 'D').id)
+        self.assertEqual(category(flush.strength), FLUSH)
+        self.assertEqual(len(state), 4)
+        self.assertEqual(state.suit_count(1), 4)
+
+    def test_too_few_cards(self):
+        with self.assertRaises(ValueError):
+            EvalState([0, 1, 2, 3]).strength
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from flops import *
+from game import Card, Table
+
+
+class FlopIndexTests(unittest.TestCase):
+    def test_index_is_a_bijection(self):
+        indices = [flop_index(i) for i in FLOPS.tolist()]
+        self.assertListEqual(indices, list(range(N_FLOPS)))
+
+    def test_order_doesnt_matter(self):
+        self.assertEqual(flop_index([7, 30, 2]), flop_index([30, 2, 7]))
+        self.assertEqual(flop_index([Card('A', 'S'), Card(2, 'C'), Card(7, 'D')]),
+                         flop_index([Card(7, 'D').id, Card('A', 'S').id, Card(2, 'C').id]))
+
+
+class FlopTableTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.table = FlopTable()
+
+    def test_classes(self):
+        sizes = self.table.class_sizes()
+        self.assertEqual(len(sizes), N_CLASSES)
+        self.assertEqual(sizes.sum(), N_FLOPS)
+        ## a suit relabelling keeps the class
+        a = [Card('A', 'S'), Card('K', 'S'), Card(2, 'D')]
+        b = [Card('A', 'H'), Card('K', 'H'), Card(2, 'C')]
+        c = [Card('A', 'H'), Card('K', 'C'), Card(2, 'H')]
+        self.assertEqual(self.table.class_id(a), self.table.class_id(b))
+        self.assertNotEqual(self.table.class_id(a), self.table.class_id(c))
+
+    def test_textures(self):
+        self.assertListEqual(self.table.texture([Card(9, 'H'), Card(8, 'H'), Card(7, 'H')]),
+                             ['monotone', 'straight_possible', 'connected'])
+        self.assertListEqual(self.table.texture([Card('K', 'H'), Card('K', 'D'), Card(2, 'C')]),
+                             ['rainbow', 'paired'])
+        self.assertListEqual(self.table.texture([Card(7, 'H'), Card(7, 'D'), Card(7, 'C')]),
+                             ['rainbow', 'trips'])
+        self.assertIn('connected', self.table.texture([Card('A', 'H'), Card(2, 'D'), Card(4, 'C')]))
+
+    def test_features(self):
+        flop = self.table[[Card('Q', 'H'), Card(4, 'D'), Card(9, 'H')]]
+        self.assertEqual((flop['high'], flop['middle'], flop['low'], flop['suits']), (10, 7, 2, 2))
+        self.assertEqual(flop['straights'], 0)
+        ## JT, T6 and 65
+        self.assertEqual(self.table[[Card(9, 'H'), Card(8, 'D'), Card(7, 'C')]]['straights'], 3)
+
+    def test_class_ids_vectorised(self):
+        flops = np.array([[i.id for i in Table(2).flop] for _ in range(20)])
+        expected = [self.table.class_id(i) for i in flops]
+        self.assertListEqual(self.table.class_ids(flops).tolist(), expected)
+
+    def test_class_flop(self):
+        for class_id in (0, 100, N_CLASSES - 1):
+            self.assertEqual(self.table.class_id(self.table.class_flop(class_id)), class_id)
+
+    def test_persisted(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'flops.npy')
+            self.assertEqual(FlopTable(path).class_id([0, 1, 2]), self.table.class_id([0, 1, 2]))
+            loaded = FlopTable(path)
+            self.assertTrue(isinstance(loaded.table, np.memmap))
+            np.testing.assert_array_equal(loaded.table, self.table.table)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
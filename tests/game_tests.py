@@ -1,4 +1,5 @@
 import os, glob
+import random
 import unittest
 from game import *
 from inspect import getmembers
@@ -203,6 +204,24 @@ class CardTests(unittest.TestCase):
         self.assertTrue(c1 > c2)
         self.assertTrue(c2 < c1)
 
+    def test_card_id_round_trip(self):
+        for i in range(52):
+            c = Card.from_id(i)
+            self.assertEqual(Card(c.rank, c.suit).id, i)
+
+    def test_card_id_bit_fields(self):
+        c = Card('Q', 'H')
+        self.assertEqual(c.id >> 2, c.internal_rank)
+        self.assertEqual(SUITS[c.id & 3], 'H')
+
+    def test_card_ids_unique(self):
+        self.assertEqual(len(set(CARDS)), 52)
+
+    def test_to_card_and_to_id(self):
+        c = Card(7, 'C')
+        self.assertEqual(to_card(to_id(c)), c)
+        self.assertEqual(to_id(7), 7)
+
 
 class DeckTests(unittest.TestCase):
     def setUp(self):
@@ -232,6 +251,48 @@ class DeckTests(unittest.TestCase):
         card = self.D.get(5, 'D')
         self.assertEqual(len(self.D), 51)
 
+    def test_cards(self):
+        self.assertTrue(all(isinstance(i, Card) for i in self.D.cards))
+        self.assertTrue(all(isinstance(i, Card) for i in self.D.shuffle()))
+        self.assertListEqual([i.id for i in self.D.cards], self.D.card_ids)
+
+    def test_pop_returns_card(self):
+        self.assertTrue(isinstance(self.D.pop(), Card))
+        self.assertEqual(len(self.D), 51)
+
+    def test_draw_unique(self):
+        ids = self.D.draw_ids(52)
+        self.assertEqual(sorted(ids), list(range(52)))
+        self.assertEqual(len(self.D), 0)
+
+    def test_remove(self):
+        card = Card('Q', 'H')
+        self.assertTrue(self.D.remove_id(card.id))
+        self.assertFalse(card in self.D)
+        self.assertFalse(self.D.remove_id(card.id))
+        self.assertEqual(len(self.D), 51)
+        self.assertTrue(card.id not in self.D.draw_ids(51))
+
+    def test_get_missing_card(self):
+        self.D.get(5, 'S')
+        self.assertEqual(self.D.get(5, 'S'), None)
+
+    def test_reset(self):
+        ids = self.D.ids
+        self.D.draw_ids(20)
+        self.D.remove_id(Card(2, 'C').id)
+        self.D.reset()
+        self.assertEqual(len(self.D), 52)
+        self.assertIs(self.D.ids, ids)
+        self.assertEqual(sorted(self.D.card_ids), list(range(52)))
+        for i in range(52):
+            self.assertEqual(self.D.ids[self.D.positions[i]], i)
+
+    def test_seeded(self):
+        D1 = Deck(random.Random(1), shuffle=False)
+        D2 = Deck(random.Random(1), shuffle=False)
+        self.assertEqual(D1.draw_ids(9), D2.draw_ids(9))
+
 
 class TableTests(unittest.TestCase):
     def setUp(self):
@@ -245,6 +306,40 @@ class TableTests(unittest.TestCase):
         T = Table(4)
         self.assertEqual(len(T), 4)
 
+    def test_cards_unique(self):
+        T = Table(9)
+        cards = sum(T.hole_cards.values(), []) + T.flop + [T.turn, T.river]
+        self.assertEqual(len(set(cards)), 9 * 2 + 5)
+
+    def test_cards_not_redealt(self):
+        self.assertEqual(self.T.hole_cards, self.T.hole_cards)
+        self.assertEqual(self.T.flop, self.T.flop)
+        self.assertEqual(self.T.river, self.T.river)
+
+    def test_seeded(self):
+        self.assertEqual(Table(rng=random.Random(4)).dealt, Table(rng=random.Random(4)).dealt)
+
+    def test_number_of_players(self):
+        self.assertEqual(len(Table(MAX_PLAYERS)), 23)
+        for num in (1, MAX_PLAYERS + 1):
+            with self.assertRaises(ValueError):
+                Table(num)
+
+    def test_deal(self):
+        dealt = self.T.dealt
+        self.assertIsNot(self.T.deal(), dealt)
+        self.assertEqual(len(self.T.deck), 52 - 6 * 2 - 5)
+
+    def test_dealt_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.T.dealt.board = ()
+
+    def test_best_cards_uses_dealt_cards(self):
+        winner, res = self.T.best_cards()
+        board = set(self.T.flop + [self.T.turn, self.T.river])
+        for i, hand in res.items():
+            self.assertEqual(set(hand.cards), board | set(self.T.hole_cards[i]))
+
     def test(self):
         winner, res = self.T.best_cards()
         print 'wn', winner
@@ -253,6 +348,102 @@ class TableTests(unittest.TestCase):
             print i, j
 
 
+class DealerTests(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(7)
+
+    def random_policy(self, dealer, legal):
+        kind, low, high = self.rand.choice(legal)
+        return kind, self.rand.randint(low, high) if kind in (BET, RAISE) else low
+
+    def test_blinds(self):
+        dealer = Dealer(4, stacks=100, rng=self.rand)
+        s = dealer.new_hand()
+        self.assertEqual(s.button, 0)
+        self.assertListEqual(s.bets, [0, 1, 2, 0])
+        self.assertEqual(s.to_act, 3)
+        self.assertListEqual(dealer.legal_actions(), [(FOLD, 0, 0), (CALL, 2, 2), (RAISE, 4, 100)])
+        self.assertEqual(len(set(sum(s.hole, ()) + s.runout)), 4 * 2 + 5)
+        self.assertEqual(s.board, ())
+
+    def test_heads_up_button_posts_small_blind(self):
+        dealer = Dealer(2, rng=self.rand)
+        s = dealer.new_hand()
+        self.assertEqual((s.button, s.to_act), (0, 0))
+        self.assertListEqual(s.bets, [1, 2])
+        dealer.act(CALL)
+        dealer.act(CHECK)
+        self.assertEqual((s.street, s.to_act, s.board), (FLOP, 1, s.runout[:3]))
+
+    def test_fold_to_big_blind(self):
+        dealer = Dealer(3, stacks=50, rng=self.rand)
+        s = dealer.new_hand()
+        dealer.act(FOLD)
+        dealer.act(FOLD)
+        self.assertTrue(s.finished)
+        self.assertListEqual(s.payoffs, [0, -1, 1])
+        self.assertEqual(s.winners, 1 << 2)
+        self.assertListEqual(dealer.stacks, [50, 49, 51])
+        self.assertEqual(dealer.legal_actions(), [])
+        with self.assertRaises(ValueError):
+            dealer.act(CHECK)
+
+    def test_illegal_actions(self):
+        dealer = Dealer(3, rng=self.rand)
+        dealer.new_hand()
+        with self.assertRaises(ValueError):
+            dealer.act(CHECK)
+        with self.assertRaises(ValueError):
+            dealer.act(RAISE, 3)
+
+    def test_short_all_in_does_not_reopen_betting(self):
+        dealer = Dealer(3, stacks=[100, 100, 13], rng=self.rand)
+        s = dealer.new_hand()
+        ## seat 0 raises to 10, seat 1 calls and seat 2 goes all in for 13
+        dealer.act(RAISE, 10)
+        dealer.act(CALL)
+        dealer.act(RAISE, 13)
+        self.assertTrue(s.all_in[2])
+        self.assertEqual(s.to_act, 0)
+        self.assertListEqual(dealer.legal_actions(), [(FOLD, 0, 0), (CALL, 3, 3)])
+
+    def test_side_pots(self):
+        for seed in range(30):
+            dealer = Dealer(3, stacks=[50, 100, 200], rng=random.Random(seed))
+            s = dealer.new_hand()
+            while not s.finished:
+                legal = dealer.legal_actions()
+                kind, low, high = legal[-1]
+                dealer.act(kind, high)
+            self.assertListEqual(s.contributed, [50, 100, 200])
+            strength = [evaluator.evaluate(list(s.hole[i]) + list(s.runout)) for i in range(3)]
+            if len(set(strength)) < 3:
+                continue
+            won = [0, 0, 100]
+            won[max(range(3), key=strength.__getitem__)] += 150
+            won[max((1, 2), key=strength.__getitem__)] += 100
+            self.assertListEqual(s.payoffs, [w - c for w, c in zip(won, [50, 100, 100 + 100])])
+
+    def test_copy(self):
+        dealer = Dealer(3, rng=self.rand)
+        s = dealer.new_hand()
+        saved = s.copy()
+        dealer.act(RAISE, 6)
+        self.assertListEqual(saved.bets, [0, 1, 2])
+        self.assertListEqual(s.bets, [6, 1, 2])
+        self.assertEqual(len(saved.actions), 2)
+
+    def test_self_play_keeps_chips(self):
+        dealer = Dealer(6, stacks=100, rng=self.rand)
+        for _ in range(300):
+            if sum(1 for i in dealer.stacks if i > 0) < 2:
+                dealer.stacks = [100] * 6
+            s = dealer.play(self.random_policy)
+            self.assertEqual(sum(dealer.stacks), 600)
+            self.assertEqual(sum(s.payoffs), 0)
+            self.assertTrue(s.winners)
+
+
 class HighCardTests(unittest.TestCase):
     def setUp(self):
         self.hands = TestHands().hands
@@ -382,6 +573,22 @@ class StraightFlushTests(unittest.TestCase):
             [Card(7, 'S'), Card(6, 'S'), Card(5, 'S'), Card(4, 'S'), Card(3, 'S')]
         )
 
+    def test_separate_straight(self):
+        ## Kc-5d is a straight but only Tc-6c is a straight flush
+        cards = [Card('K', 'C'), Card(10, 'C'), Card(9, 'C'), Card(8, 'C'),
+                 Card(7, 'C'), Card(6, 'C'), Card(5, 'D')]
+        hand = StraightFlush(cards)
+        self.assertTrue(hand.isa)
+        self.assertListEqual(
+            hand.five_best,
+            [Card(10, 'C'), Card(9, 'C'), Card(8, 'C'), Card(7, 'C'), Card(6, 'C')]
+        )
+        self.assertEqual(hand.strength, evaluator.evaluate([i.id for i in cards]))
+        ## a flush with a straight in other suits is not
+        cards = [Card('K', 'C'), Card(10, 'C'), Card(9, 'C'), Card(8, 'D'),
+                 Card(7, 'C'), Card(6, 'C'), Card(2, 'S')]
+        self.assertFalse(StraightFlush(cards).isa)
+
 
 class TestRoyalFlush(unittest.TestCase):
     def setUp(self):
@@ -395,6 +602,14 @@ class TestRoyalFlush(unittest.TestCase):
             royal_flush,
             [Card('A', 'D'), Card('K', 'D'), Card('Q', 'D'), Card('J', 'D'), Card(10, 'D')]        )
 
+    def test_not_royal(self):
+        ## a lower straight flush is not a royal flush and scores like any other miss
+        hand = RoyalFlush(self.hands['straight_flush'])
+        self.assertFalse(hand.isa)
+        self.assertEqual(hand.strength, HighCard(self.hands['straight_flush']).strength)
+        self.assertEqual(evaluator.category(hand.strength), evaluator.HIGH_CARD)
+        self.assertTrue(RoyalFlush(self.hands['royal_flush']).isa)
+
 
 class CompareRanksTests(unittest.TestCase):
     def setUp(self):
@@ -458,6 +673,38 @@ class CompareRanksTests(unittest.TestCase):
         pair = Pair(self.hands['pair'])
         self.assertEqual(max(three_oak, straight, pair), straight)
 
+    def test_two_pair_kickers(self):
+        kings = [Card('K', 'D'), Card('K', 'S'), Card(3, 'H'), Card(3, 'D'),
+                 Card(2, 'C'), Card(5, 'D'), Card(7, 'S')]
+        queens = [Card('Q', 'D'), Card('Q', 'S'), Card('J', 'H'), Card('J', 'D'),
+                  Card(2, 'C'), Card(5, 'D'), Card(7, 'S')]
+        self.assertTrue(TwoPair(kings) > TwoPair(queens))
+        self.assertTrue(Hand(kings).eval() > Hand(queens).eval())
+
+    def test_ge_and_le(self):
+        aces = Pair(self.hands['pair'])
+        threes = Pair(self.hands['pair2'])
+        self.assertTrue(aces >= threes)
+        self.assertFalse(threes >= aces)
+        self.assertTrue(threes <= aces)
+        self.assertTrue(aces >= Pair(self.hands['pair']))
+
+    def test_equal_strength_different_suits(self):
+        hand = self.hands['pair']
+        other = [Card(i.rank, {'D': 'C', 'S': 'H', 'H': 'S', 'C': 'D'}[i.suit]) for i in hand]
+        self.assertEqual(Hand(hand).eval(), Hand(other).eval())
+
+    def test_sort(self):
+        hands = [Hand(self.hands[i]).eval() for i in ['flush', 'pair', 'full_house', 'high_card']]
+        self.assertListEqual(
+            [i.__class__.__name__ for i in sorted(hands)],
+            ['HighCard', 'Pair', 'Flush', 'FullHouse']
+        )
+
+    def test_strength_computed_once(self):
+        pair = Pair(self.hands['pair'])
+        self.assertEqual(pair.strength, Hand(self.hands['pair']).strength)
+
 class TestHandEval(unittest.TestCase):
     def setUp(self):
         self.hands = TestHands()
@@ -470,6 +717,35 @@ class TestHandEval(unittest.TestCase):
         H = Hand(self.hands['four_of_a_kind'])
         self.assertEqual(H.eval().__class__.__name__, 'FourOfAKind')
 
+    def test_card_ids(self):
+        H = Hand([i.id for i in self.hands['pair']])
+        self.assertEqual(H.eval().__class__.__name__, 'Pair')
+
+    def test_all_categories(self):
+        expected = {
+            'high_card': 'HighCard',
+            'pair': 'Pair',
+            'two_pair': 'TwoPair',
+            'three_pair': 'TwoPair',
+            'three_of_a_kind': 'ThreeOfAKind',
+            'straight': 'Straight',
+            'long_straight': 'Straight',
+            'flush': 'Flush',
+            'full_house': 'FullHouse',
+            'four_of_a_kind': 'FourOfAKind',
+            'straight_flush': 'StraightFlush',
+            'royal_flush': 'RoyalFlush',
+        }
+        for name, hand_type in expected.items():
+            self.assertEqual(Hand(self.hands[name]).eval().__class__.__name__, hand_type)
+
+    def test_eval_five_best(self):
+        H = Hand(self.hands['straight'])
+        self.assertListEqual(
+            H.eval().five_best,
+            [Card(7, 'D'), Card(6, 'H'), Card(5, 'H'), Card(4, 'S'), Card(3, 'D')]
+        )
+
 
 
 
@@ -0,0 +1,141 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from history import *
+from game import Table, Dealer, CARDS, STREETS, ACTIONS, BET, RAISE
+import evaluator
+
+
+class HistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'hands.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_tables(self, n, buffer_size=7):
+        table = Table(3, rng=random.Random(1))
+        deals = []
+        with HistoryWriter(self.path, buffer_size=buffer_size) as writer:
+            for i in range(n):
+                table.deal()
+                deals.append(table.dealt)
+                writer.write_table(table, actions=[(0, 0, 3, 20), (1, 0, 0, 0)])
+        return table, deals
+
+    def test_round_trip(self):
+        table, deals = self.write_tables(20)
+        reader = HistoryReader(self.path)
+        self.assertEqual(len(reader), 20)
+        self.assertTrue(isinstance(reader.records, np.memmap))
+        for record, deal in zip(reader, deals):
+            self.assertEqual(record['seats'], 3)
+            self.assertListEqual(record['hole'][:3].tolist(), [list(i) for i in deal.hole])
+            self.assertListEqual(record['board'].tolist(), list(deal.board))
+        self.assertListEqual(reader.actions(reader[0]), [(0, 'preflop', 'bet', 20), (1, 'preflop', 'fold', 0)])
+        self.assertListEqual(reader.records['hand'].tolist(), list(range(20)))
+
+    def test_outcome(self):
+        table, deals = self.write_tables(10)
+        reader = HistoryReader(self.path)
+        for record, deal in zip(reader, deals):
+            strengths = [evaluator.evaluate(list(i) + list(deal.board)) for i in deal.hole]
+            mask = sum(1 << i for i, s in enumerate(strengths) if s == max(strengths))
+            self.assertEqual(record['winners'], mask)
+            self.assertListEqual(record['category'][:3].tolist(), [evaluator.category(s) for s in strengths])
+            self.assertListEqual(record['category'][3:].tolist(), [-1] * (MAX_SEATS - 3))
+
+    def test_cards(self):
+        table, deals = self.write_tables(1)
+        hole, board = HistoryReader.cards(HistoryReader(self.path)[0])
+        self.assertListEqual(hole, [[CARDS[j] for j in i] for i in deals[0].hole])
+        self.assertListEqual(board, [CARDS[i] for i in deals[0].board])
+
+    def test_filter(self):
+        self.write_tables(50)
+        reader = HistoryReader(self.path)
+        predicate = lambda r: r['winners'] & 1 > 0
+        matched = np.concatenate(list(reader.filter(predicate, chunk_size=8)))
+        expected = [r['hand'] for r in reader if r['winners'] & 1]
+        self.assertListEqual(matched['hand'].tolist(), expected)
+        self.assertListEqual(reader.indices(predicate, chunk_size=8).tolist(), expected)
+
+    def test_append(self):
+        self.write_tables(5)
+        with HistoryWriter(self.path, append=True) as writer:
+            self.assertEqual(writer.write([(0, 1), (2, 3)], [4, 5, 6]), 5)
+        reader = HistoryReader(self.path)
+        self.assertEqual(len(reader), 6)
+        self.assertListEqual(reader[5]['board'].tolist(), [4, 5, 6, NO_CARD, NO_CARD])
+        self.assertEqual(reader[5]['winners'], 0)
+
+    def test_dealer(self):
+        rand = random.Random(2)
+        dealer = Dealer(3, rng=rand)
+        states = []
+        with HistoryWriter(self.path) as writer:
+            for _ in range(20):
+                states.append(dealer.play(lambda d, legal: rand.choice(legal)[:2]))
+                writer.write_dealer(dealer)
+        reader = HistoryReader(self.path)
+        for record, state in zip(reader, states):
+            self.assertListEqual(record['payoff'][:3].tolist(), state.payoffs)
+            self.assertEqual(record['winners'], state.winners)
+            self.assertEqual(len(reader.actions(record)), len(state.actions))
+            self.assertListEqual(record['board'][:len(state.board)].tolist(), list(state.board))
+
+    def test_empty_seat(self):
+        dealer = Dealer(4, stacks=[100, 0, 100, 100], rng=random.Random(4))
+        state = dealer.play(lambda d, legal: legal[1][:2])
+        with HistoryWriter(self.path) as writer:
+            writer.write_dealer(dealer)
+        record = HistoryReader(self.path)[0]
+        hole, board = HistoryReader.cards(record)
+        self.assertIsNone(hole[1])
+        self.assertListEqual(hole[0], [CARDS[i] for i in state.hole[0]])
+        self.assertListEqual(board, [CARDS[i] for i in state.board])
+        self.assertEqual(record['category'][1], -1)
+
+    def test_long_hand(self):
+        ## ten seats min raising back and forth until they are all in
+        rand = random.Random(3)
+        dealer = Dealer(10, stacks=1000, rng=rand)
+
+        def policy(d, legal):
+            kind, low, high = legal[-1]
+            return (kind, low) if kind in (BET, RAISE) and rand.random() < 0.9 else legal[1][:2]
+
+        states = []
+        with HistoryWriter(self.path, buffer_size=3) as writer:
+            for _ in range(4):
+                states.append(dealer.play(policy).copy())
+                writer.write_dealer(dealer)
+                dealer.stacks = [1000] * 10
+        self.assertGreater(min(len(i.actions) for i in states), MAX_ACTIONS)
+        with HistoryWriter(self.path, append=True) as writer:
+            writer.write_dealer(dealer)
+        states.append(dealer.state)
+
+        reader = HistoryReader(self.path)
+        for record, state in zip(reader, states):
+            expected = [(seat, STREETS[street], ACTIONS[kind], amount) for seat, street, kind, amount in state.actions]
+            self.assertListEqual(reader.actions(record), expected)
+
+    def test_bad_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a history file')
+        with self.assertRaises(ValueError):
+            HistoryReader(self.path)
+
+    def test_too_many_seats(self):
+        with HistoryWriter(self.path) as writer:
+            with self.assertRaises(ValueError):
+                writer.write([(0, 1)] * (MAX_SEATS + 1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import pickle
+import pstats
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from instrument import *
+from game import Deck, Hand, Table
+
+
+def _worker(n):
+    instrumentation = Instrumentation()
+    with instrumentation:
+        for _ in range(n):
+            Table(6).best_cards()
+    return instrumentation.snapshot()
+
+
+class InstrumentationTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_disabled_has_no_wrappers(self):
+        eval_ = Hand.__dict__['eval']
+        instrumentation = Instrumentation()
+        instrumentation.enable()
+        self.assertIsNot(Hand.__dict__['eval'], eval_)
+        instrumentation.disable()
+        self.assertIs(Hand.__dict__['eval'], eval_)
+
+    def test_counts(self):
+        with Instrumentation() as instrumentation:
+            Table(6).best_cards()
+            Deck()
+        stats = instrumentation.snapshot()
+        self.assertEqual(stats['table.best_cards'][0], 1)
+        self.assertEqual(stats['table.deal'][0], 1)
+        self.assertEqual(stats['hand.eval'][0], 6)
+        self.assertEqual(stats['evaluator.evaluate'][0], 6)
+        self.assertEqual(stats['deck.shuffle'][0], 1)
+
+    def test_own_time_excludes_callees(self):
+        with Instrumentation() as instrumentation:
+            for _ in range(20):
+                Table(6).best_cards()
+        calls, total, own = instrumentation.stats['table.best_cards']
+        self.assertTrue(own < total)
+        self.assertTrue(total >= instrumentation.stats['hand.eval'][1])
+
+    def test_get_five_best(self):
+        with Instrumentation() as instrumentation:
+            Table(2)
+            Hand([0, 4, 8, 12, 16, 20, 24]).eval()
+            from game import Pair
+            Pair([0, 1, 8, 12, 16, 20, 24])
+        self.assertEqual(instrumentation.stats['Pair.get_five_best'][0], 1)
+
+    def test_merge_across_processes(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            snapshots = list(executor.map(_worker, [2, 3]))
+        instrumentation = Instrumentation()
+        for snapshot in snapshots:
+            instrumentation.merge(pickle.loads(pickle.dumps(snapshot)))
+        self.assertEqual(instrumentation.stats['table.best_cards'][0], 5)
+        self.assertEqual(instrumentation.stats['hand.eval'][0], 30)
+        self.assertTrue('hand.eval' in instrumentation.summary())
+
+    def test_dump_stats(self):
+        with Instrumentation() as instrumentation:
+            Table(6).best_cards()
+        path = os.path.join(self.dir, 'sim.prof')
+        instrumentation.dump_stats(path)
+        stats = pstats.Stats(path)
+        self.assertTrue(any(key[2] == 'best_cards' for key in stats.stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import random
+import unittest
+from timeit import default_timer
+from outs import *
+from evaluator import evaluate, category, FLUSH, STRAIGHT, FULL_HOUSE, FOUR_OF_A_KIND
+from game import Card
+
+
+def board_category(ids):
+    """category of 4 or 5 board cards by brute force"""
+    if len(ids) == 5:
+        return category(evaluate(ids))
+    counts = sorted([[i >> 2 for i in ids].count(r) for r in set(i >> 2 for i in ids)], reverse=True)
+    return {(1, 1, 1, 1): 0, (2, 1, 1): 1, (2, 2): 2, (3, 1): 3, (4,): 7}[tuple(counts)]
+
+
+def cards(*names):
+    return [Card(r, s).id for r, s in names]
+
+
+class OutsTests(unittest.TestCase):
+    def test_matches_trial_evaluation(self):
+        rand = random.Random(5)
+        for street in (3, 4):
+            for _ in range(200):
+                dealt = rand.sample(range(52), 2 + street)
+                hole, board = dealt[:2], dealt[2:]
+                current = category(evaluate(dealt))
+                expected = {}
+                for c in range(52):
+                    if c in dealt:
+                        continue
+                    new = category(evaluate(dealt + [c]))
+                    on_board = board_category(board + [c])
+                    if new > max(current, on_board):
+                        expected[c] = new
+                result = analyse(hole, board)
+                self.assertEqual(result.category, current)
+                self.assertEqual(dict(result.outs), expected)
+
+    def test_flush_draw(self):
+        result = analyse(cards(('A', 'H'), (7, 'H')), cards((2, 'H'), (9, 'H'), ('K', 'C')))
+        self.assertIn('flush_draw', result.draws)
+        self.assertEqual(len(outs_by_category(result)['Flush']), 9)
+
+    def test_open_ended(self):
+        result = analyse(cards((8, 'H'), (9, 'D')), cards((7, 'C'), (6, 'S'), ('K', 'C')))
+        self.assertIn('open_ended', result.draws)
+        self.assertEqual(len(outs_by_category(result)['Straight']), 8)
+
+    def test_gutshot_and_backdoor(self):
+        result = analyse(cards(('A', 'H'), (9, 'H')), cards((8, 'H'), (6, 'S'), (5, 'C')))
+        self.assertListEqual(result.draws, ['backdoor_flush_draw', 'gutshot', 'overcards'])
+
+    def test_board_draws_ignored(self):
+        ## the straight draw is all on the board
+        result = analyse(cards((2, 'H'), (2, 'D')), cards((7, 'C'), (8, 'S'), (9, 'C'), ('K', 'D')))
+        self.assertNotIn('open_ended', result.draws)
+        self.assertNotIn('gutshot', result.draws)
+
+    def test_overcards(self):
+        result = analyse(cards(('A', 'H'), ('K', 'D')), cards((7, 'C'), (8, 'S'), (2, 'C')))
+        self.assertIn('overcards', result.draws)
+        self.assertEqual(out_count(cards(('A', 'H'), ('K', 'D')), cards((7, 'C'), (8, 'S'), (2, 'C'))), 6)
+
+    def test_set_outs(self):
+        result = analyse(cards((9, 'H'), (9, 'D')), cards((9, 'C'), (8, 'S'), (2, 'C'), ('K', 'H')))
+        grouped = outs_by_category(result)
+        self.assertListEqual(list(grouped), ['FourOfAKind', 'FullHouse'])
+        self.assertEqual(len(grouped['FullHouse']), 9)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            analyse(cards((9, 'H'), (9, 'D')), cards((9, 'C'), (8, 'S')))
+        with self.assertRaises(ValueError):
+            analyse(cards((9, 'H'), (9, 'D')), cards((9, 'H'), (8, 'S'), (2, 'C')))
+
+
+if __name__ == '__main__':
+    unittest.main()
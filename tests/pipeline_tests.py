@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pipeline import *
+from evaluator import evaluate, category
+
+
+class SimulateTests(unittest.TestCase):
+    def test_chunks(self):
+        chunks = list(simulate_chunks(25, players=4, chunk_size=10, seed=1))
+        self.assertListEqual([len(i['winners']) for i in chunks], [10, 10, 5])
+        self.assertEqual(chunks[0]['hole'].shape, (10, 4, 2))
+
+    def test_cards_unique(self):
+        chunk = next(simulate_chunks(100, players=9, seed=2))
+        cards = np.hstack([chunk['hole'].reshape(100, -1), chunk['board']])
+        for row in cards:
+            self.assertEqual(len(set(row)), 23)
+
+    def test_showdown(self):
+        for hand in simulate_hands(50, players=3, chunk_size=20, seed=3):
+            board = hand['board'].tolist()
+            strengths = [evaluate(i.tolist() + board) for i in hand['hole']]
+            best = max(strengths)
+            mask = sum(1 << i for i, s in enumerate(strengths) if s == best)
+            self.assertEqual(hand['winners'], mask)
+            self.assertListEqual(hand['category'].tolist(), [category(i) for i in strengths])
+
+    def test_seats_are_fair(self):
+        wins = np.zeros(6)
+        for chunk in simulate_chunks(60000, players=6, chunk_size=20000, seed=6):
+            wins += (chunk['winners'][:, None] >> np.arange(6) & 1).sum(axis=0)
+        rates = wins / wins.sum()
+        self.assertLess(np.abs(rates - 1 / 6.0).max(), 0.006)
+
+    def test_seeded(self):
+        a = next(simulate_chunks(10, seed=4))
+        b = next(simulate_chunks(10, seed=4))
+        self.assertTrue(np.array_equal(a['hole'], b['hole']))
+
+
+class ColumnarTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        reader = run_simulation(self.dir, 250, players=5, chunk_size=100, seed=5)
+        self.assertEqual(len(reader), 250)
+        expected = list(simulate_chunks(250, players=5, chunk_size=100, seed=5))
+        hole = np.concatenate([i['hole'] for i in expected])
+        self.assertTrue(np.array_equal(reader['hole'], hole))
+        self.assertEqual(reader['winners'].dtype, np.uint32)
+        self.assertTrue(isinstance(reader['board'], np.memmap))
+        self.assertListEqual(reader.columns, ['hole', 'board', 'category', 'winners'])
+
+    def test_bad_shape(self):
+        with ColumnarWriter(self.dir, 3) as writer:
+            chunk = next(simulate_chunks(5, players=4))
+            with self.assertRaises(ValueError):
+                writer.write(chunk)
+
+
+if __name__ == '__main__':
+    unittest.main()
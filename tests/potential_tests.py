@@ -0,0 +1,84 @@
+import unittest
+from itertools import combinations
+from potential import *
+from evaluator import evaluate
+from game import Card
+
+
+def ids(*cards):
+    return [Card(r, s).id for r, s in cards]
+
+
+def brute_force(hole, board):
+    """Billings' HandPotential with the scalar evaluator"""
+    deck = [i for i in range(52) if i not in hole + board]
+    hp = [[0] * 3 for _ in range(3)]
+    ahead = tied = total = 0
+    hero_now = evaluate(hole + board)
+    for opp in combinations(deck, 2):
+        opp_now = evaluate(list(opp) + board)
+        now = AHEAD if hero_now > opp_now else TIED if hero_now == opp_now else BEHIND
+        ahead += now == AHEAD
+        tied += now == TIED
+        total += 1
+        for river in deck:
+            if river in opp:
+                continue
+            hero = evaluate(hole + board + [river])
+            villain = evaluate(list(opp) + board + [river])
+            final = AHEAD if hero > villain else TIED if hero == villain else BEHIND
+            hp[now][final] += 1
+    return (ahead + tied / 2.0) / total, hp
+
+
+class PotentialTests(unittest.TestCase):
+    def test_turn_matches_brute_force(self):
+        hole = ids((8, 'H'), (9, 'H'))
+        board = ids((2, 'H'), ('K', 'H'), (7, 'C'), (3, 'D'))
+        hs, hp = brute_force(hole, board)
+        result = hand_potential(hole, board)
+        self.assertAlmostEqual(result.hs, hs)
+        self.assertListEqual(result.transitions.tolist(), hp)
+        self.assertTrue(0.15 < result.ppot < 0.5)
+        self.assertAlmostEqual(result.ehs, result.hs + (1 - result.hs) * result.ppot)
+
+    def test_flop_sampled_close_to_exact(self):
+        hole = ids(('A', 'S'), ('K', 'D'))
+        board = ids((7, 'C'), (8, 'S'), (2, 'C'))
+        exact = hand_potential(hole, board, exact=True)
+        sampled = hand_potential(hole, board, samples=40000, seed=1)
+        self.assertEqual(exact.transitions.sum(), 1081 * 990)
+        self.assertEqual(sampled.transitions.sum(), 40000)
+        self.assertAlmostEqual(exact.hs, sampled.hs)
+        self.assertAlmostEqual(exact.ppot, sampled.ppot, delta=0.02)
+        self.assertAlmostEqual(exact.npot, sampled.npot, delta=0.02)
+
+    def test_river(self):
+        result = hand_potential(ids(('A', 'S'), ('A', 'D')), ids((7, 'C'), (8, 'S'), (2, 'C'), ('K', 'D'), (4, 'H')))
+        self.assertEqual((result.ppot, result.npot), (0.0, 0.0))
+        self.assertEqual(result.ehs, result.hs)
+
+    def test_opponents(self):
+        hole, board = ids(('A', 'S'), ('A', 'D')), ids((7, 'C'), (8, 'S'), (2, 'C'), ('K', 'D'))
+        one = hand_potential(hole, board)
+        three = hand_potential(hole, board, opponents=3)
+        self.assertAlmostEqual(three.hs, one.hs ** 3)
+
+    def test_batch_reproducible_across_workers(self):
+        queries = [
+            (ids(('A', 'S'), ('K', 'D')), ids((7, 'C'), (8, 'S'), (2, 'C'))),
+            (ids((5, 'S'), (6, 'S')), ids((7, 'S'), (8, 'D'), (2, 'S'))),
+            (ids((5, 'S'), (6, 'S')), ids((7, 'S'), (8, 'D'), (2, 'S'), ('J', 'C'))),
+        ]
+        one = hand_potentials(queries, samples=2000, seed=4, workers=1)
+        two = hand_potentials(queries, samples=2000, seed=4, workers=2)
+        self.assertListEqual([i.ppot for i in one], [i.ppot for i in two])
+        self.assertEqual(one[2].transitions.sum(), 1035 * 44)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            hand_potential(ids(('A', 'S'), ('A', 'D')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
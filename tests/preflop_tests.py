@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from preflop import *
+from game import Card
+
+
+class HandClassTests(unittest.TestCase):
+    def test_169_classes(self):
+        self.assertEqual(len(set(CLASS_OF)), 169)
+
+    def test_combo_counts(self):
+        self.assertEqual(len(class_combos(CLASS_NAMES['AA'])), 6)
+        self.assertEqual(len(class_combos(CLASS_NAMES['AKs'])), 4)
+        self.assertEqual(len(class_combos(CLASS_NAMES['AKo'])), 12)
+        self.assertEqual(sum(len(class_combos(i)) for i in range(169)), 1326)
+
+    def test_hand_class(self):
+        self.assertEqual(class_name(hand_class(Card('A', 'S'), Card('K', 'S'))), 'AKs')
+        self.assertEqual(class_name(hand_class(Card(9, 'D'), Card(10, 'S'))), 'T9o')
+        self.assertEqual(class_name(hand_class(Card(7, 'D'), Card(7, 'S'))), '77')
+
+    def test_names_round_trip(self):
+        for i in range(169):
+            self.assertEqual(CLASS_NAMES[class_name(i)], i)
+
+
+class PreflopTableTests(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'preflop.npy')
+        self.aa = CLASS_NAMES['AA']
+        self.kk = CLASS_NAMES['KK']
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cell_equity(self):
+        self.assertAlmostEqual(cell_equity(self.aa, self.kk, 20000, [0]), 0.82, delta=0.015)
+
+    def test_partial_build_and_lookup(self):
+        build_preflop_table(self.path, samples=2000, rows=[self.kk])
+        table = PreflopTable(self.path)
+        self.assertFalse(table.complete)
+        e = table.equity([Card('A', 'S'), Card('A', 'H')], [Card('K', 'D'), Card('K', 'C')])
+        self.assertAlmostEqual(e, 0.82, delta=0.03)
+        self.assertAlmostEqual(table.class_equity('KK', 'AA') + e, 1.0, places=5)
+        self.assertEqual(table.class_equity('KK', 'KK'), 0.5)
+        self.assertTrue(np.isnan(table.class_equity('QQ', 'JJ')))
+
+    def test_resume_matches_single_build(self):
+        rows = [self.aa, self.kk]
+        build_preflop_table(self.path, samples=500, seed=1, rows=rows[:1])
+        resumed = np.array(build_preflop_table(self.path, samples=500, seed=1, rows=rows))
+        other = os.path.join(self.dir, 'other.npy')
+        single = np.array(build_preflop_table(other, samples=500, seed=1, rows=rows))
+        np.testing.assert_array_equal(resumed[rows], single[rows])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import numpy as np
+from ranges import *
+from equity import exact_equity
+from game import Card
+
+
+def ids(text):
+    """'AhKd' -> card ids"""
+    return [RANK_CHARS[text[i]] << 2 | SUIT_CHARS[text[i + 1]] for i in range(0, len(text), 2)]
+
+
+class ParseTests(unittest.TestCase):
+    def test_sizes(self):
+        expected = [
+            ('QQ', 6), ('QQ+', 18), ('QQ-88', 30), ('AKs', 4), ('AKo', 12), ('AK', 16),
+            ('ATs+', 16), ('KTo+', 36), ('76s-54s', 12), ('A5s-A2s', 16), ('AhKd', 1),
+            ('QQ+, AKs, 76s-54s', 34), ('22+', 78),
+        ]
+        for text, size in expected:
+            self.assertEqual(len(Range.parse(text)), size, text)
+
+    def test_contents(self):
+        r = Range.parse('76s-54s')
+        self.assertTrue(ids('6h5h') in r)
+        self.assertFalse(ids('6h5d') in r)
+        self.assertFalse(ids('7h5h') in r)
+        self.assertTrue([Card('A', 'H'), Card('K', 'D')] in Range.parse('AhKd'))
+
+    def test_weights(self):
+        r = Range.parse('AK:0.25, AKs')
+        self.assertEqual(r.weights[COMBO_INDEX[ids('AhKh')[0] * 52 + ids('AhKh')[1]]], 1.0)
+        self.assertEqual(r.weights[COMBO_INDEX[ids('AhKd')[0] * 52 + ids('AhKd')[1]]], 0.25)
+
+    def test_invalid(self):
+        for text in ('AX', 'AAs', 'AKs-QJo', 'AK-72', 'AhAh', 'AK:x', 'AK:-1'):
+            with self.assertRaises(ValueError):
+                Range.parse(text)
+
+    def test_remove(self):
+        r = Range.parse('AA').remove(ids('As'))
+        self.assertEqual(len(r), 3)
+        self.assertEqual(len(Range.full().remove(ids('AsKsQs'))), 1176)
+
+
+class RangeEquityTests(unittest.TestCase):
+    def test_single_hands_match_exact_equity(self):
+        for board in ('2c7d9hTs', 'Ks2c7d9hTs'):
+            expected = exact_equity(ids('AhAd'), ids(board), ids('KhQh')).equity
+            result = range_equity('AhAd', 'KhQh', ids(board))
+            self.assertAlmostEqual(result.equity, expected)
+            self.assertEqual(result.equity_se, 0.0)
+
+    def test_flop_symmetry(self):
+        board = ids('2c7d9h')
+        a = range_equity('QQ+, AKs', '76s-54s, JJ', board)
+        b = range_equity('76s-54s, JJ', 'QQ+, AKs', board)
+        self.assertAlmostEqual(a.equity + b.equity, 1.0)
+        self.assertAlmostEqual(a.wins, b.losses)
+
+    def test_weights_are_products(self):
+        board = ids('2c7d9hTs')
+        a = range_equity('AA', 'KK', board)
+        b = range_equity('AA:0.5', 'KK', board)
+        self.assertAlmostEqual(a.equity, b.equity)
+        self.assertAlmostEqual(a.iterations, 2 * b.iterations)
+
+    def test_sampled(self):
+        result = range_equity('AA', 'KK', samples=20000, seed=1)
+        self.assertEqual(result.iterations, 20000)
+        self.assertFalse(result.exact)
+        self.assertAlmostEqual(result.equity, 0.82, delta=4 * result.equity_se + 0.005)
+        again = range_equity('AA', 'KK', samples=20000, seed=1)
+        self.assertEqual(result.wins, again.wins)
+
+    def test_dead_cards(self):
+        ## with the other kings dead, kings can't outdraw aces on this flop
+        board = ids('2c7d9h')
+        self.assertLess(range_equity('AhAd', 'KhKd', board).equity, 0.95)
+        result = range_equity('AhAd', 'KhKd', board, dead=ids('KsKc'))
+        self.assertEqual(result.iterations, 903)
+        self.assertEqual(result.equity, 1.0)
+        result = range_equity('AhAd', 'KhKd', board, dead=ids('KsKc'), samples=5000, seed=2)
+        self.assertEqual(result.equity, 1.0)
+
+    def test_blocked(self):
+        with self.assertRaises(ValueError):
+            range_equity('AhAd', 'AhKd', ids('2c7d9h'))
+        with self.assertRaises(ValueError):
+            range_equity('AA', 'KK', ids('2c7d'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from sampling import *
+from equity import exact_equity, monte_carlo_equity
+from game import Card
+
+HOLE = [Card('A', 'S').id, Card('K', 'S').id]
+FLOP = [Card(2, 'S').id, Card(7, 'H').id, Card('Q', 'D').id]
+
+
+class SamplerTests(unittest.TestCase):
+    def check_deals(self, sampler, board, players=3, iterations=999):
+        rng = np.random.RandomState(1)
+        cards, groups = sampler.deal(rng, HOLE, board, players, iterations)
+        self.assertEqual(cards.shape, (iterations, players, 7))
+        self.assertEqual(len(groups), iterations)
+        for row in cards[:50]:
+            self.assertListEqual(row[0, :2].tolist(), HOLE)
+            dealt = row[0, 2:].tolist() + row[1:, :2].ravel().tolist()
+            self.assertEqual(len(set(dealt)), len(dealt))
+            self.assertFalse(set(dealt) & set(HOLE))
+            self.assertListEqual(row[0, 2:2 + len(board)].tolist(), board)
+
+    def test_deals_are_valid(self):
+        for sampler in (Sampler(), AntitheticSampler(), QuasiRandomSampler()):
+            self.check_deals(sampler, [])
+            self.check_deals(sampler, FLOP)
+        self.check_deals(StratifiedFlopSampler(), [])
+
+    def test_stratified_needs_preflop(self):
+        with self.assertRaises(ValueError):
+            StratifiedFlopSampler().deal(np.random.RandomState(0), HOLE, FLOP, 2, 10)
+
+    def test_stratified_covers_classes(self):
+        sampler = StratifiedFlopSampler(replicates=1)
+        cards, _ = sampler.deal(np.random.RandomState(2), HOLE, [], 2, 1960)
+        ## a systematic sample of 1 in 10 of the 19600 possible flops sorted by class
+        classes = sampler.flop_table.class_ids(cards[:, 0, 2:5])
+        sizes = np.bincount(sampler.flop_table.class_ids(sampler._flops(HOLE)), minlength=1755)
+        counts = np.bincount(classes, minlength=1755)
+        self.assertTrue((np.abs(counts - sizes / 10.0) <= 1).all())
+
+
+class SampledEquityTests(unittest.TestCase):
+    def test_unbiased(self):
+        exact = exact_equity(HOLE, FLOP).equity
+        for name in sorted(SAMPLERS):
+            if name == 'stratified_flop':
+                continue
+            r = sampled_equity(HOLE, FLOP, iterations=20000, sampler=name, seed=3)
+            self.assertAlmostEqual(r.equity, exact, delta=5 * r.equity_se + 0.002)
+
+    def test_ess(self):
+        plain = sampled_equity(HOLE, FLOP, iterations=20000, seed=4)
+        self.assertAlmostEqual(plain.ess_gain, 1.0)
+        quasi = sampled_equity(HOLE, FLOP, iterations=20000, sampler=QuasiRandomSampler(), seed=4)
+        self.assertTrue(quasi.ess_gain > 1.5)
+        stratified = sampled_equity(HOLE, iterations=20000, sampler='stratified_flop', seed=4)
+        self.assertTrue(stratified.ess_gain > 1.0)
+        self.assertAlmostEqual(stratified.equity, 0.67, delta=0.01)
+
+    def test_pluggable(self):
+        r1 = monte_carlo_equity(HOLE, FLOP, iterations=4000, seed=5, chunk_size=1000,
+                                sampler=QuasiRandomSampler())
+        r2 = monte_carlo_equity(HOLE, FLOP, iterations=4000, seed=5, chunk_size=1000,
+                                sampler=QuasiRandomSampler(), workers=2)
+        self.assertEqual(r1.iterations, 4000)
+        self.assertEqual(r1.wins, r2.wins)
+
+
+if __name__ == '__main__':
+    unittest.main()